@@ -1,10 +1,19 @@
 from django.contrib import admin
-from .models import Trabajador, Prestamo, Cuota
+from django.utils import timezone
+from . import estado_cuenta, kpis
+from .models import Campus, Trabajador, Prestamo, Cuota, MovimientoCuenta, Trabajo
+
+@admin.register(Campus)
+class CampusAdmin(admin.ModelAdmin):
+    list_display = ("nombre",)
+    search_fields = ("nombre",)
 
 @admin.register(Trabajador)
 class TrabajadorAdmin(admin.ModelAdmin):
     list_display = ("codigo", "nombre", "campus")
-    search_fields = ("codigo", "nombre", "campus")
+    list_select_related = ("campus",)
+    list_filter = ("campus",)
+    search_fields = ("codigo", "nombre", "campus__nombre")
 
 class CuotaInline(admin.TabularInline):
     model = Cuota
@@ -21,3 +30,54 @@ class CuotaAdmin(admin.ModelAdmin):
     list_display = ("prestamo", "numero", "fecha_pago", "monto_total", "estado")
     list_filter = ("estado",)
     search_fields = ("prestamo__trabajador__nombre",)
+
+    # Cambiar estado, cheque, monto o fecha de una cuota pagada mueve su crédito en el estado de cuenta
+    def save_model(self, request, obj, form, change):
+        anterior = Cuota.objects.select_related("prestamo__trabajador").get(pk=obj.pk) if change else None
+        super().save_model(request, obj, form, change)
+        estado_cuenta.actualizar_cuota(obj, anterior)
+
+    # Cuota no tiene post_delete (signals.py): los borrados invalidan los KPIs aquí
+    def delete_model(self, request, obj):
+        estado_cuenta.descontar_pagos(Cuota.objects.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+        kpis.invalidar(kpis.CUOTAS)
+
+    def delete_queryset(self, request, queryset):
+        estado_cuenta.descontar_pagos(queryset)
+        super().delete_queryset(request, queryset)
+        kpis.invalidar(kpis.CUOTAS)
+
+@admin.register(MovimientoCuenta)
+class MovimientoCuentaAdmin(admin.ModelAdmin):
+    """Solo los movimientos manuales/capital se editan aquí; préstamos y pagos los genera la app."""
+    list_display = ("fecha", "descripcion", "debito", "credito", "saldo", "tipo")
+    list_filter = ("tipo",)
+    search_fields = ("descripcion", "cheque")
+    fields = ("fecha", "descripcion", "debito", "credito", "tipo")
+    date_hierarchy = "fecha"
+
+    def save_model(self, request, obj, form, change):
+        fecha_anterior = form.initial.get("fecha", obj.fecha) if change else obj.fecha
+        super().save_model(request, obj, form, change)
+        estado_cuenta.recalcular(min(fecha_anterior, obj.fecha))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        estado_cuenta.recalcular(obj.fecha)
+
+    def delete_queryset(self, request, queryset):
+        desde = min(queryset.values_list("fecha", flat=True), default=None)
+        super().delete_queryset(request, queryset)
+        estado_cuenta.recalcular(desde)
+
+@admin.register(Trabajo)
+class TrabajoAdmin(admin.ModelAdmin):
+    list_display = ("id", "tipo", "estado", "intentos", "usuario", "creado", "disponible_en")
+    list_filter = ("tipo", "estado")
+    readonly_fields = ("intentos", "error", "nombre_archivo", "creado", "actualizado")
+    actions = ["reintentar"]
+
+    @admin.action(description="Reintentar ahora")
+    def reintentar(self, request, queryset):
+        queryset.exclude(estado="En proceso").update(estado="Pendiente", intentos=0, disponible_en=timezone.now())
@@ -0,0 +1,264 @@
+"""Libro del estado de cuenta general.
+
+Cada préstamo es un débito y cada grupo de cuotas pagadas (cheque + quincena + campus) un crédito.
+El saldo acumulado se guarda en cada movimiento y los totales en ResumenCuenta, así la vista
+solo lee las filas que muestra. Todas las escrituras pasan por este módulo.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .models import Campus, Cuota, MovimientoCuenta, Prestamo, ResumenCuenta
+
+CERO = Decimal("0.00")
+
+
+def _bloquear_resumen():
+    """Serializa las escrituras al libro (el saldo depende del movimiento anterior)."""
+    ResumenCuenta.objects.get_or_create(pk=1)
+    return ResumenCuenta.objects.select_for_update().get(pk=1)
+
+
+def _sumar_totales(debito=CERO, credito=CERO):
+    ResumenCuenta.objects.filter(pk=1).update(
+        total_debitos=F("total_debitos") + debito,
+        total_creditos=F("total_creditos") + credito,
+    )
+
+
+def _recalcular_totales():
+    """Totales tomados de las filas: no dependen de qué movimientos encontró un UPDATE."""
+    totales = MovimientoCuenta.objects.aggregate(debitos=Sum("debito"), creditos=Sum("credito"))
+    ResumenCuenta.objects.filter(pk=1).update(
+        total_debitos=totales["debitos"] or CERO,
+        total_creditos=totales["creditos"] or CERO,
+    )
+
+
+def _recalcular_saldos(desde):
+    """Recalcula el saldo acumulado de los movimientos con fecha >= desde (solo guarda los que cambian)."""
+    saldo = (
+        MovimientoCuenta.objects.filter(fecha__lt=desde)
+        .order_by("-fecha", "-id")
+        .values_list("saldo", flat=True)
+        .first()
+    ) or CERO
+
+    cambiados = []
+    movimientos = MovimientoCuenta.objects.filter(fecha__gte=desde).order_by("fecha", "id").only("debito", "credito", "saldo")
+    for mov in movimientos:
+        saldo += mov.credito - mov.debito
+        if mov.saldo != saldo:
+            mov.saldo = saldo
+            cambiados.append(mov)
+    MovimientoCuenta.objects.bulk_update(cambiados, ["saldo"], batch_size=1000)
+
+
+def _descripcion_prestamo(prestamo):
+    return f"Préstamo #{prestamo.id} - {prestamo.trabajador}"
+
+
+@transaction.atomic
+def registrar_prestamos(prestamos):
+    """Débito por cada préstamo nuevo (un solo bulk_create)."""
+    if not prestamos:
+        return
+    _bloquear_resumen()
+    MovimientoCuenta.objects.bulk_create([
+        MovimientoCuenta(
+            fecha=p.fecha_inicio,
+            descripcion=_descripcion_prestamo(p),
+            debito=Decimal(p.monto),
+            tipo="prestamo",
+            prestamo=p,
+        )
+        for p in prestamos
+    ])
+    _sumar_totales(debito=sum(Decimal(p.monto) for p in prestamos))
+    _recalcular_saldos(min(p.fecha_inicio for p in prestamos))
+
+
+@transaction.atomic
+def actualizar_prestamo(prestamo):
+    """Ajusta el débito del préstamo tras editar monto o fecha de inicio."""
+    _bloquear_resumen()
+    mov = MovimientoCuenta.objects.filter(prestamo=prestamo).first()
+    if mov is None:
+        registrar_prestamos([prestamo])
+        return
+
+    diferencia = Decimal(prestamo.monto) - mov.debito
+    desde = min(mov.fecha, prestamo.fecha_inicio)
+    mov.fecha = prestamo.fecha_inicio
+    mov.debito = Decimal(prestamo.monto)
+    mov.descripcion = _descripcion_prestamo(prestamo)
+    mov.save(update_fields=["fecha", "debito", "descripcion"])
+    _sumar_totales(debito=diferencia)
+    _recalcular_saldos(desde)
+
+
+@transaction.atomic
+def quitar_prestamo(prestamo):
+    """Elimina el débito de un préstamo que se está borrando y los pagos de sus cuotas."""
+    _bloquear_resumen()
+    descontar_pagos(prestamo.cuotas.all())
+    mov = MovimientoCuenta.objects.filter(prestamo=prestamo).first()
+    if mov is None:
+        return
+    mov.delete()
+    _sumar_totales(debito=-mov.debito)
+    _recalcular_saldos(mov.fecha)
+
+
+@transaction.atomic
+def descontar_pagos(cuotas):
+    """Revierte el crédito de las cuotas pagadas de `cuotas` (antes de borrarlas)."""
+    grupos = list(
+        cuotas.filter(estado="Pagado").order_by()
+        .values_list("fecha_pago", "cheque", "prestamo__trabajador__campus")
+        .annotate(total=Sum("monto_total"))
+    )
+    _descontar(grupos)
+
+
+def _descontar(grupos):
+    if not grupos:
+        return
+    _bloquear_resumen()
+    for fecha, cheque, campus_id, total in grupos:
+        pagos = MovimientoCuenta.objects.filter(tipo="pago", fecha=fecha, cheque=cheque, campus_id=campus_id)
+        pagos.update(credito=F("credito") - total)
+        pagos.filter(credito__lte=0).delete()
+
+    # Un grupo sin movimiento (o con menos crédito del descontado) no debe mover los totales
+    _recalcular_totales()
+    _recalcular_saldos(min(g[0] for g in grupos))
+
+
+def _grupo(cuota):
+    return (cuota.fecha_pago, cuota.cheque, cuota.prestamo.trabajador.campus_id, cuota.monto_total)
+
+
+@transaction.atomic
+def actualizar_cuota(cuota, anterior=None):
+    """Lleva al libro una cuota editada por fuera del flujo de pago (admin, Cuota.sync_estado).
+
+    `anterior` es la cuota como estaba en la base antes del cambio (None si es nueva): si estaba
+    pagada se descuenta su crédito y si ahora lo está se acredita con sus datos actuales.
+    """
+    antes = _grupo(anterior) if anterior is not None and anterior.estado == "Pagado" else None
+    despues = _grupo(cuota) if cuota.estado == "Pagado" else None
+    if antes == despues:
+        return
+    if antes:
+        _descontar([antes])
+    if despues:
+        registrar_pagos([despues])
+
+
+@transaction.atomic
+def registrar_pagos(grupos):
+    """Acredita pagos de cuotas. `grupos` es una lista de (fecha_pago, cheque, campus_id, total).
+
+    Igual que el extracto original, los pagos se acumulan en un movimiento por cheque, quincena y campus.
+    """
+    grupos = [g for g in grupos if g[3]]
+    if not grupos:
+        return
+    _bloquear_resumen()
+    nombres = {c.pk: c.nombre for c in Campus.lista()}
+
+    for fecha, cheque, campus_id, total in grupos:
+        actualizados = MovimientoCuenta.objects.filter(
+            tipo="pago", fecha=fecha, cheque=cheque, campus_id=campus_id,
+        ).update(credito=F("credito") + total)
+        if not actualizados:
+            MovimientoCuenta.objects.create(
+                fecha=fecha,
+                descripcion=f"Cheque {cheque} - Campus {nombres.get(campus_id)}",
+                credito=total,
+                tipo="pago",
+                cheque=cheque,
+                campus_id=campus_id,
+            )
+
+    _sumar_totales(credito=sum(g[3] for g in grupos))
+    _recalcular_saldos(min(g[0] for g in grupos))
+
+
+@transaction.atomic
+def recalcular(desde=None):
+    """Recalcula totales y saldos tras editar movimientos manuales (admin)."""
+    _bloquear_resumen()
+    _recalcular_totales()
+    desde = desde or MovimientoCuenta.objects.order_by("fecha").values_list("fecha", flat=True).first()
+    if desde:
+        _recalcular_saldos(desde)
+
+
+@transaction.atomic
+def reconstruir():
+    """Vuelve a generar los débitos de préstamos y los créditos de pagos desde cero.
+
+    Los movimientos de capital y manuales se conservan. Útil tras cambios hechos por fuera de la app
+    (admin, SQL directo).
+    """
+    _bloquear_resumen()
+    MovimientoCuenta.objects.filter(tipo__in=["prestamo", "pago"]).delete()
+
+    nombres = {c.pk: c.nombre for c in Campus.lista()}
+    prestamos = Prestamo.objects.select_related("trabajador").order_by("id")
+    pagos = (
+        Cuota.objects
+        .filter(estado="Pagado")
+        .values_list("cheque", "fecha_pago", "prestamo__trabajador__campus")
+        .annotate(total=Sum("monto_total"))
+        .order_by("fecha_pago", "cheque", "prestamo__trabajador__campus")
+    )
+
+    MovimientoCuenta.objects.bulk_create(
+        [
+            MovimientoCuenta(
+                fecha=p.fecha_inicio, descripcion=_descripcion_prestamo(p),
+                debito=p.monto, tipo="prestamo", prestamo=p,
+            )
+            for p in prestamos.iterator(chunk_size=2000)
+        ] + [
+            MovimientoCuenta(
+                fecha=fecha, descripcion=f"Cheque {cheque} - Campus {nombres.get(campus_id)}",
+                credito=total, tipo="pago", cheque=cheque, campus_id=campus_id,
+            )
+            for cheque, fecha, campus_id, total in pagos
+        ],
+        batch_size=2000,
+    )
+
+    recalcular()
+
+
+def movimientos(year=None):
+    """Movimientos para el extracto (más recientes primero).
+
+    Con un año concreto solo se leen las filas de ese año y el saldo de arrastre sale de una única
+    fila: el último movimiento anterior al 1 de enero.
+    """
+    qs = MovimientoCuenta.objects.order_by("-fecha", "-id")
+    if not year or year == "all":
+        return list(qs)
+
+    year = int(year)
+    filas = list(qs.filter(fecha__year=year))
+    if filas:
+        saldo_inicial = (
+            qs.filter(fecha__lt=date(year, 1, 1)).values_list("saldo", flat=True).first()
+        ) or CERO
+        filas.append({
+            'fecha': date(year, 1, 1),
+            'descripcion': 'Saldo inicial',
+            'debito': CERO,
+            'credito': CERO,
+            'saldo': saldo_inicial,
+        })
+    return filas
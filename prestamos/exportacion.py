@@ -0,0 +1,133 @@
+"""Exportación completa de cuotas y del estado de cuenta a CSV o XLSX.
+
+Las filas se leen con values_list(...).iterator(chunk_size=...) (cursor del lado del servidor en
+Postgres) y se escriben a medida que llegan: el CSV se envía con StreamingHttpResponse y el XLSX
+se arma con openpyxl en modo write-only sobre un archivo temporal que luego se envía por partes.
+Exportar toda la historia no crece la memoria del worker.
+"""
+import csv
+import tempfile
+from datetime import date
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+from .models import Cuota, MovimientoCuenta
+
+TAMANO_LOTE = 2000
+
+COLUMNAS_CUOTAS = (
+    ("Cuota", "id"),
+    ("Préstamo", "prestamo_id"),
+    ("Número", "numero"),
+    ("Plazo", "prestamo__plazo"),
+    ("Código", "prestamo__trabajador__codigo"),
+    ("Trabajador", "prestamo__trabajador__nombre"),
+    ("Campus", "prestamo__trabajador__campus__nombre"),
+    ("Monto préstamo", "prestamo__monto"),
+    ("Inicio préstamo", "prestamo__fecha_inicio"),
+    ("Fecha pago", "fecha_pago"),
+    ("Principal", "principal"),
+    ("Comisión", "comision"),
+    ("Interés", "interes"),
+    ("Total cuota", "monto_total"),
+    ("Estado", "estado"),
+    ("Cheque", "cheque"),
+    ("Observación", "observacion"),
+)
+
+COLUMNAS_MOVIMIENTOS = (
+    ("Fecha", "fecha"),
+    ("Tipo", "tipo"),
+    ("Descripción", "descripcion"),
+    ("Préstamo", "prestamo_id"),
+    ("Cheque", "cheque"),
+    ("Campus", "campus__nombre"),
+    ("Débito", "debito"),
+    ("Crédito", "credito"),
+    ("Saldo", "saldo"),
+)
+
+FORMATOS = ("csv", "xlsx")
+
+
+def cuotas(desde=None, hasta=None, estado="", campus=""):
+    """Cuotas con su préstamo y trabajador, en orden de préstamo y número."""
+    qs = Cuota.objects.all()
+    if desde:
+        qs = qs.filter(fecha_pago__gte=desde)
+    if hasta:
+        qs = qs.filter(fecha_pago__lte=hasta)
+    if estado:
+        qs = qs.filter(estado=estado)
+    if campus:
+        qs = qs.filter(prestamo__trabajador__campus__nombre=campus)
+    return qs.order_by("prestamo_id", "numero")
+
+
+def movimientos(year=None):
+    """Movimientos del libro en orden contable (fecha, id), con el saldo acumulado guardado."""
+    qs = MovimientoCuenta.objects.order_by("fecha", "id")
+    if year and year != "all":
+        qs = qs.filter(fecha__year=int(year))
+    return qs
+
+
+# Excel/LibreOffice interpretan como fórmula un texto que empieza así (nombres, observaciones)
+INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _celda(valor):
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def _filas(qs, columnas):
+    for fila in qs.values_list(*(campo for _, campo in columnas)).iterator(chunk_size=TAMANO_LOTE):
+        yield [_celda(v) for v in fila]
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _csv(qs, columnas):
+    escritor = csv.writer(_Eco())
+    # BOM: Excel abre los acentos correctamente
+    lineas = ["\ufeff" + escritor.writerow([titulo for titulo, _ in columnas])]
+    # Se envía un bloque por lote, no una escritura por fila
+    for fila in _filas(qs, columnas):
+        lineas.append(escritor.writerow(fila))
+        if len(lineas) >= TAMANO_LOTE:
+            yield "".join(lineas)
+            lineas = []
+    yield "".join(lineas)
+
+
+def _xlsx(qs, columnas, hoja):
+    """Escribe el libro en un archivo temporal (modo write-only: una fila a la vez)."""
+    libro = Workbook(write_only=True)
+    ws = libro.create_sheet(hoja)
+    ws.append([titulo for titulo, _ in columnas])
+    for fila in _filas(qs, columnas):
+        ws.append(fila)
+
+    archivo = tempfile.TemporaryFile()
+    libro.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+def respuesta(qs, columnas, nombre, formato="csv"):
+    """StreamingHttpResponse (CSV) o FileResponse (XLSX) con `nombre`_AAAAMMDD.<formato>."""
+    archivo = f"{nombre}_{date.today():%Y%m%d}.{formato}"
+    if formato == "xlsx":
+        return FileResponse(_xlsx(qs, columnas, nombre), as_attachment=True, filename=archivo)
+
+    response = StreamingHttpResponse(_csv(qs, columnas), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{archivo}"'
+    return response
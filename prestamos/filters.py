@@ -1,19 +1,80 @@
+from datetime import datetime
+
 import django_filters
-from .models import Trabajador, Prestamo
+from django.db.models import Exists, OuterRef, Q
+from .models import Trabajador, Prestamo, Cuota
+
+
+def filtrar_fecha(queryset, campo, valor):
+    """Busca por fecha tal como se muestra en la tabla: "dd/mm/aaaa", "mm/aaaa" o "aaaa"."""
+    valor = valor.strip()
+    for formato, partes in (("%d/%m/%Y", ("day", "month", "year")), ("%m/%Y", ("month", "year")), ("%Y", ("year",))):
+        try:
+            fecha = datetime.strptime(valor, formato)
+        except ValueError:
+            continue
+        return queryset.filter(**{f"{campo}__{parte}": getattr(fecha, parte) for parte in partes})
+    return queryset.none()
+
 
 class TrabajadorFilter(django_filters.FilterSet):
+    q = django_filters.CharFilter(method="buscar", label="Buscar")
+    codigo = django_filters.CharFilter(lookup_expr="icontains", label="Código")
     nombre = django_filters.CharFilter(lookup_expr="icontains", label="Nombre")
-    campus = django_filters.CharFilter(lookup_expr="icontains", label="Campus")
+    campus = django_filters.CharFilter(field_name="campus__nombre", lookup_expr="icontains", label="Campus")
+    orden = django_filters.OrderingFilter(
+        fields=(("codigo", "codigo"), ("nombre", "nombre"), ("campus__nombre", "campus")),
+    )
 
     class Meta:
         model = Trabajador
-        fields = ["nombre", "campus"]
+        fields = ["codigo", "nombre", "campus"]
+
+    def buscar(self, queryset, name, value):
+        return queryset.filter(
+            Q(codigo__icontains=value) | Q(nombre__icontains=value) | Q(campus__nombre__icontains=value)
+        )
 
 
 class PrestamoFilter(django_filters.FilterSet):
+    q = django_filters.CharFilter(method="buscar", label="Buscar")
+    id = django_filters.NumberFilter(label="ID")
     trabajador = django_filters.CharFilter(field_name="trabajador__nombre", lookup_expr="icontains", label="Trabajador")
-    estado = django_filters.CharFilter(field_name="cuotas__estado", lookup_expr="icontains", label="Estado")
+    monto = django_filters.NumberFilter(label="Monto")
+    interes = django_filters.NumberFilter(label="Interés %")
+    comision = django_filters.NumberFilter(label="Comisión %")
+    plazo = django_filters.NumberFilter(label="Plazo")
+    fecha_inicio = django_filters.CharFilter(method="fecha", label="Inicio")
+    fecha_final = django_filters.CharFilter(method="fecha", label="Fin")
+    # EXISTS en vez de JOIN: un préstamo con varias cuotas en ese estado no se repite
+    estado = django_filters.CharFilter(method="con_cuotas_en_estado", label="Estado")
+    orden = django_filters.OrderingFilter(
+        fields=(
+            ("id", "id"),
+            ("trabajador__nombre", "trabajador"),
+            ("monto", "monto"),
+            ("interes", "interes"),
+            ("comision", "comision"),
+            ("plazo", "plazo"),
+            ("fecha_inicio", "fecha_inicio"),
+            ("fecha_final", "fecha_final"),
+        ),
+    )
 
     class Meta:
         model = Prestamo
-        fields = ["trabajador", "estado"]
\ No newline at end of file
+        fields = ["trabajador", "estado"]
+
+    def buscar(self, queryset, name, value):
+        condicion = Q(trabajador__nombre__icontains=value) | Q(trabajador__codigo__icontains=value)
+        if value.lstrip("#").isdigit():
+            condicion |= Q(pk=int(value.lstrip("#")))
+        return queryset.filter(condicion)
+
+    def fecha(self, queryset, name, value):
+        return filtrar_fecha(queryset, name, value)
+
+    def con_cuotas_en_estado(self, queryset, name, value):
+        return queryset.filter(
+            Exists(Cuota.objects.filter(prestamo=OuterRef("pk"), estado__icontains=value))
+        )
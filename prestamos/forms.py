@@ -1,19 +1,22 @@
 from django import forms
-from .models import Trabajador, Prestamo
+from .models import Campus, Trabajador, Prestamo
 
 class TrabajadorForm(forms.ModelForm):
-    CAMPUS_CHOICES = [
-        ('LEÓN', 'LEÓN'),
-        ('MATAGALPA', 'MATAGALPA'),
-        ('MANAGUA', 'MANAGUA'),
-    ]
-
-    campus = forms.ChoiceField(choices=CAMPUS_CHOICES, widget=forms.Select(attrs={'class': 'form-select'}))
+    # Choices desde la lista cacheada de Campus (sin consultar la tabla en cada render)
+    campus = forms.TypedChoiceField(coerce=int, choices=[], widget=forms.Select(attrs={'class': 'form-select'}))
 
     class Meta:
         model = Trabajador
         fields = ['codigo', 'nombre', 'campus']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["campus"].choices = [(c.pk, c.nombre) for c in Campus.lista()]
+
+    def clean_campus(self):
+        campus_id = self.cleaned_data["campus"]
+        return next(c for c in Campus.lista() if c.pk == campus_id)
+
 class PrestamoForm(forms.ModelForm):
     class Meta:
         model = Prestamo
@@ -22,6 +25,37 @@ class PrestamoForm(forms.ModelForm):
             "fecha_inicio": forms.DateInput(attrs={"type": "date"}),
             }
 
+    # El plan de pagos divide entre el plazo: 0 cuotas no es un préstamo
+    def clean_plazo(self):
+        plazo = self.cleaned_data["plazo"]
+        if plazo < 1:
+            raise forms.ValidationError("El plazo debe ser de al menos una cuota.")
+        return plazo
+
+    def clean_monto(self):
+        monto = self.cleaned_data["monto"]
+        if monto <= 0:
+            raise forms.ValidationError("El monto debe ser mayor que cero.")
+        return monto
+
+class PrestamoImportForm(PrestamoForm):
+    """Mismas reglas que PrestamoForm; el trabajador se resuelve aparte por código."""
+    class Meta(PrestamoForm.Meta):
+        fields = ["monto", "interes", "comision", "plazo", "fecha_inicio"]
+
+class ImportarPrestamosForm(forms.Form):
+    archivo = forms.FileField(
+        label="Archivo CSV o XLSX",
+        help_text="Columnas: codigo, monto, interes, comision, plazo, fecha_inicio",
+        widget=forms.ClearableFileInput(attrs={"accept": ".csv,.xlsx"}),
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data["archivo"]
+        if not archivo.name.lower().endswith((".csv", ".xlsx")):
+            raise forms.ValidationError("El archivo debe ser .csv o .xlsx")
+        return archivo
+
 class SeleccionQuincenaForm(forms.Form):
     campus = forms.ChoiceField(choices=[], label="Campus")
     fecha_pago = forms.DateField(widget=forms.SelectDateWidget)
@@ -29,10 +63,8 @@ class SeleccionQuincenaForm(forms.Form):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # choices dinámicos desde los trabajadores
-        self.fields["campus"].choices = [
-            (c, c) for c in Trabajador.objects.values_list("campus", flat=True).distinct()
-        ]
+        # choices desde la tabla de Campus (cacheada)
+        self.fields["campus"].choices = [(c.nombre, c.nombre) for c in Campus.lista()]
 
         
 
@@ -0,0 +1,139 @@
+import csv
+import io
+import zipfile
+
+from django.db import transaction
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from . import estado_cuenta, kpis
+from .forms import PrestamoImportForm
+from .models import Trabajador, Prestamo, Cuota
+
+COLUMNAS = ("codigo", "monto", "interes", "comision", "plazo", "fecha_inicio")
+BATCH_SIZE = 1000
+
+
+class ImportacionError(Exception):
+    """Archivo con formato inválido o filas que no pasan la validación."""
+
+    def __init__(self, errores):
+        self.errores = errores
+        super().__init__("; ".join(errores))
+
+
+def _normalizar_encabezado(valor):
+    encabezado = str(valor or "").strip().lower()
+    # "Trabajador" en la plantilla de nómina es el código del trabajador
+    return "codigo" if encabezado in ("trabajador", "código") else encabezado
+
+
+def _codigo(valor):
+    """Excel guarda los códigos numéricos como número: 123.0 es el trabajador "123"."""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor if valor is not None else "").strip()
+
+
+def leer_archivo(archivo, nombre):
+    """Lee un CSV o XLSX y devuelve una lista de diccionarios con las columnas de COLUMNAS."""
+    try:
+        return _leer_filas(archivo, nombre)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError):
+        raise ImportacionError(["El archivo no es un Excel (.xlsx) válido."])
+    except UnicodeDecodeError:
+        raise ImportacionError(["El CSV debe estar guardado en UTF-8."])
+    except csv.Error as exc:
+        raise ImportacionError([f"El CSV no se pudo leer: {exc}"])
+
+
+def _leer_filas(archivo, nombre):
+    if nombre.lower().endswith(".xlsx"):
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+        try:
+            # read_only deja el archivo abierto hasta close()
+            return _registros(libro.active.iter_rows(values_only=True))
+        finally:
+            libro.close()
+
+    contenido = archivo.read()
+    if isinstance(contenido, bytes):
+        contenido = contenido.decode("utf-8-sig")
+    return _registros(csv.reader(io.StringIO(contenido)))
+
+
+def _registros(filas):
+    filas = iter(filas)
+    encabezados = [_normalizar_encabezado(c) for c in next(filas, [])]
+    faltantes = [c for c in COLUMNAS if c not in encabezados]
+    if faltantes:
+        raise ImportacionError([f"Faltan columnas: {', '.join(faltantes)}"])
+
+    registros = []
+    for fila in filas:
+        if not any(v not in (None, "") for v in fila):
+            continue  # filas vacías al final de la hoja
+        registro = dict(zip(encabezados, fila))
+        registro["codigo"] = _codigo(registro.get("codigo"))
+        registros.append(registro)
+    return registros
+
+
+def validar_filas(registros):
+    """Valida cada fila con las reglas de PrestamoForm y resuelve los trabajadores en una sola consulta.
+
+    Devuelve los préstamos (sin guardar); lanza ImportacionError con todas las filas inválidas.
+    """
+    codigos = {_codigo(r.get("codigo")) for r in registros}
+    trabajadores = Trabajador.objects.in_bulk(codigos, field_name="codigo")
+
+    prestamos = []
+    errores = []
+    for numero, registro in enumerate(registros, start=2):  # fila 1 = encabezados
+        codigo = _codigo(registro.get("codigo"))
+        trabajador = trabajadores.get(codigo)
+        if trabajador is None:
+            errores.append(f"Fila {numero}: no existe el trabajador con código '{codigo}'")
+            continue
+
+        form = PrestamoImportForm(data={c: registro.get(c) for c in COLUMNAS[1:]})
+        if not form.is_valid():
+            detalle = ", ".join(f"{campo}: {' '.join(msgs)}" for campo, msgs in form.errors.items())
+            errores.append(f"Fila {numero}: {detalle}")
+            continue
+
+        prestamo = form.save(commit=False)
+        prestamo.trabajador = trabajador
+        prestamos.append(prestamo)
+
+    if errores:
+        raise ImportacionError(errores)
+    return prestamos
+
+
+@transaction.atomic
+def importar_prestamos(prestamos):
+    """Crea los préstamos y todas sus cuotas con bulk_create dentro de una sola transacción.
+
+    bulk_create no dispara post_save, así que el plan de pagos y el débito en el estado de cuenta
+    se registran aquí.
+    """
+    planes = []
+    for prestamo in prestamos:
+        cuotas = prestamo.construir_cuotas()
+        prestamo.fecha_final = cuotas[-1].fecha_pago if cuotas else None
+        planes.append(cuotas)
+
+    Prestamo.objects.bulk_create(prestamos, batch_size=BATCH_SIZE)
+
+    # Las cuotas se construyeron con el préstamo sin pk; se enlazan ahora que ya existe
+    cuotas = []
+    for prestamo, plan in zip(prestamos, planes):
+        for cuota in plan:
+            cuota.prestamo = prestamo
+        cuotas.extend(plan)
+    Cuota.objects.bulk_create(cuotas, batch_size=BATCH_SIZE)
+
+    estado_cuenta.registrar_prestamos(prestamos)
+    kpis.invalidar(kpis.CUOTAS)
+    return prestamos
@@ -0,0 +1,82 @@
+"""KPIs de los tableros cacheados en dos niveles con claves versionadas.
+
+Cada grupo de KPIs tiene un número de versión en el caché compartido (settings.CACHES["default"]:
+memoria local, archivo o base de datos). Las escrituras no borran valores: suben la versión del grupo
+(signals.py, y llamadas explícitas donde se usa update/bulk_create, que no disparan señales), así que
+la siguiente lectura usa otra clave y recalcula. Cada proceso guarda además la última versión leída
+de cada KPI en memoria y solo pregunta la versión al caché compartido.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import ESTADOS_ABIERTOS, Cuota, Trabajador
+
+TRABAJADORES = "trabajadores"
+CUOTAS = "cuotas"
+
+_local = {}
+_bloqueo = threading.Lock()
+
+
+def _clave_version(grupo):
+    return f"prestamos:kpis:{grupo}:version"
+
+
+def _version(grupo):
+    version = cache.get(_clave_version(grupo))
+    if version is None:
+        cache.add(_clave_version(grupo), 1, None)
+        version = cache.get(_clave_version(grupo), 1)
+    return version
+
+
+def invalidar(*grupos):
+    """Sube la versión de los grupos al confirmar la transacción (antes, otra lectura podría guardar datos viejos)."""
+    def subir():
+        for grupo in grupos:
+            try:
+                cache.incr(_clave_version(grupo))
+            except ValueError:
+                cache.set(_clave_version(grupo), 2, None)
+    transaction.on_commit(subir)
+
+
+def _cacheado(grupo, nombre, calcular):
+    version = _version(grupo)
+    # 1er nivel: memoria del proceso (sin deserializar ni ir al archivo/base)
+    guardado = _local.get((grupo, nombre))
+    if guardado is not None and guardado[0] == version:
+        return guardado[1]
+
+    # 2º nivel: caché compartido entre workers
+    clave = f"prestamos:kpis:{grupo}:v{version}:{nombre}"
+    valor = cache.get(clave)
+    if valor is None:
+        valor = calcular()
+        cache.set(clave, valor, getattr(settings, "KPI_CACHE_TIMEOUT", 86400))
+    with _bloqueo:
+        _local[(grupo, nombre)] = (version, valor)
+    return valor
+
+
+def trabajadores_por_campus():
+    """{campus_id: cantidad de trabajadores} (None = sin campus)."""
+    return _cacheado(TRABAJADORES, "por_campus", lambda: dict(
+        # 🔹 Un solo GROUP BY por campus (FK indexada)
+        Trabajador.objects.order_by().values_list("campus").annotate(total=Count("id"))
+    ))
+
+
+def pendiente_por_quincena():
+    """[(fecha_pago, campus, total)] de todas las cuotas por cobrar (pendientes y reprogramadas), en orden de fecha."""
+    return _cacheado(CUOTAS, "pendiente_por_quincena", lambda: list(
+        Cuota.objects
+        .filter(estado__in=ESTADOS_ABIERTOS)
+        .values_list("fecha_pago", "prestamo__trabajador__campus__nombre")
+        .annotate(total_monto=Sum("monto_total"))
+        .order_by("fecha_pago")
+    ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from prestamos.importacion import ImportacionError, importar_prestamos, leer_archivo, validar_filas
+
+
+class Command(BaseCommand):
+    help = "Importa préstamos desde un CSV o XLSX (codigo, monto, interes, comision, plazo, fecha_inicio)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta al archivo .csv o .xlsx")
+        parser.add_argument(
+            "--validar",
+            action="store_true",
+            help="Solo valida las filas, sin crear préstamos.",
+        )
+
+    def handle(self, *args, **options):
+        ruta = options["archivo"]
+        try:
+            with open(ruta, "rb") as archivo:
+                registros = leer_archivo(archivo, ruta)
+            prestamos = validar_filas(registros)
+        except FileNotFoundError:
+            raise CommandError(f"No existe el archivo {ruta}")
+        except ImportacionError as e:
+            raise CommandError("\n".join(e.errores))
+
+        if options["validar"]:
+            self.stdout.write(self.style.SUCCESS(f"{len(prestamos)} filas válidas."))
+            return
+
+        importar_prestamos(prestamos)
+        cuotas = sum(p.plazo for p in prestamos)
+        self.stdout.write(self.style.SUCCESS(f"Se importaron {len(prestamos)} préstamos ({cuotas} cuotas)."))
@@ -0,0 +1,66 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+
+class Command(BaseCommand):
+    help = (
+        "Simula requests contra la base configurada (señales request_started/finished, como gunicorn) "
+        "con una consulta cada uno y cuenta cuántas conexiones nuevas se abren. Sirve para comparar "
+        "DB_CONN_MAX_AGE=0, conexiones persistentes y DB_POOL=1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--hilos", type=int, default=1, help="Requests en paralelo (hilos de gunicorn).")
+
+    def handle(self, *args, **options):
+        abiertas = []
+
+        def contar(**kwargs):
+            abiertas.append(1)
+
+        connection_created.connect(contar, weak=False)
+        try:
+            with ThreadPoolExecutor(max_workers=options["hilos"]) as hilos:
+                medidas = list(hilos.map(lambda _: self.request(), range(options["requests"])))
+        finally:
+            connection_created.disconnect(contar)
+
+        tiempos = sorted(ms for ms, _ in medidas)
+        base = settings.DATABASES["default"]
+        self.stdout.write(
+            f"Motor {connection.vendor} | CONN_MAX_AGE={base.get('CONN_MAX_AGE')} | "
+            f"pool={'sí' if base.get('OPTIONS', {}).get('pool') else 'no'} | hilos={options['hilos']}"
+        )
+        # En Postgres cada backend distinto es una conexión física (con pool, connection_created
+        # también se emite al tomar una conexión ya abierta)
+        backends = {pid for _, pid in medidas if pid is not None}
+        if backends:
+            self.stdout.write(f"Conexiones físicas (backends de Postgres): {len(backends)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(medidas)} requests | {len(abiertas)} conexiones abiertas | "
+            f"mediana {statistics.median(tiempos):.1f} ms | p95 {tiempos[int(len(tiempos) * 0.95) - 1]:.1f} ms"
+        ))
+
+    def request(self):
+        """Un ciclo de request: abrir (si hace falta), una consulta y el cierre de fin de request."""
+        inicio = time.perf_counter()
+        request_started.send(sender=self.__class__)
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor == "postgresql":
+                    cursor.execute("SELECT pg_backend_pid()")
+                    pid = cursor.fetchone()[0]
+                else:
+                    cursor.execute("SELECT 1")
+                    pid = None
+        finally:
+            request_finished.send(sender=self.__class__)
+        return (time.perf_counter() - inicio) * 1000, pid
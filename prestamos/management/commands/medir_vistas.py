@@ -0,0 +1,310 @@
+import json
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, time as time_, timedelta
+
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+import prestamos.urls
+import tasks.urls
+from prestamos.management.semilla import sembrar_clases, sembrar_datos
+from prestamos.models import Cuota, Prestamo, Trabajo
+from tasks import series
+from tasks.models import Serie, Task
+
+# Presupuesto por ruta: (máximo de consultas, máximo de milisegundos).
+# Los tiempos son holgados (dependen de la máquina, ver --factor-tiempo); las consultas no.
+PRESUPUESTOS = {
+    "trabajador_list": (8, 500),
+    "trabajador_list_json": (6, 300),
+    "trabajador_create": (4, 300),
+    "prestamo_list": (8, 800),
+    "prestamo_list_json": (7, 800),
+    "prestamo_create": (5, 1000),
+    "prestamo_importar": (4, 300),
+    "prestamo_detail": (6, 500),
+    "prestamo_edit": (6, 1000),
+    "prestamo_pdf": (4, 3000),
+    "prestamo_documento_pdf": (14, 3000),
+    "imprimir_documento": (10, 3000),
+    "cuotas_masivo_pdf": (6, 500),
+    "cuotas_lote_pdf": (6, 500),
+    "enviar_correo": (6, 500),
+    "trabajo_estado": (4, 300),
+    "trabajo_descargar": (4, 300),
+    "cancelar_cuotas_masivo": (8, 1500),
+    "cancelar_cuotas_masivo_filtrado": (8, 1500),
+    "reprogramar_quincena": (10, 3000),
+    "estado_general": (8, 3000),
+    "estado_general_todos": (8, 10000),
+    "exportar_cuotas": (3, 20000),
+    "exportar_cuotas_xlsx": (3, 3000),
+    "exportar_estado_cuenta": (3, 5000),
+    "perfilado": (5, 300),
+    "proyeccion_flujo": (6, 1000),
+    "proyeccion_flujo_json": (4, 1000),
+    "login": (2, 300),
+    "home_redirect": (0, 100),
+    "logout": (4, 300),
+    "list_tasks": (4, 3000),
+    "create_task": (1, 300),
+    "edit_task": (2, 300),
+    "update_task": (2, 300),
+    "create_task_conflicto": (2, 500),
+    "serie_list": (2, 300),
+    "serie_create": (1, 300),
+    "serie_create_post": (11, 1000),
+    "serie_edit": (2, 300),
+    "serie_delete": (13, 1000),
+    "delete_task": (10, 300),
+    "calendario_clases": (1, 300),
+    "clases_api": (2, 300),
+    "clases_api_todo": (2, 3000),
+    "informe_ultimas_fechas": (1, 300),
+    "informe_ultimas_fechas_csv": (2, 1000),
+    "informe_ultimas_fechas_xlsx": (2, 1000),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Siembra una cartera sintética en una base de datos desechable (SQLite en memoria por defecto), "
+        "visita todas las rutas de prestamos y tasks, mide consultas, tiempo y tamaño de respuesta, "
+        "escribe un reporte JSON y falla si alguna ruta excede su presupuesto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--trabajadores", type=int, default=3000)
+        parser.add_argument("--prestamos", type=int, default=30000, help="~8 cuotas por préstamo")
+        parser.add_argument("--instructores", type=int, default=25)
+        parser.add_argument("--clases", type=int, default=5000)
+        parser.add_argument("--repeticiones", type=int, default=3, help="Se reporta la mediana del tiempo.")
+        parser.add_argument("--factor-tiempo", type=float, default=1.0, help="Multiplica los presupuestos de tiempo.")
+        parser.add_argument("--salida", default="medir_vistas.json", help="Ruta del reporte JSON.")
+        parser.add_argument("--comparar", help="Reporte JSON anterior para mostrar diferencias.")
+        parser.add_argument(
+            "--motor-configurado", action="store_true",
+            help="Usar la base de pruebas del motor configurado (p.ej. test_<db> en Postgres) en vez de SQLite.",
+        )
+
+    # =========================
+    # Base de datos desechable
+    # =========================
+    def usar_sqlite_en_memoria(self):
+        connections["default"].close()
+        connections.settings["default"].update({
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": ":memory:",
+            "USER": "", "PASSWORD": "", "HOST": "", "PORT": "",
+            "OPTIONS": {},
+        })
+        del connections["default"]
+
+    # =========================
+    # Rutas
+    # =========================
+    def casos(self):
+        """Listas (lecturas, acciones) de (nombre, método, url, datos, estado HTTP esperado).
+
+        Las acciones modifican datos: se miden una sola vez y después de todas las lecturas.
+        """
+        prestamo = Prestamo.objects.order_by("-id").first()
+        pendiente = Cuota.objects.filter(estado="Pendiente").order_by("fecha_pago").first()
+        cuotas_quincena = list(
+            Cuota.objects.filter(estado="Pendiente", fecha_pago=pendiente.fecha_pago).values_list("pk", flat=True)[:200]
+        )
+        trabajo = Trabajo.objects.create(tipo="pdf_cuotas", usuario=self.usuario, estado="Completado",
+                                         nombre_archivo="bench.pdf", resultado=b"%PDF-1.4")
+        task = Task.objects.order_by("id").first()
+        hoy = date.today()
+        # Un semestre de lunes, miércoles y viernes, fuera del rango de las clases sembradas
+        semestre = {
+            "title": "Bench", "description": "Serie", "instructor": task.instructor_id, "dias": ["0", "2", "4"],
+            "hora": "06:00", "duracion": 60, "excepciones": "",
+            "fecha_inicio": date(hoy.year + 2, 2, 1).isoformat(), "fecha_fin": date(hoy.year + 2, 6, 30).isoformat(),
+        }
+        serie = Serie(title="Bench", instructor=task.instructor, dias="13", hora=time_(6), fecha_inicio=date(hoy.year + 3, 2, 1),
+                      fecha_fin=date(hoy.year + 3, 6, 30))
+        series.guardar(serie)
+        quincena = {"fecha": pendiente.fecha_pago.isoformat(), "campus": pendiente.prestamo.trabajador.campus.nombre}
+        # Misma franja que una clase existente: la vista responde 200 con la lista de conflictos
+        clase_repetida = {
+            "title": "Bench", "description": "Bench", "instructor": task.instructor_id,
+            "fecha_inicio": task.fecha_inicio.isoformat(), "fecha_fin": task.fecha_fin.isoformat(),
+            "hora": task.hora.strftime("%H:%M"), "duracion": task.duracion,
+        }
+
+        return [
+            ("trabajador_list", "get", reverse("prestamos:trabajador_list"), None, 200),
+            ("trabajador_list_json", "get", reverse("prestamos:trabajador_list") + "?formato=json&page=3&orden=-nombre", None, 200),
+            ("trabajador_create", "get", reverse("prestamos:trabajador_create"), None, 200),
+            ("prestamo_list", "get", reverse("prestamos:prestamo_list"), None, 200),
+            ("prestamo_list_json", "get", reverse("prestamos:prestamo_list") + "?formato=json&estado=Pendiente&orden=-monto", None, 200),
+            ("prestamo_create", "get", reverse("prestamos:prestamo_create"), None, 200),
+            ("prestamo_importar", "get", reverse("prestamos:prestamo_importar"), None, 200),
+            ("prestamo_detail", "get", reverse("prestamos:prestamo_detail", args=[prestamo.pk]), None, 200),
+            ("prestamo_edit", "get", reverse("prestamos:prestamo_edit", args=[prestamo.pk]), None, 200),
+            ("prestamo_pdf", "get", reverse("prestamos:prestamo_pdf", args=[prestamo.pk]), None, 200),
+            ("prestamo_documento_pdf", "get", reverse("prestamos:prestamo_documento_pdf", args=[prestamo.pk, "pagare"]), None, 200),
+            ("imprimir_documento", "get", reverse("prestamos:imprimir_documento", args=[prestamo.pk]) + "?tipo=pagare", None, 200),
+            ("trabajo_estado", "get", reverse("prestamos:trabajo_estado", args=[trabajo.pk]) + "?formato=json", None, 200),
+            ("trabajo_descargar", "get", reverse("prestamos:trabajo_descargar", args=[trabajo.pk]), None, 200),
+            ("cancelar_cuotas_masivo", "get", reverse("prestamos:cancelar_cuotas_masivo"), None, 200),
+            ("cancelar_cuotas_masivo_filtrado", "get", reverse("prestamos:cancelar_cuotas_masivo"), quincena, 200),
+            ("estado_general", "get", reverse("prestamos:estado_general"), None, 200),
+            ("estado_general_todos", "get", reverse("prestamos:estado_general"), {"year": "all"}, 200),
+            ("exportar_cuotas", "get", reverse("prestamos:exportar_cuotas"), None, 200),
+            ("exportar_cuotas_xlsx", "get", reverse("prestamos:exportar_cuotas"), {"formato": "xlsx", "desde": quincena["fecha"], "hasta": quincena["fecha"], "campus": quincena["campus"]}, 200),
+            ("exportar_estado_cuenta", "get", reverse("prestamos:exportar_estado_cuenta"), {"year": "all"}, 200),
+            ("perfilado", "get", reverse("prestamos:perfilado"), None, 200),
+            ("proyeccion_flujo", "get", reverse("prestamos:proyeccion_flujo"), None, 200),
+            ("proyeccion_flujo_json", "get", reverse("prestamos:proyeccion_flujo"), {"formato": "json", "meses": 24}, 200),
+            ("login", "get", reverse("prestamos:login"), None, 200),
+            ("home_redirect", "get", reverse("prestamos:home_redirect"), None, 302),
+            ("list_tasks", "get", reverse("list_tasks"), None, 200),
+            ("create_task", "get", reverse("create_task"), None, 200),
+            ("edit_task", "get", reverse("edit_task", args=[task.pk]), None, 200),
+            ("update_task", "get", reverse("update_task", args=[task.pk]), None, 200),
+            ("calendario_clases", "get", reverse("calendario_clases"), None, 200),
+            # Ventana de la vista mensual de FullCalendar (6 semanas)
+            ("clases_api", "get", reverse("clases_api"), {"start": (hoy - timedelta(days=14)).isoformat(), "end": (hoy + timedelta(days=28)).isoformat()}, 200),
+            ("clases_api_todo", "get", reverse("clases_api"), None, 200),
+            ("informe_ultimas_fechas", "get", reverse("informe_ultimas_fechas"), None, 200),
+            ("informe_ultimas_fechas_csv", "get", reverse("informe_ultimas_fechas"), {"formato": "csv"}, 200),
+            ("informe_ultimas_fechas_xlsx", "get", reverse("informe_ultimas_fechas"), {"formato": "xlsx"}, 200),
+            ("serie_list", "get", reverse("serie_list"), None, 200),
+            ("serie_create", "get", reverse("serie_create"), None, 200),
+            ("serie_edit", "get", reverse("serie_edit", args=[serie.pk]), None, 200),
+        ], [
+            ("cuotas_masivo_pdf", "post", reverse("prestamos:cuotas_masivo_pdf"), {"cuotas": cuotas_quincena, **quincena}, 302),
+            ("reprogramar_quincena", "post", reverse("prestamos:cancelar_cuotas_masivo"),
+             {"accion": "reprogramar_quincena", "observacion": "Sin planilla", **quincena}, 302),
+            ("cuotas_lote_pdf", "post", reverse("prestamos:cuotas_lote_pdf"), {"fecha": quincena["fecha"], "formato": "zip"}, 302),
+            ("create_task_conflicto", "post", reverse("create_task"), clase_repetida, 200),
+            ("serie_create_post", "post", reverse("serie_create"), semestre, 302),
+            ("serie_delete", "post", reverse("serie_delete", args=[serie.pk]), None, 302),
+            ("enviar_correo", "get", reverse("prestamos:enviar_correo", args=[prestamo.pk]), None, 302),
+            ("delete_task", "get", reverse("delete_task", args=[task.pk]), None, 302),
+            ("logout", "post", reverse("prestamos:logout"), None, 302),
+        ]
+
+    def rutas_sin_medir(self, nombres):
+        """Rutas con nombre en prestamos/urls.py y tasks/urls.py que no tienen caso ni presupuesto."""
+        rutas = {p.name for p in prestamos.urls.urlpatterns + tasks.urls.urlpatterns if getattr(p, "name", None)}
+        return sorted(rutas - set(nombres))
+
+    # =========================
+    # Medición
+    # =========================
+    def medir(self, cliente, metodo, url, datos, repeticiones):
+        tiempos = []
+        for i in range(repeticiones):
+            with CaptureQueriesContext(connection) as consultas:
+                inicio = time.perf_counter()
+                response = getattr(cliente, metodo)(url, datos or {})
+                if response.streaming:
+                    tamano = sum(len(parte) for parte in response.streaming_content)
+                else:
+                    tamano = len(response.content)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            if i == 0:
+                resultado = {"status": response.status_code, "consultas": len(consultas), "bytes": tamano}
+        resultado["ms"] = round(statistics.median(tiempos), 1)
+        return resultado
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        if not options["motor_configurado"]:
+            self.usar_sqlite_en_memoria()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        bases = runner.setup_databases()
+        try:
+            with tempfile.TemporaryDirectory() as carpeta, override_settings(
+                ALLOWED_HOSTS=["*"],
+                PDF_CACHE_DIR=carpeta,
+                EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+            ):
+                reporte = self.ejecutar(options)
+        finally:
+            runner.teardown_databases(bases)
+            teardown_test_environment()
+
+        # El reporte anterior puede ser el mismo archivo de salida: se compara antes de sobrescribirlo
+        if options["comparar"]:
+            self.comparar(reporte, options["comparar"])
+
+        with open(options["salida"], "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        self.stdout.write(f"Reporte: {options['salida']}")
+
+        fallas = [r["ruta"] for r in reporte["resultados"] if not r["ok"]]
+        if reporte["sin_medir"]:
+            raise CommandError(f"Rutas sin presupuesto: {', '.join(reporte['sin_medir'])}")
+        if fallas:
+            raise CommandError(f"{len(fallas)} ruta(s) exceden su presupuesto: {', '.join(fallas)}")
+
+    def ejecutar(self, options):
+        inicio = time.perf_counter()
+        t, p, c = sembrar_datos(options["trabajadores"], options["prestamos"])
+        i, k = sembrar_clases(options["instructores"], options["clases"])
+        self.stdout.write(
+            f"Sembrados {t} trabajadores, {p} préstamos, {c} cuotas, {i} instructores, {k} clases "
+            f"en {time.perf_counter() - inicio:.1f}s"
+        )
+
+        self.usuario = User.objects.create_user("medir_vistas", password="x", is_staff=True)
+        self.usuario.groups.add(Group.objects.get_or_create(name="admin_total")[0])
+        cliente = Client(raise_request_exception=True)
+        cliente.force_login(self.usuario)
+
+        lecturas, acciones = self.casos()
+        casos = [(caso, options["repeticiones"]) for caso in lecturas] + [(caso, 1) for caso in acciones]
+        resultados = []
+        for (nombre, metodo, url, datos, esperado), repeticiones in casos:
+            max_consultas, max_ms = PRESUPUESTOS[nombre]
+            max_ms *= options["factor_tiempo"]
+            medida = self.medir(cliente, metodo, url, datos, repeticiones)
+            ok = medida["status"] == esperado and medida["consultas"] <= max_consultas and medida["ms"] <= max_ms
+            resultados.append({
+                "ruta": nombre, "metodo": metodo.upper(), "url": url, **medida,
+                "max_consultas": max_consultas, "max_ms": max_ms, "ok": ok,
+            })
+            estilo = self.style.SUCCESS if ok else self.style.ERROR
+            self.stdout.write(estilo(
+                f"{'✔' if ok else '✘'} {nombre:<32} {medida['status']} "
+                f"{medida['consultas']:>3}/{max_consultas:<3} consultas "
+                f"{medida['ms']:>8.1f}/{max_ms:.0f} ms {medida['bytes']:>9} bytes"
+            ))
+
+        return {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "motor": connection.vendor,
+            "datos": {"trabajadores": t, "prestamos": p, "cuotas": c, "instructores": i, "clases": k},
+            "sin_medir": self.rutas_sin_medir(nombre for (nombre, *_), _ in casos),
+            "resultados": resultados,
+        }
+
+    def comparar(self, reporte, ruta):
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                anterior = {r["ruta"]: r for r in json.load(f)["resultados"]}
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"No se pudo leer {ruta}: {e}")
+
+        self.stdout.write(f"Diferencias contra {ruta}:")
+        for r in reporte["resultados"]:
+            antes = anterior.get(r["ruta"])
+            if antes is None:
+                self.stdout.write(f"  {r['ruta']:<32} (nueva)")
+                continue
+            self.stdout.write(
+                f"  {r['ruta']:<32} consultas {antes['consultas']:>3} → {r['consultas']:<3} "
+                f"ms {antes['ms']:>8.1f} → {r['ms']:<8.1f} bytes {antes['bytes']:>9} → {r['bytes']}"
+            )
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from prestamos import trabajos
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de la cola de trabajos (PDF masivos y correos). Corre indefinidamente; "
+        "con --una-vez procesa lo pendiente y termina (útil para cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--una-vez", action="store_true", help="Salir cuando la cola quede vacía.")
+        parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos de espera con la cola vacía.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Worker de trabajos iniciado.")
+        try:
+            while True:
+                # Conexiones caídas o vencidas (CONN_MAX_AGE) no deben tumbar el worker
+                close_old_connections()
+                rescatados = trabajos.rescatar_bloqueados()
+                if rescatados:
+                    self.stdout.write(self.style.WARNING(f"{rescatados} trabajo(s) bloqueado(s) devuelto(s) a la cola"))
+
+                trabajo = trabajos.reclamar_siguiente()
+                if trabajo is None:
+                    if options["una_vez"]:
+                        break
+                    time.sleep(options["intervalo"])
+                    continue
+
+                trabajo = trabajos.ejecutar(trabajo)
+                estilo = self.style.SUCCESS if trabajo.estado == "Completado" else self.style.ERROR
+                self.stdout.write(estilo(f"{trabajo} (intento {trabajo.intentos}) {trabajo.error}".rstrip()))
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write("Worker detenido.")
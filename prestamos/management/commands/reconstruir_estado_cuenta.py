@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from prestamos import estado_cuenta
+from prestamos.models import ResumenCuenta
+
+
+class Command(BaseCommand):
+    help = "Regenera el libro del estado de cuenta (préstamos y pagos) y los totales desde las cuotas."
+
+    def handle(self, *args, **options):
+        estado_cuenta.reconstruir()
+        resumen = ResumenCuenta.actual()
+        self.stdout.write(self.style.SUCCESS(
+            f"Estado de cuenta reconstruido. Débitos {resumen.total_debitos} | "
+            f"Créditos {resumen.total_creditos} | Saldo {resumen.saldo}"
+        ))
@@ -0,0 +1,36 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prestamos.models import Campus
+from prestamos.reprogramacion import reprogramar_quincena
+from prestamos.utils import es_quincena
+
+
+class Command(BaseCommand):
+    help = (
+        "Corre una quincena hacia adelante las cuotas abiertas de los préstamos que debían pagar en FECHA "
+        "(esa cuota y todas las posteriores), p.ej. cuando un campus no pagó la planilla."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fecha", help="Quincena omitida (AAAA-MM-DD)")
+        parser.add_argument("--campus", help="Nombre del campus (por defecto todos)")
+        parser.add_argument("--motivo", default="", help="Observación que se agrega a las cuotas movidas.")
+
+    def handle(self, *args, **options):
+        try:
+            fecha = date.fromisoformat(options["fecha"])
+        except ValueError:
+            raise CommandError(f"Fecha inválida: {options['fecha']} (use AAAA-MM-DD)")
+        if not es_quincena(fecha):
+            raise CommandError(f"{fecha:%d/%m/%Y} no es una quincena (día 15 o fin de mes)")
+
+        campus = options["campus"]
+        if campus and not Campus.objects.filter(nombre=campus).exists():
+            raise CommandError(f"No existe el campus {campus}")
+
+        prestamos, cuotas = reprogramar_quincena(fecha, campus=campus, motivo=options["motivo"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Se corrieron {cuotas} cuotas de {prestamos} préstamos desde el {fecha:%d/%m/%Y}."
+        ))
@@ -0,0 +1,95 @@
+"""Datos sintéticos para pruebas de rendimiento (nunca para producción)."""
+import random
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from prestamos import estado_cuenta
+from prestamos.models import Campus, Trabajador, Prestamo, Cuota
+from prestamos.utils import end_of_month
+from tasks import informe
+from tasks.models import DURACION_PREDETERMINADA, Instructor, Task, sumar_minutos
+
+CAMPUS = ("LEÓN", "MANAGUA", "MATAGALPA")
+BATCH_SIZE = 5000
+
+
+def sembrar_datos(num_trabajadores, num_prestamos, hoy=None, semilla=7):
+    """Crea trabajadores, préstamos y sus cuotas con bulk_create.
+
+    Las cuotas con fecha anterior a `hoy` quedan pagadas (con cheque), el resto pendientes,
+    igual que en la cartera real.
+    """
+    rnd = random.Random(semilla)
+    hoy = hoy or date.today()
+
+    campus = [Campus.objects.get_or_create(nombre=nombre)[0] for nombre in CAMPUS]
+    trabajadores = Trabajador.objects.bulk_create(
+        [
+            Trabajador(codigo=f"S{i:06d}", nombre=f"Trabajador {i}", campus=campus[i % len(campus)])
+            for i in range(num_trabajadores)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    prestamos = []
+    for _ in range(num_prestamos):
+        anio = rnd.randint(hoy.year - 3, hoy.year)
+        mes = rnd.randint(1, 12)
+        inicio = date(anio, mes, 15) if rnd.random() < 0.5 else end_of_month(date(anio, mes, 1))
+        prestamos.append(Prestamo(
+            trabajador=rnd.choice(trabajadores),
+            monto=Decimal(rnd.randrange(50, 1000, 25)),
+            interes=Decimal("3"),
+            comision=Decimal("10"),
+            plazo=rnd.choice((4, 6, 8, 10, 12)),
+            fecha_inicio=inicio,
+        ))
+
+    planes = []
+    for prestamo in prestamos:
+        plan = prestamo.construir_cuotas()
+        prestamo.fecha_final = plan[-1].fecha_pago
+        planes.append(plan)
+    Prestamo.objects.bulk_create(prestamos, batch_size=BATCH_SIZE)
+
+    cuotas = []
+    for prestamo, plan in zip(prestamos, planes):
+        for cuota in plan:
+            cuota.prestamo = prestamo
+            if cuota.fecha_pago < hoy:
+                cuota.estado = "Pagado"
+                cuota.cheque = f"CH-{cuota.fecha_pago:%Y%m%d}-{prestamo.trabajador.campus.nombre[:3]}"
+        cuotas.extend(plan)
+    Cuota.objects.bulk_create(cuotas, batch_size=BATCH_SIZE)
+    estado_cuenta.reconstruir()
+
+    return len(trabajadores), len(prestamos), len(cuotas)
+
+
+def sembrar_clases(num_instructores, num_clases, hoy=None, semilla=7):
+    """Crea instructores y clases (Task) con bulk_create, repartidos en el último año."""
+    rnd = random.Random(semilla)
+    hoy = hoy or date.today()
+
+    instructores = Instructor.objects.bulk_create(
+        [Instructor(nombre=f"Instructor {i}") for i in range(num_instructores)],
+        batch_size=BATCH_SIZE,
+    )
+    horas = [time(h, 0) for h in range(7, 18)]
+
+    clases = []
+    for i in range(num_clases):
+        inicio = hoy - timedelta(days=rnd.randint(0, 365))
+        hora = rnd.choice(horas)
+        clases.append(Task(
+            title=f"Clase {i}",
+            fecha_inicio=inicio,
+            fecha_fin=inicio + timedelta(days=rnd.choice((7, 14, 21, 28))),
+            hora=hora,
+            hora_fin=sumar_minutos(hora, DURACION_PREDETERMINADA),
+            instructor=rnd.choice(instructores),
+        ))
+    Task.objects.bulk_create(clases, batch_size=BATCH_SIZE)
+    informe.reconstruir()
+
+    return len(instructores), len(clases)
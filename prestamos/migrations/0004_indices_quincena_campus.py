@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prestamos', '0003_prestamo_correo_enviado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cuota',
+            index=models.Index(fields=['estado', 'fecha_pago'], name='cuota_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cuota',
+            index=models.Index(condition=models.Q(('estado', 'Pendiente')), fields=['fecha_pago', 'prestamo'], name='cuota_pendiente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trabajador',
+            index=models.Index(fields=['campus'], name='trabajador_campus_idx'),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:22
+
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CAMPUS_CONOCIDOS = {
+    "leon": "LEÓN",
+    "managua": "MANAGUA",
+    "matagalpa": "MATAGALPA",
+}
+
+
+def _clave(texto):
+    sin_tildes = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+    return " ".join(sin_tildes.lower().split())
+
+
+def normalizar_campus(texto):
+    """Mapea el texto libre histórico ('Leon', ' león ', 'Campus Managua'...) a un nombre canónico."""
+    clave = _clave(texto)
+    if not clave:
+        return None
+    for fragmento, nombre in CAMPUS_CONOCIDOS.items():
+        if fragmento in clave:
+            return nombre
+    # Campus no reconocido: se conserva en mayúsculas en vez de descartarlo
+    return " ".join(texto.upper().split())
+
+
+def texto_a_campus(apps, schema_editor):
+    Campus = apps.get_model("prestamos", "Campus")
+    Trabajador = apps.get_model("prestamos", "Trabajador")
+
+    for nombre in CAMPUS_CONOCIDOS.values():
+        Campus.objects.get_or_create(nombre=nombre)
+
+    textos = Trabajador.objects.values_list("campus_texto", flat=True).distinct()
+    for texto in textos:
+        nombre = normalizar_campus(texto or "")
+        if nombre is None:
+            continue
+        campus, _ = Campus.objects.get_or_create(nombre=nombre)
+        Trabajador.objects.filter(campus_texto=texto).update(campus=campus)
+
+
+def campus_a_texto(apps, schema_editor):
+    Campus = apps.get_model("prestamos", "Campus")
+    Trabajador = apps.get_model("prestamos", "Trabajador")
+
+    for campus in Campus.objects.all():
+        Trabajador.objects.filter(campus=campus).update(campus_texto=campus.nombre)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prestamos', '0004_indices_quincena_campus'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=80, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'campus',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='trabajador',
+            name='trabajador_campus_idx',
+        ),
+        migrations.RenameField(
+            model_name='trabajador',
+            old_name='campus',
+            new_name='campus_texto',
+        ),
+        migrations.AddField(
+            model_name='trabajador',
+            name='campus',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='trabajadores', to='prestamos.campus'),
+        ),
+        migrations.RunPython(texto_a_campus, campus_a_texto),
+        migrations.RemoveField(
+            model_name='trabajador',
+            name='campus_texto',
+        ),
+    ]
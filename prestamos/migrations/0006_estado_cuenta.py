@@ -0,0 +1,106 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:26
+
+import django.db.models.deletion
+from datetime import date
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+# Movimientos que antes estaban fijos en views.estado_cuenta_general
+MOVIMIENTOS_MANUALES = [
+    (date(2025, 1, 1), 'Capital inicial', 'capital', Decimal('0.00'), Decimal('14200.00')),
+    (date(2025, 10, 16), 'Remanente', 'manual', Decimal('10939.42'), Decimal('0.00')),
+]
+
+
+def construir_libro(apps, schema_editor):
+    MovimientoCuenta = apps.get_model('prestamos', 'MovimientoCuenta')
+    ResumenCuenta = apps.get_model('prestamos', 'ResumenCuenta')
+    Prestamo = apps.get_model('prestamos', 'Prestamo')
+    Cuota = apps.get_model('prestamos', 'Cuota')
+    Campus = apps.get_model('prestamos', 'Campus')
+
+    movimientos = [
+        MovimientoCuenta(fecha=fecha, descripcion=descripcion, tipo=tipo, debito=debito, credito=credito)
+        for fecha, descripcion, tipo, debito, credito in MOVIMIENTOS_MANUALES
+    ]
+
+    for p in Prestamo.objects.select_related('trabajador').order_by('id'):
+        movimientos.append(MovimientoCuenta(
+            fecha=p.fecha_inicio,
+            descripcion=f'Préstamo #{p.id} - {p.trabajador.codigo} - {p.trabajador.nombre}',
+            debito=p.monto,
+            tipo='prestamo',
+            prestamo=p,
+        ))
+
+    nombres = dict(Campus.objects.values_list('id', 'nombre'))
+    pagos = (
+        Cuota.objects
+        .filter(estado='Pagado')
+        .values_list('cheque', 'fecha_pago', 'prestamo__trabajador__campus')
+        .annotate(total=Sum('monto_total'))
+        .order_by('fecha_pago', 'cheque', 'prestamo__trabajador__campus')
+    )
+    for cheque, fecha, campus_id, total in pagos:
+        movimientos.append(MovimientoCuenta(
+            fecha=fecha,
+            descripcion=f'Cheque {cheque} - Campus {nombres.get(campus_id)}',
+            credito=total,
+            tipo='pago',
+            cheque=cheque,
+            campus_id=campus_id,
+        ))
+
+    # Mismo orden que el extracto original (estable por fecha) y saldo acumulado
+    movimientos.sort(key=lambda m: m.fecha)
+    saldo = Decimal('0.00')
+    total_debitos = total_creditos = Decimal('0.00')
+    for mov in movimientos:
+        saldo += mov.credito - mov.debito
+        mov.saldo = saldo
+        total_debitos += mov.debito
+        total_creditos += mov.credito
+
+    MovimientoCuenta.objects.bulk_create(movimientos, batch_size=2000)
+    ResumenCuenta.objects.update_or_create(
+        pk=1, defaults={'total_debitos': total_debitos, 'total_creditos': total_creditos},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prestamos', '0005_campus'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCuenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_debitos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_creditos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MovimientoCuenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('descripcion', models.CharField(max_length=200)),
+                ('debito', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('credito', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('saldo', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('tipo', models.CharField(choices=[('capital', 'Capital'), ('manual', 'Manual'), ('prestamo', 'Préstamo'), ('pago', 'Pago')], default='manual', max_length=10)),
+                ('cheque', models.CharField(blank=True, default='', max_length=30)),
+                ('campus', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos', to='prestamos.campus')),
+                ('prestamo', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='movimiento', to='prestamos.prestamo')),
+            ],
+            options={
+                'ordering': ['fecha', 'id'],
+                'indexes': [models.Index(fields=['fecha', 'id'], name='movimiento_fecha_idx'), models.Index(fields=['tipo', 'fecha', 'cheque'], name='movimiento_pago_idx')],
+            },
+        ),
+        migrations.RunPython(construir_libro, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prestamos', '0006_estado_cuenta'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trabajo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('pdf_cuotas', 'PDF de deducción'), ('correo_prestamo', 'Correo de préstamo')], max_length=20)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('En proceso', 'En proceso'), ('Completado', 'Completado'), ('Fallido', 'Fallido')], default='Pendiente', max_length=12)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('max_intentos', models.PositiveSmallIntegerField(default=5)),
+                ('disponible_en', models.DateTimeField(default=django.utils.timezone.now, help_text='No se ejecuta antes de esta hora (reintentos)')),
+                ('error', models.TextField(blank=True, default='')),
+                ('nombre_archivo', models.CharField(blank=True, default='', max_length=150)),
+                ('resultado', models.BinaryField(blank=True, null=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-creado'],
+                'indexes': [models.Index(condition=models.Q(('estado', 'Pendiente')), fields=['disponible_en', 'id'], name='trabajo_pendiente_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prestamos', '0007_trabajos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trabajo',
+            name='tipo',
+            field=models.CharField(choices=[('pdf_cuotas', 'PDF de deducción'), ('pdf_cuotas_lote', 'PDF de deducción (todos los campus)'), ('correo_prestamo', 'Correo de préstamo')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-17 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prestamos', '0008_trabajo_pdf_lote'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cuota',
+            name='cuota_pendiente_fecha_idx',
+        ),
+        migrations.AddIndex(
+            model_name='cuota',
+            index=models.Index(condition=models.Q(('estado__in', ('Pendiente', 'Reprogramado'))), fields=['fecha_pago', 'prestamo'], name='cuota_pendiente_fecha_idx'),
+        ),
+    ]
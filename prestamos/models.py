@@ -1,14 +1,41 @@
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.utils import timezone
 from datetime import date
 from decimal import Decimal, ROUND_HALF_UP
-from .utils import end_of_month, is_end_of_month, next_15_or_eom
+from .utils import next_15_or_eom, quincenas_desde
 
 TWO = Decimal('0.01')
+# Cuotas por cobrar: las reprogramadas se cobran en su nueva fecha
+ESTADOS_ABIERTOS = ("Pendiente", "Reprogramado")
+
+class Campus(models.Model):
+    CACHE_KEY = "prestamos:campus"
+
+    nombre = models.CharField(max_length=80, unique=True)
+
+    class Meta:
+        ordering = ["nombre"]
+        verbose_name_plural = "campus"
+
+    def __str__(self):
+        return self.nombre
+
+    @classmethod
+    def lista(cls):
+        """Todos los campus, cacheados (la tabla casi nunca cambia). Se invalida en signals.py."""
+        campus = cache.get(cls.CACHE_KEY)
+        if campus is None:
+            campus = list(cls.objects.all())
+            cache.set(cls.CACHE_KEY, campus, None)
+        return campus
+
 
 class Trabajador(models.Model):
     codigo = models.CharField(max_length=10, unique=True)
     nombre = models.CharField(max_length=120)
-    campus = models.CharField(max_length=80, blank=True, default="")
+    campus = models.ForeignKey(Campus, on_delete=models.PROTECT, related_name="trabajadores", blank=True, null=True)
 
     def __str__(self):
         return f"{self.codigo} - {self.nombre}"
@@ -35,10 +62,8 @@ class Prestamo(models.Model):
         comision_base = (comision_total / Decimal(self.plazo)).quantize(TWO, rounding=ROUND_HALF_UP)
         return principal_base, comision_base, interes_mensual, comision_total,interes_total
 
-    def generar_cuotas(self):
-        """Regenera todas las cuotas del préstamo con fechas alternando 15 y fin de mes."""
-        self.cuotas.all().delete()
-
+    def construir_cuotas(self):
+        """Calcula en memoria el plan de pagos (15 y fin de mes) sin tocar la base de datos."""
         principal_base, comision_base, interes_base, comision_total, interes_total = self.calcular_fijos()
 
         # Ajustes de última cuota para cuadrar redondeos:
@@ -53,18 +78,17 @@ class Prestamo(models.Model):
         ultimo_interes = (interes_total - suma_interes).quantize(TWO, rounding=ROUND_HALF_UP)
 
 
-        # Normalizar primera fecha: si no es 15/EOM, llevar a 15 o EOM según regla
-        f = self.fecha_inicio
-        if f.day != 15 and not is_end_of_month(f):
-            f = f.replace(day=15) if f.day <= 15 else end_of_month(f)
+        # Fechas del calendario de quincenas; si la primera no es 15/EOM se lleva a 15 o EOM según regla
+        fechas = quincenas_desde(self.fecha_inicio, self.plazo)
 
-        for i in range(1, self.plazo + 1):
+        cuotas = []
+        for i, f in enumerate(fechas, start=1):
             principal_i = principal_base if i < self.plazo else ultimo_principal
             comision_i = comision_base if i < self.plazo else ultimo_comision
             interes_i   = interes_base if i < self.plazo else ultimo_interes
             total_i = (principal_i + comision_i + interes_i).quantize(TWO, rounding=ROUND_HALF_UP)
 
-            Cuota.objects.create(
+            cuotas.append(Cuota(
                 prestamo=self,
                 numero=i,
                 principal=principal_i,
@@ -73,11 +97,79 @@ class Prestamo(models.Model):
                 monto_total=total_i,
                 fecha_pago=f,
                 estado="Pendiente",
-            )
-            f = next_15_or_eom(f)
+            ))
+
+        return cuotas
+
+    def resumen_cuotas(self):
+        """Cuotas del préstamo y sus totales calculados en una sola pasada.
 
-        self.fecha_final = self.cuotas.order_by("numero").last().fecha_pago
+        Usa las cuotas precargadas (prefetch_related) si las hay. Devuelve (cuotas, totales) donde
+        totales tiene principal, comision, interes, monto_total, pagado y pendiente.
+        """
+        cuotas = list(self.cuotas.all())
+        totales = dict.fromkeys(("principal", "comision", "interes", "monto_total", "pagado", "pendiente"), Decimal("0.00"))
+        for c in cuotas:
+            totales["principal"] += c.principal
+            totales["comision"] += c.comision
+            totales["interes"] += c.interes
+            totales["monto_total"] += c.monto_total
+            totales["pagado" if c.estado == "Pagado" else "pendiente"] += c.monto_total
+        return cuotas, totales
+
+    def actualizar_cuotas(self, recalendarizar=False):
+        """Aplica el plan recalculado solo donde cambió (tras editar el préstamo).
+
+        Las cuotas Pagado y Reprogramado no se tocan (conservan cheque, fecha y observación);
+        las pendientes se actualizan si cambió su monto, se crean las que faltan y se borran
+        las pendientes que sobran si bajó el plazo. La fecha de pago solo se reescribe con
+        `recalendarizar` (cambió fecha_inicio o plazo): una fecha movida a mano se conserva.
+        Devuelve (creadas, actualizadas, borradas).
+        """
+        campos = ("principal", "comision", "interes", "monto_total")
+        if recalendarizar:
+            campos += ("fecha_pago",)
+        actuales = {c.numero: c for c in self.cuotas.all()}
+
+        crear, actualizar = [], []
+        for nueva in self.construir_cuotas():
+            actual = actuales.pop(nueva.numero, None)
+            if actual is None:
+                crear.append(nueva)
+            elif actual.estado == "Pendiente" and any(getattr(actual, f) != getattr(nueva, f) for f in campos):
+                for f in campos:
+                    setattr(actual, f, getattr(nueva, f))
+                actualizar.append(actual)
+
+        # Lo que queda en `actuales` está fuera del nuevo plazo
+        borrar = [c.pk for c in actuales.values() if c.estado == "Pendiente"]
+
+        if borrar:
+            Cuota.objects.filter(pk__in=borrar).delete()
+        if actualizar:
+            Cuota.objects.bulk_update(actualizar, campos)
+        if crear:
+            Cuota.objects.bulk_create(crear)
+        if borrar or actualizar or crear:
+            from .kpis import CUOTAS, invalidar
+            invalidar(CUOTAS)  # bulk_update/bulk_create no disparan señales
+
+        fecha_final = self.cuotas.order_by("-fecha_pago").values_list("fecha_pago", flat=True).first()
+        if fecha_final != self.fecha_final:
+            self.fecha_final = fecha_final
+            self.save(update_fields=["fecha_final"])
+        return len(crear), len(actualizar), len(borrar)
+
+    def generar_cuotas(self):
+        """Regenera todas las cuotas del préstamo con un solo bulk_create."""
+        self.cuotas.all().delete()
+
+        cuotas = Cuota.objects.bulk_create(self.construir_cuotas())
+
+        # La última cuota del plan ya está en memoria: no hace falta volver a consultar
+        self.fecha_final = cuotas[-1].fecha_pago if cuotas else None
         self.save(update_fields=["fecha_final"])
+        return cuotas
 
 
 class Cuota(models.Model):
@@ -101,16 +193,29 @@ class Cuota(models.Model):
     class Meta:
         unique_together = ("prestamo", "numero")
         ordering = ["numero"]
+        indexes = [
+            # Filtros por estado + quincena (resumen, estado de cuenta, cancelación masiva)
+            models.Index(fields=["estado", "fecha_pago"], name="cuota_estado_fecha_idx"),
+            # Solo las abiertas: el resumen por quincena no recorre el historial pagado
+            models.Index(
+                fields=["fecha_pago", "prestamo"],
+                condition=models.Q(estado__in=ESTADOS_ABIERTOS),
+                name="cuota_pendiente_fecha_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Cuota {self.numero}/{self.prestamo.plazo} - {self.estado}"
 
     # === Métodos de gestión ===
     def aplicar_pago(self, cheque):
-        """Marca la cuota como pagada asignando cheque."""
+        """Marca la cuota como pagada asignando cheque y la registra en el estado de cuenta."""
+        from .estado_cuenta import registrar_pagos
+
         self.cheque = cheque
         self.estado = "Pagado"
         self.save()
+        registrar_pagos([(self.fecha_pago, self.cheque, self.prestamo.trabajador.campus_id, self.monto_total)])
 
     def reprogramar(self, motivo=""):
         """Corre la fecha de pago a la siguiente quincena y agrega observación."""
@@ -121,9 +226,111 @@ class Cuota(models.Model):
             self.save()
 
     def sync_estado(self):
-        """Asegura coherencia: si hay cheque => Pagado; si no => Pendiente."""
-        if self.cheque:
-            self.estado = "Pagado"
-        elif self.estado != "Reprogramado":  # respetamos reprogramados
-            self.estado = "Pendiente"
-        self.save(update_fields=["estado"])
\ No newline at end of file
+        """Asegura coherencia: si hay cheque => Pagado; si no => Pendiente (y ajusta el estado de cuenta)."""
+        from .estado_cuenta import actualizar_cuota
+
+        with transaction.atomic():
+            anterior = (
+                Cuota.objects.select_for_update(of=("self",))
+                .select_related("prestamo__trabajador").get(pk=self.pk)
+            )
+            if self.cheque:
+                self.estado = "Pagado"
+            elif self.estado != "Reprogramado":  # respetamos reprogramados
+                self.estado = "Pendiente"
+            self.save(update_fields=["estado", "cheque"])
+            actualizar_cuota(self, anterior)
+
+class MovimientoCuenta(models.Model):
+    """Libro del estado de cuenta general con saldo acumulado ya calculado (orden: fecha, id)."""
+    TIPOS = (
+        ("capital", "Capital"),
+        ("manual", "Manual"),
+        ("prestamo", "Préstamo"),
+        ("pago", "Pago"),
+    )
+
+    fecha = models.DateField()
+    descripcion = models.CharField(max_length=200)
+    debito = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    credito = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    saldo = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    tipo = models.CharField(max_length=10, choices=TIPOS, default="manual")
+    prestamo = models.OneToOneField(Prestamo, on_delete=models.CASCADE, related_name="movimiento", blank=True, null=True)
+    cheque = models.CharField(max_length=30, blank=True, default="")
+    campus = models.ForeignKey(Campus, on_delete=models.SET_NULL, related_name="movimientos", blank=True, null=True)
+
+    class Meta:
+        ordering = ["fecha", "id"]
+        indexes = [
+            models.Index(fields=["fecha", "id"], name="movimiento_fecha_idx"),
+            # Agrupación de pagos: un movimiento por cheque, quincena y campus
+            models.Index(fields=["tipo", "fecha", "cheque"], name="movimiento_pago_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.descripcion}"
+
+
+class ResumenCuenta(models.Model):
+    """Totales globales del estado de cuenta (una sola fila, se mantiene junto con el libro)."""
+    total_debitos = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    total_creditos = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    @classmethod
+    def actual(cls):
+        return cls.objects.get_or_create(pk=1)[0]
+
+    @property
+    def saldo(self):
+        return self.total_creditos - self.total_debitos
+
+
+class Trabajo(models.Model):
+    """Tarea en segundo plano (PDF masivo, correo) que ejecuta `manage.py procesar_trabajos`.
+
+    La cola vive en la misma base de datos; el resultado (PDF) se guarda en la fila para que el
+    worker y el servidor web no necesiten compartir disco.
+    """
+    TIPOS = (
+        ("pdf_cuotas", "PDF de deducción"),
+        ("pdf_cuotas_lote", "PDF de deducción (todos los campus)"),
+        ("correo_prestamo", "Correo de préstamo"),
+    )
+    ESTADOS = (
+        ("Pendiente", "Pendiente"),
+        ("En proceso", "En proceso"),
+        ("Completado", "Completado"),
+        ("Fallido", "Fallido"),
+    )
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=12, choices=ESTADOS, default="Pendiente")
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+    disponible_en = models.DateTimeField(default=timezone.now, help_text="No se ejecuta antes de esta hora (reintentos)")
+    error = models.TextField(blank=True, default="")
+    nombre_archivo = models.CharField(max_length=150, blank=True, default="")
+    resultado = models.BinaryField(blank=True, null=True, editable=False)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, related_name="trabajos", blank=True, null=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-creado"]
+        indexes = [
+            # El worker solo busca pendientes ya disponibles
+            models.Index(
+                fields=["disponible_en", "id"],
+                condition=models.Q(estado="Pendiente"),
+                name="trabajo_pendiente_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.id} - {self.estado}"
+
+    @property
+    def terminado(self):
+        return self.estado in ("Completado", "Fallido")
@@ -0,0 +1,53 @@
+"""Caché en disco de los PDF de cada préstamo.
+
+La versión de un documento es el hash del HTML (y CSS) que se le pasa a WeasyPrint: cualquier cambio
+en el préstamo, sus cuotas, el trabajador o la plantilla produce otra versión, y las descargas repetidas
+de un documento sin cambios se sirven desde disco sin volver a renderizar.
+"""
+import hashlib
+import os
+import re
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from weasyprint import CSS, HTML
+
+
+def _carpeta(prestamo_id):
+    base = Path(getattr(settings, "PDF_CACHE_DIR", Path(settings.MEDIA_ROOT) / "pdf_cache"))
+    return base / str(prestamo_id)
+
+
+LARGO_VERSION = 20
+
+
+def version_documento(html, css=""):
+    return hashlib.sha256(f"{html}\0{css}".encode("utf-8")).hexdigest()[:LARGO_VERSION]
+
+
+def pdf_prestamo(prestamo_id, tipo, html, css="", base_url=None):
+    """Devuelve el PDF (bytes) del documento `tipo` del préstamo, renderizándolo solo si cambió."""
+    carpeta = _carpeta(prestamo_id)
+    ruta = carpeta / f"{tipo}-{version_documento(html, css)}.pdf"
+    if ruta.exists():
+        return ruta.read_bytes()
+
+    stylesheets = [CSS(string=css)] if css else None
+    pdf = HTML(string=html, base_url=base_url).write_pdf(stylesheets=stylesheets)
+
+    carpeta.mkdir(parents=True, exist_ok=True)
+    # Solo se guarda la versión vigente de cada tipo de documento
+    # (nombre exacto: "{tipo}-*" también atraparía otro tipo que empiece igual, p.ej. "plan" y "plan-firmado")
+    version = re.compile(rf"{re.escape(tipo)}-[0-9a-f]{{{LARGO_VERSION}}}")
+    for vieja in carpeta.glob("*.pdf"):
+        if version.fullmatch(vieja.stem):
+            vieja.unlink(missing_ok=True)
+    temporal = ruta.with_suffix(f".{os.getpid()}.tmp")
+    temporal.write_bytes(pdf)
+    temporal.replace(ruta)  # atómico: otro proceso nunca lee un PDF a medio escribir
+    return pdf
+
+
+def borrar_pdfs(prestamo_id):
+    shutil.rmtree(_carpeta(prestamo_id), ignore_errors=True)
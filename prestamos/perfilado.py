@@ -0,0 +1,171 @@
+"""Perfilado de requests (opcional, PERFILAR=1).
+
+Por cada request se mide: vista resuelta, tiempo total, cantidad y tiempo de SQL (con
+connection.execute_wrapper en todas las conexiones), consultas repetidas, tiempo de plantillas y de
+WeasyPrint. Cada medición va al log `prestamos.perfilado` como una línea JSON y a un buffer circular
+en memoria (PERFILAR_VENTANA requests) que resume la página /perfilado/ para staff.
+"""
+import functools
+import json
+import logging
+import statistics
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+MAX_SQL_POR_REQUEST = 5  # consultas repetidas que se guardan por request (el buffer no crece con el SQL)
+
+_medicion = ContextVar("perfilado_medicion", default=None)
+_buffer = deque(maxlen=getattr(settings, "PERFILAR_VENTANA", 500))
+
+
+class _Medicion:
+    def __init__(self):
+        self.sql_ms = 0.0
+        self.consultas = Counter()  # (sql, params) -> veces
+        self.plantillas_ms = 0.0
+        self.pdf_ms = 0.0
+        self.anidado = set()  # métodos instrumentados en curso (render dentro de render no se suma dos veces)
+
+
+def _sql(execute, sql, params, many, context):
+    medicion = _medicion.get()
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if medicion is not None:
+            medicion.sql_ms += (time.perf_counter() - inicio) * 1000
+            medicion.consultas[(sql, repr(params))] += 1
+
+
+def _instrumentar(clase, metodo, campo):
+    """Suma a la medición actual el tiempo de clase.metodo (solo la llamada más externa)."""
+    original = getattr(clase, metodo)
+    if getattr(original, "_perfilado", False):
+        return
+
+    @functools.wraps(original)
+    def medido(*args, **kwargs):
+        medicion = _medicion.get()
+        if medicion is None or campo in medicion.anidado:
+            return original(*args, **kwargs)
+        medicion.anidado.add(campo)
+        inicio = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            medicion.anidado.discard(campo)
+            setattr(medicion, campo, getattr(medicion, campo) + (time.perf_counter() - inicio) * 1000)
+
+    medido._perfilado = True
+    setattr(clase, metodo, medido)
+
+
+def _instrumentar_todo():
+    from django.template.backends.django import Template
+    from weasyprint import HTML
+
+    _instrumentar(Template, "render", "plantillas_ms")
+    _instrumentar(HTML, "render", "pdf_ms")
+    _instrumentar(HTML, "write_pdf", "pdf_ms")
+
+
+class PerfiladoMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _instrumentar_todo()
+
+    def __call__(self, request):
+        medicion = _Medicion()
+        token = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conexion in connections.all():
+                    stack.enter_context(conexion.execute_wrapper(_sql))
+                # Incluye el render de las TemplateResponse; el contenido de respuestas en flujo
+                # (exportaciones) se genera después y no se mide
+                response = self.get_response(request)
+        finally:
+            _medicion.reset(token)
+
+        registrar(request, response, medicion, (time.perf_counter() - inicio) * 1000)
+        return response
+
+
+def registrar(request, response, medicion, total_ms):
+    repetidas = Counter()
+    for (sql, _), veces in medicion.consultas.items():
+        repetidas[sql] += veces
+    match = getattr(request, "resolver_match", None)
+    registro = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "vista": match.view_name if match else "sin_ruta",
+        "metodo": request.method,
+        "ruta": request.path,
+        "status": response.status_code,
+        "ms": round(total_ms, 1),
+        "sql": sum(medicion.consultas.values()),
+        "sql_ms": round(medicion.sql_ms, 1),
+        # Misma consulta con los mismos parámetros más de una vez en el request
+        "duplicadas": sum(veces - 1 for veces in medicion.consultas.values() if veces > 1),
+        "plantillas_ms": round(medicion.plantillas_ms, 1),
+        "pdf_ms": round(medicion.pdf_ms, 1),
+        # Mismo SQL (cualquier parámetro) repetido: el patrón N+1
+        "repetidas": [[sql, veces] for sql, veces in repetidas.most_common(MAX_SQL_POR_REQUEST) if veces > 1],
+    }
+    _buffer.append(registro)
+    logger.info(json.dumps(registro, ensure_ascii=False))
+    return registro
+
+
+def resumen():
+    """Endpoints más lentos y SQL más repetido en la ventana actual del buffer."""
+    registros = list(_buffer)
+    por_vista = {}
+    for r in registros:
+        por_vista.setdefault(r["vista"], []).append(r)
+
+    vistas = []
+    for vista, filas in por_vista.items():
+        tiempos = sorted(r["ms"] for r in filas)
+        vistas.append({
+            "vista": vista,
+            "requests": len(filas),
+            "ms_mediana": round(statistics.median(tiempos), 1),
+            "ms_p95": tiempos[max(0, int(len(tiempos) * 0.95) - 1)],
+            "ms_max": tiempos[-1],
+            "sql_promedio": round(sum(r["sql"] for r in filas) / len(filas), 1),
+            "sql_ms_promedio": round(sum(r["sql_ms"] for r in filas) / len(filas), 1),
+            "plantillas_ms_promedio": round(sum(r["plantillas_ms"] for r in filas) / len(filas), 1),
+            "pdf_ms_promedio": round(sum(r["pdf_ms"] for r in filas) / len(filas), 1),
+            "duplicadas_max": max(r["duplicadas"] for r in filas),
+        })
+    vistas.sort(key=lambda v: v["ms_p95"], reverse=True)
+
+    sql = Counter()
+    vistas_sql = {}
+    for r in registros:
+        for texto, veces in r["repetidas"]:
+            sql[texto] += veces
+            vistas_sql.setdefault(texto, set()).add(r["vista"])
+
+    return {
+        "activo": "prestamos.perfilado.PerfiladoMiddleware" in settings.MIDDLEWARE,
+        "ventana": _buffer.maxlen,
+        "registros": len(registros),
+        "vistas": vistas,
+        "sql_repetido": [
+            {"sql": texto, "veces": veces, "vistas": sorted(vistas_sql[texto])}
+            for texto, veces in sql.most_common(20)
+        ],
+        "recientes": registros[-20:][::-1],
+    }
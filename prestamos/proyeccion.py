@@ -0,0 +1,128 @@
+"""Proyección del flujo de caja por quincena y campus.
+
+Las cuotas abiertas se leen con un solo values_list y se agrupan con pandas; los préstamos nuevos se
+proyectan con el ritmo de colocación de los últimos meses y su plan de pagos promedio (convolución).
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from .models import ESTADOS_ABIERTOS, Cuota, Prestamo
+from .utils import quincenas_desde
+
+SIN_CAMPUS = "SIN CAMPUS"
+
+
+def _a_quincena(fechas):
+    """Lleva cada fecha a su quincena: día <= 15 al 15, el resto a fin de mes (vectorizado)."""
+    dia_15 = fechas.dt.to_period("M").dt.to_timestamp() + pd.Timedelta(days=14)
+    return dia_15.where(fechas.dt.day <= 15, fechas + pd.offsets.MonthEnd(0))
+
+
+def _por_campus(tabla):
+    return {campus: [round(float(v), 2) for v in tabla[campus]] for campus in tabla.columns}
+
+
+def _cartera(hoy, indice):
+    """(cuotas abiertas por quincena x campus, vencido por campus)."""
+    filas = (
+        Cuota.objects
+        .filter(estado__in=ESTADOS_ABIERTOS, fecha_pago__lte=indice[-1].date())
+        .values_list("fecha_pago", "prestamo__trabajador__campus__nombre", "monto_total")
+    )
+    cuotas = pd.DataFrame.from_records(list(filas), columns=["fecha", "campus", "monto"])
+    cuotas["fecha"] = pd.to_datetime(cuotas["fecha"])
+    cuotas["campus"] = cuotas["campus"].fillna(SIN_CAMPUS)
+    cuotas["monto"] = cuotas["monto"].astype(float)
+
+    vencidas = cuotas["fecha"] < pd.Timestamp(hoy)
+    vencido = cuotas[vencidas].groupby("campus")["monto"].sum()
+
+    futuras = cuotas[~vencidas]
+    cartera = (
+        futuras.assign(quincena=_a_quincena(futuras["fecha"]))
+        .groupby(["quincena", "campus"])["monto"].sum()
+        .unstack(fill_value=0.0)
+        .reindex(indice, fill_value=0.0)
+    )
+    return cartera, vencido
+
+
+def _nuevos(hoy, indice, historia_meses):
+    """(colocación proyectada, cobros de esos préstamos) por quincena x campus.
+
+    Cada campus coloca por quincena el promedio de los últimos `historia_meses`; cada préstamo
+    se cobra en `plazo` cuotas iguales desde su quincena de inicio (plazo y recargo promedio
+    ponderados por monto).
+    """
+    filas = (
+        Prestamo.objects
+        .filter(fecha_inicio__gte=hoy - relativedelta(months=historia_meses), fecha_inicio__lt=hoy)
+        .values_list("trabajador__campus__nombre", "monto", "interes", "comision", "plazo")
+    )
+    prestamos = pd.DataFrame.from_records(list(filas), columns=["campus", "monto", "interes", "comision", "plazo"])
+    colocacion = pd.DataFrame(index=indice)
+    cobros = pd.DataFrame(index=indice)
+    if prestamos.empty:
+        return colocacion, cobros
+
+    prestamos["campus"] = prestamos["campus"].fillna(SIN_CAMPUS)
+    for campo in ("monto", "interes", "comision", "plazo"):
+        prestamos[campo] = prestamos[campo].astype(float)
+    # Total a cobrar por préstamo: monto + comisión + interés quincenal fijo durante el plazo
+    prestamos["a_cobrar"] = prestamos["monto"] * (
+        1 + prestamos["comision"] / 100 + prestamos["interes"] / 100 / 2 * prestamos["plazo"]
+    )
+    prestamos["plazo_x_monto"] = prestamos["plazo"] * prestamos["monto"]
+    por_campus = prestamos.groupby("campus")[["monto", "a_cobrar", "plazo_x_monto"]].sum()
+
+    n = len(indice)
+    for campus, fila in por_campus.iterrows():
+        por_quincena = np.full(n, fila["monto"] / (historia_meses * 2))
+        plazo = max(1, int(round(fila["plazo_x_monto"] / fila["monto"])))
+        plan = np.full(plazo, fila["a_cobrar"] / fila["monto"] / plazo)
+        colocacion[campus] = por_quincena
+        cobros[campus] = np.convolve(por_quincena, plan)[:n]
+    return colocacion, cobros
+
+
+def proyectar_flujo(meses=12, hoy=None, historia_meses=12):
+    """Ingresos esperados por quincena y campus para los próximos `meses` (listo para JSON)."""
+    hoy = hoy or date.today()
+    quincenas = quincenas_desde(hoy, meses * 2)
+    indice = pd.DatetimeIndex(quincenas)
+
+    cartera, vencido = _cartera(hoy, indice)
+    colocacion, cobros = _nuevos(hoy, indice, historia_meses)
+
+    campus = sorted(set(cartera.columns) | set(cobros.columns) | set(vencido.index))
+    cartera = cartera.reindex(columns=campus, fill_value=0.0)
+    cobros = cobros.reindex(columns=campus, fill_value=0.0)
+    colocacion = colocacion.reindex(columns=campus, fill_value=0.0)
+    vencido = vencido.reindex(campus, fill_value=0.0)
+
+    total_cartera = cartera.sum(axis=1)
+    total_nuevos = cobros.sum(axis=1)
+    return {
+        "generado": hoy.isoformat(),
+        "meses": meses,
+        "quincenas": [q.isoformat() for q in quincenas],
+        "campus": campus,
+        "cartera": _por_campus(cartera),
+        "nuevos": _por_campus(cobros),
+        "colocacion": _por_campus(colocacion),
+        "vencido": {c: round(float(v), 2) for c, v in vencido.items()},
+        "totales": {
+            "cartera": [round(float(v), 2) for v in total_cartera],
+            "nuevos": [round(float(v), 2) for v in total_nuevos],
+            "total": [round(float(v), 2) for v in total_cartera + total_nuevos],
+        },
+        "resumen": {
+            "cartera": round(float(total_cartera.sum()), 2),
+            "nuevos": round(float(total_nuevos.sum()), 2),
+            "total": round(float(total_cartera.sum() + total_nuevos.sum()), 2),
+            "vencido": round(float(vencido.sum()), 2),
+        },
+    }
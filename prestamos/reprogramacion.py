@@ -0,0 +1,58 @@
+"""Reprogramación masiva: cuando un campus no paga una quincena se corre todo el plan.
+
+Cada préstamo con una cuota abierta en la quincena omitida mueve esa cuota y todas sus cuotas
+abiertas posteriores una quincena hacia adelante, así el plan sigue sin huecos. Todo se hace con
+UPDATEs por conjunto dentro de una transacción: uno para las cuotas (CASE por fecha de pago) y
+otro para `Prestamo.fecha_final`. Las cuotas pendientes no están en el estado de cuenta, así que
+el libro no cambia.
+"""
+from django.db import transaction
+from django.db.models import Case, CharField, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Concat
+
+from . import kpis
+from .models import ESTADOS_ABIERTOS, Cuota, Prestamo
+from .utils import siguiente_quincena
+
+
+@transaction.atomic
+def reprogramar_quincena(fecha, campus=None, motivo=""):
+    """Corre una quincena las cuotas abiertas desde `fecha` de los préstamos que debían pagar ese día.
+
+    `campus` es el nombre del campus (None = todos). Devuelve (préstamos, cuotas) movidos.
+    """
+    en_quincena = Cuota.objects.filter(fecha_pago=fecha, estado__in=ESTADOS_ABIERTOS)
+    if campus:
+        en_quincena = en_quincena.filter(prestamo__trabajador__campus__nombre=campus)
+
+    # 🔒 Bloqueamos los préstamos afectados: una edición o cancelación simultánea espera a que terminemos
+    prestamos = list(
+        Prestamo.objects.select_for_update()
+        .filter(pk__in=en_quincena.values("prestamo_id"))
+        .values_list("pk", flat=True)
+    )
+    if not prestamos:
+        return 0, 0
+
+    cuotas = Cuota.objects.filter(prestamo_id__in=prestamos, estado__in=ESTADOS_ABIERTOS, fecha_pago__gte=fecha)
+    fechas = cuotas.order_by().values_list("fecha_pago", flat=True).distinct()
+
+    # 🔹 Un solo UPDATE: cada fecha de pago pasa a la quincena siguiente y se anota el motivo.
+    # Quedan "Reprogramado" como en Cuota.reprogramar: actualizar_cuotas no las devuelve al plan original
+    cambios = {
+        "fecha_pago": Case(*[When(fecha_pago=f, then=Value(siguiente_quincena(f))) for f in fechas]),
+        "estado": Value("Reprogramado"),
+    }
+    if motivo:
+        cambios["observacion"] = Case(
+            When(observacion="", then=Value(motivo)),
+            default=Concat(F("observacion"), Value(f" | {motivo}")),
+            output_field=CharField(),
+        )
+    movidas = cuotas.update(**cambios)
+
+    # 🔹 fecha_final = última fecha del plan, recalculada en la base para todos los préstamos a la vez
+    ultima = Cuota.objects.filter(prestamo=OuterRef("pk")).order_by("-fecha_pago").values("fecha_pago")[:1]
+    Prestamo.objects.filter(pk__in=prestamos).update(fecha_final=Subquery(ultima))
+    kpis.invalidar(kpis.CUOTAS)
+    return len(prestamos), movidas
@@ -1,9 +1,44 @@
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from .models import Prestamo
+from . import estado_cuenta, kpis
+from .pdf import borrar_pdfs
+from .models import Campus, Cuota, Prestamo, Trabajador
 
 @receiver(post_save, sender=Prestamo)
 def generar_cuotas_post_save(sender, instance: Prestamo, created, **kwargs):
     # Solo generar al crear; si se desea regenerar al editar, podemos controlar con una bandera
     if created:
         instance.generar_cuotas()
+        estado_cuenta.registrar_prestamos([instance])
+
+@receiver(pre_delete, sender=Prestamo)
+def quitar_prestamo_estado_cuenta(sender, instance: Prestamo, **kwargs):
+    estado_cuenta.quitar_prestamo(instance)
+
+@receiver(post_delete, sender=Prestamo)
+def borrar_pdfs_prestamo(sender, instance: Prestamo, **kwargs):
+    prestamo_id = instance.pk  # Django pone pk en None al terminar el delete
+    transaction.on_commit(lambda: borrar_pdfs(prestamo_id))
+
+@receiver(post_save, sender=Campus)
+@receiver(post_delete, sender=Campus)
+def invalidar_cache_campus(sender, **kwargs):
+    cache.delete(Campus.CACHE_KEY)
+    # Los KPIs guardan el nombre del campus en sus totales
+    kpis.invalidar(kpis.TRABAJADORES, kpis.CUOTAS)
+
+@receiver(post_save, sender=Trabajador)
+@receiver(post_delete, sender=Trabajador)
+def invalidar_kpis_trabajador(sender, **kwargs):
+    # El campus del trabajador también reparte los totales de cuotas por campus
+    kpis.invalidar(kpis.TRABAJADORES, kpis.CUOTAS)
+
+# Sin post_delete de Cuota a propósito: un receptor obliga a Django a cargar cada cuota al borrar un
+# préstamo en cascada (el post_delete del préstamo ya invalida, y los borrados masivos lo hacen explícito)
+@receiver(post_save, sender=Prestamo)
+@receiver(post_delete, sender=Prestamo)
+@receiver(post_save, sender=Cuota)
+def invalidar_kpis_cuotas(sender, **kwargs):
+    kpis.invalidar(kpis.CUOTAS)
@@ -0,0 +1,349 @@
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from prestamos import estado_cuenta, trabajos
+from prestamos.importacion import ImportacionError, importar_prestamos, leer_archivo, validar_filas
+from prestamos.management.semilla import sembrar_datos
+from prestamos.models import (
+    ESTADOS_ABIERTOS, Campus, Cuota, MovimientoCuenta, Prestamo, ResumenCuenta, Trabajador, Trabajo,
+)
+from prestamos.reprogramacion import reprogramar_quincena
+
+
+class IndicesCuotaTests(TestCase):
+    """EXPLAIN de las consultas de quincena/campus sobre una cartera sembrada en la base de pruebas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_datos(300, 3000)
+        # Estadísticas frescas para que el planificador vea la distribución real
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        cls.fecha = (
+            Cuota.objects.filter(estado__in=ESTADOS_ABIERTOS).order_by("fecha_pago")
+            .values_list("fecha_pago", flat=True).first()
+        )
+
+    def assertUsaIndice(self, queryset, *indices):
+        plan = queryset.explain()
+        self.assertTrue(any(i in plan for i in indices), plan)
+
+    def test_quincena_abierta(self):
+        # cancelar_cuotas_masivo y el reporte de deducción
+        qs = Cuota.objects.filter(fecha_pago=self.fecha, estado__in=ESTADOS_ABIERTOS)
+        self.assertUsaIndice(qs, "cuota_estado_fecha_idx", "cuota_pendiente_fecha_idx")
+
+    @skipUnless(connection.vendor == "postgresql", "SQLite no usa un índice parcial con la condición como parámetros")
+    def test_resumen_por_quincena_usa_indice_parcial(self):
+        # kpis.pendiente_por_quincena: recorre solo las cuotas abiertas, ya en orden de fecha
+        qs = (
+            Cuota.objects.filter(estado__in=ESTADOS_ABIERTOS)
+            .values_list("fecha_pago", "prestamo__trabajador__campus__nombre")
+            .annotate(total_monto=Sum("monto_total"))
+            .order_by("fecha_pago")
+        )
+        self.assertUsaIndice(qs, "cuota_pendiente_fecha_idx")
+
+    def test_quincena_y_campus(self):
+        qs = (
+            Cuota.objects.filter(fecha_pago=self.fecha, estado="Pendiente", prestamo__trabajador__campus__nombre="LEÓN")
+            .select_related("prestamo", "prestamo__trabajador")
+        )
+        self.assertUsaIndice(qs, "cuota_estado_fecha_idx", "cuota_pendiente_fecha_idx")
+
+    def test_pagadas_de_un_anio(self):
+        # estado de cuenta
+        qs = (
+            Cuota.objects.filter(estado="Pagado", fecha_pago__year=self.fecha.year)
+            .values("cheque", "fecha_pago")
+            .annotate(total=Sum("monto_total"))
+        )
+        self.assertUsaIndice(qs, "cuota_estado_fecha_idx")
+
+
+class EstadoCuentaTests(TestCase):
+    """El libro (saldo por movimiento y ResumenCuenta) tras pagar, deshacer y cancelar cuotas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = get_user_model().objects.create_user("cajero", password="x")
+        campus, _ = Campus.objects.get_or_create(nombre="LEÓN")
+        trabajador = Trabajador.objects.create(codigo="T1", nombre="Trabajador 1", campus=campus)
+        cls.prestamo = Prestamo.objects.create(
+            trabajador=trabajador, monto=Decimal("1000"), interes=Decimal("3"), comision=Decimal("10"),
+            plazo=4, fecha_inicio=date(2025, 1, 15),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.cuotas = list(self.prestamo.cuotas.order_by("numero"))
+        # Las migraciones pueden dejar movimientos de capital: se mide contra lo que había
+        self.inicial = ResumenCuenta.actual()
+
+    def assertLibro(self, acreditado):
+        """Totales y saldos coinciden con las filas, y los pagos sumaron `acreditado` al libro."""
+        filas = MovimientoCuenta.objects.aggregate(debitos=Sum("debito"), creditos=Sum("credito"))
+        resumen = ResumenCuenta.actual()
+        self.assertEqual(resumen.total_debitos, filas["debitos"] or 0)
+        self.assertEqual(resumen.total_creditos, filas["creditos"] or 0)
+        self.assertEqual(resumen.total_creditos, self.inicial.total_creditos + acreditado)
+
+        saldo = Decimal("0.00")
+        for mov in MovimientoCuenta.objects.order_by("fecha", "id"):
+            saldo += mov.credito - mov.debito
+            self.assertEqual(mov.saldo, saldo)
+        self.assertEqual(saldo, resumen.saldo)
+
+    def pagar(self, cuota, cheque):
+        return self.client.post(
+            reverse("prestamos:prestamo_detail", args=[self.prestamo.pk]),
+            {"cuota_id": cuota.pk, "accion": "pagar", "cheque": cheque},
+        )
+
+    def test_pagar_una_vez(self):
+        cuota = self.cuotas[0]
+        self.pagar(cuota, "C-1")
+        self.pagar(cuota, "C-1")  # doble envío
+        self.assertLibro(cuota.monto_total)
+
+    def test_deshacer_pago(self):
+        cuota = self.cuotas[0]
+        self.pagar(cuota, "C-1")
+        cuota.refresh_from_db()
+        cuota.cheque = ""
+        cuota.sync_estado()
+        self.assertEqual(cuota.estado, "Pendiente")
+        self.assertFalse(MovimientoCuenta.objects.filter(tipo="pago").exists())
+        self.assertLibro(Decimal("0.00"))
+
+    def test_cancelar_masivo(self):
+        primera, segunda = self.cuotas[:2]
+        self.client.post(
+            reverse("prestamos:cancelar_cuotas_masivo"),
+            {"cuotas": [primera.pk, segunda.pk], "accion": "cancelar", "cheque": "C-2"},
+        )
+        self.assertEqual(Cuota.objects.filter(cheque="C-2", estado="Pagado").count(), 2)
+        self.assertLibro(primera.monto_total + segunda.monto_total)
+
+    def test_cancelar_masivo_ignora_ids_invalidos_y_ya_pagadas(self):
+        primera, segunda = self.cuotas[:2]
+        self.pagar(primera, "C-1")
+        respuesta = self.client.post(
+            reverse("prestamos:cancelar_cuotas_masivo"),
+            {"cuotas": [primera.pk, segunda.pk, "abc"], "accion": "cancelar", "cheque": "C-2"},
+            follow=True,
+        )
+        mensajes = [str(m) for m in respuesta.context["messages"]]
+        self.assertIn("⚠ 1 cuota(s) ya habían sido procesadas por otra operación.", mensajes)
+        self.assertIn(f"✅ Se procesaron 1 cuotas por ${segunda.monto_total:.2f}", mensajes)
+        self.assertLibro(primera.monto_total + segunda.monto_total)
+
+    def test_descontar_sin_movimiento(self):
+        cuota = self.cuotas[0]
+        self.pagar(cuota, "C-1")
+        # El cheque cambió por fuera del libro: no hay movimiento que descontar
+        Cuota.objects.filter(pk=cuota.pk).update(cheque="OTRO")
+        estado_cuenta.descontar_pagos(Cuota.objects.filter(pk=cuota.pk))
+        self.assertLibro(cuota.monto_total)
+
+    def test_borrar_prestamo(self):
+        self.pagar(self.cuotas[0], "C-1")
+        self.prestamo.delete()
+        resumen = ResumenCuenta.actual()
+        self.assertEqual(resumen.total_debitos, self.inicial.total_debitos - self.prestamo.monto)
+        self.assertLibro(Decimal("0.00"))
+        self.assertFalse(MovimientoCuenta.objects.filter(tipo__in=["prestamo", "pago"]).exists())
+
+
+class PlanDePagosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        campus, _ = Campus.objects.get_or_create(nombre="LEÓN")
+        trabajador = Trabajador.objects.create(codigo="T1", nombre="Trabajador 1", campus=campus)
+        cls.prestamo = Prestamo.objects.create(
+            trabajador=trabajador, monto=Decimal("1000"), interes=Decimal("3"), comision=Decimal("10"),
+            plazo=4, fecha_inicio=date(2025, 1, 15),
+        )
+
+    def test_editar_montos_conserva_fechas_movidas(self):
+        cuota = self.prestamo.cuotas.get(numero=2)
+        movida = date(2025, 3, 3)
+        Cuota.objects.filter(pk=cuota.pk).update(fecha_pago=movida)
+        self.prestamo.comision = Decimal("12")
+        self.prestamo.save()
+        self.prestamo.actualizar_cuotas()
+        cuota.refresh_from_db()
+        self.assertEqual(cuota.fecha_pago, movida)
+
+    def test_reprogramar_desde_la_vista_valida_la_fecha(self):
+        self.client.force_login(get_user_model().objects.create_user("cajero", password="x"))
+        url = reverse("prestamos:cancelar_cuotas_masivo")
+        for fecha in ["", "15/01/2025", "2025-01-10"]:
+            with self.subTest(fecha=fecha):
+                respuesta = self.client.post(url, {"accion": "reprogramar_quincena", "fecha": fecha}, follow=True)
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertTrue(any(m.level_tag == "error" for m in respuesta.context["messages"]))
+        self.assertFalse(self.prestamo.cuotas.filter(estado="Reprogramado").exists())
+
+        self.client.post(url, {"accion": "reprogramar_quincena", "fecha": "2025-01-15"})
+        self.assertEqual(self.prestamo.cuotas.filter(estado="Reprogramado").count(), 4)
+
+    def test_reprogramar_quincena(self):
+        primera = self.prestamo.cuotas.get(numero=1)
+        fechas = list(self.prestamo.cuotas.order_by("numero").values_list("fecha_pago", flat=True))
+        prestamos, movidas = reprogramar_quincena(primera.fecha_pago, motivo="Sin nómina")
+        self.assertEqual((prestamos, movidas), (1, 4))
+        cuotas = list(self.prestamo.cuotas.order_by("numero"))
+        self.assertTrue(all(c.estado == "Reprogramado" and c.observacion == "Sin nómina" for c in cuotas))
+        self.assertEqual([c.fecha_pago for c in cuotas[:-1]], fechas[1:])
+        self.prestamo.refresh_from_db()
+        self.assertEqual(self.prestamo.fecha_final, cuotas[-1].fecha_pago)
+
+
+def _falla(**parametros):
+    raise RuntimeError("sin conexión")
+
+
+@mock.patch.dict(trabajos.TAREAS, {"prueba": lambda **p: ("hola.txt", b"hola"), "falla": _falla})
+class ColaTrabajosTests(TestCase):
+    def trabajo(self, tipo="prueba", **campos):
+        return Trabajo.objects.create(tipo=tipo, **campos)
+
+    def test_reclamar_en_orden_de_disponibilidad(self):
+        ahora = timezone.now()
+        segundo = self.trabajo(disponible_en=ahora - timedelta(minutes=1))
+        primero = self.trabajo(disponible_en=ahora - timedelta(minutes=5))
+        self.trabajo(disponible_en=ahora + timedelta(minutes=5))  # reintento aún no vencido
+        self.trabajo(estado="Completado")
+
+        reclamado = trabajos.reclamar_siguiente()
+        self.assertEqual((reclamado.pk, reclamado.estado, reclamado.intentos), (primero.pk, "En proceso", 1))
+        self.assertEqual(trabajos.reclamar_siguiente().pk, segundo.pk)
+        self.assertIsNone(trabajos.reclamar_siguiente())
+
+    def test_rescatar_bloqueados(self):
+        colgado = self.trabajo(estado="En proceso")
+        activo = self.trabajo(estado="En proceso")
+        Trabajo.objects.filter(pk=colgado.pk).update(actualizado=timezone.now() - trabajos.BLOQUEO_MAXIMO * 2)
+
+        self.assertEqual(trabajos.rescatar_bloqueados(), 1)
+        colgado.refresh_from_db()
+        activo.refresh_from_db()
+        self.assertEqual((colgado.estado, activo.estado), ("Pendiente", "En proceso"))
+
+    def test_ejecutar_guarda_el_resultado(self):
+        self.trabajo()
+        trabajo = trabajos.ejecutar(trabajos.reclamar_siguiente())
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.nombre_archivo, bytes(trabajo.resultado)), ("Completado", "hola.txt", b"hola"))
+
+    def test_reintentos_con_espera_exponencial_y_tope(self):
+        casos = [(1, trabajos.ESPERA_BASE), (3, trabajos.ESPERA_BASE * 4), (9, trabajos.ESPERA_MAXIMA)]
+        for intentos, espera in casos:
+            with self.subTest(intentos=intentos):
+                trabajo = self.trabajo("falla", estado="En proceso", intentos=intentos, max_intentos=10)
+                antes = timezone.now()
+                with self.assertLogs("prestamos.trabajos", "ERROR"):
+                    trabajos.ejecutar(trabajo)
+                trabajo.refresh_from_db()
+                self.assertEqual(trabajo.estado, "Pendiente")
+                self.assertEqual(trabajo.error, "RuntimeError: sin conexión")
+                self.assertAlmostEqual(
+                    (trabajo.disponible_en - antes).total_seconds(), espera, delta=5,
+                )
+
+    def test_ultimo_intento_queda_fallido(self):
+        trabajo = self.trabajo("falla", estado="En proceso", intentos=5, max_intentos=5)
+        with self.assertLogs("prestamos.trabajos", "ERROR"):
+            self.assertEqual(trabajos.ejecutar(trabajo).estado, "Fallido")
+
+    @override_settings(TRABAJOS_ALERTA_MINUTOS=5)
+    def test_aviso_si_nadie_procesa_la_cola(self):
+        reciente = self.trabajo()
+        olvidado = self.trabajo(disponible_en=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(trabajos.aviso_demora(reciente), "")
+        with self.assertLogs("prestamos.trabajos", "WARNING"):
+            self.assertIn("5 minutos", trabajos.aviso_demora(olvidado))
+
+    @override_settings(TRABAJOS_EN_LINEA=True)
+    def test_en_linea_al_confirmar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            trabajo = trabajos.encolar("prueba")
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, "Completado")
+
+
+class ImportacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        campus, _ = Campus.objects.get_or_create(nombre="LEÓN")
+        cls.trabajador = Trabajador.objects.create(codigo="123", nombre="Trabajador 123", campus=campus)
+
+    def csv(self, *filas):
+        lineas = ["codigo,monto,interes,comision,plazo,fecha_inicio", *filas]
+        return leer_archivo(io.BytesIO("\n".join(lineas).encode("utf-8")), "prestamos.csv")
+
+    def test_errores_por_fila(self):
+        registros = self.csv(
+            "123,1000,3,10,4,2025-01-15",
+            "999,1000,3,10,4,2025-01-15",
+            "123,1000,3,10,0,2025-01-15",
+            "123,-5,3,10,4,2025-01-15",
+        )
+        with self.assertRaises(ImportacionError) as error:
+            validar_filas(registros)
+        self.assertEqual(
+            [e.split(":")[0] for e in error.exception.errores], ["Fila 3", "Fila 4", "Fila 5"],
+        )
+        self.assertIn("código '999'", error.exception.errores[0])
+        self.assertFalse(Prestamo.objects.exists())
+
+    def test_codigo_repetido_crea_un_prestamo_por_fila(self):
+        prestamos = validar_filas(self.csv("123,1000,3,10,4,2025-01-15", " 123 ,500,3,10,2,2025-01-31"))
+        importar_prestamos(prestamos)
+        self.assertEqual(self.trabajador.prestamos.count(), 2)
+
+    def test_importar_en_bloque(self):
+        def consultas(filas):
+            prestamos = validar_filas(self.csv(*filas))
+            with CaptureQueriesContext(connection) as capturadas:
+                importar_prestamos(prestamos)
+            return prestamos, len(capturadas)
+
+        debitos = ResumenCuenta.actual().total_debitos
+        prestamos, pocas = consultas(["123,1000,3,10,4,2025-01-15", "123,500,3,10,2,2025-01-31"])
+        self.assertEqual(Cuota.objects.filter(prestamo__in=prestamos).count(), 6)
+        for prestamo in Prestamo.objects.all():
+            self.assertEqual(prestamo.fecha_final, prestamo.cuotas.order_by("-fecha_pago").first().fecha_pago)
+        self.assertEqual(ResumenCuenta.actual().total_debitos, debitos + Decimal("1500"))
+
+        # Las consultas no crecen con las filas mientras quepan en un lote de bulk_create
+        _, muchas = consultas(["123,1000,3,10,4,2025-01-15"] * 20)
+        self.assertEqual(muchas, pocas)
+
+    def test_xlsx_con_codigo_numerico(self):
+        libro = Workbook()
+        libro.active.append(["Trabajador", "monto", "interes", "comision", "plazo", "fecha_inicio"])
+        libro.active.append([123.0, 1000, 3, 10, 4, date(2025, 1, 15)])
+        archivo = io.BytesIO()
+        libro.save(archivo)
+        archivo.seek(0)
+        prestamos = validar_filas(leer_archivo(archivo, "prestamos.xlsx"))
+        self.assertEqual(prestamos[0].trabajador, self.trabajador)
+
+    def test_archivo_ilegible(self):
+        casos = [("prestamos.xlsx", b"no es un zip"), ("prestamos.csv", "código,ñ".encode("latin-1"))]
+        for nombre, contenido in casos:
+            with self.subTest(nombre=nombre), self.assertRaises(ImportacionError):
+                leer_archivo(io.BytesIO(contenido), nombre)
@@ -0,0 +1,241 @@
+"""Cola de trabajos en la base de datos (sin broker externo).
+
+Las vistas encolan con `encolar()` y responden al instante; `manage.py procesar_trabajos` toma
+los pendientes, los ejecuta y reintenta los fallidos con espera exponencial (proceso `worker` del
+Procfile; sin worker, TRABAJOS_EN_LINEA=1 como en render.yaml). La página de estado consulta
+`Trabajo.estado` hasta que termina.
+"""
+import logging
+from datetime import date, timedelta
+from functools import lru_cache
+from io import BytesIO
+from itertools import groupby
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from weasyprint import CSS, HTML
+
+from .models import ESTADOS_ABIERTOS, Cuota, Prestamo, Trabajo
+from .pdf import pdf_prestamo
+
+logger = logging.getLogger(__name__)
+
+ESPERA_BASE = 30  # segundos; el reintento n espera ESPERA_BASE * 2**(n-1)
+ESPERA_MAXIMA = 3600
+BLOQUEO_MAXIMO = timedelta(minutes=15)  # "En proceso" más tiempo que esto = worker caído
+
+TAREAS = {}
+
+
+def tarea(tipo):
+    """Registra la función que ejecuta los trabajos de `tipo`.
+
+    Recibe los parámetros del trabajo y puede devolver (nombre_archivo, contenido) para descargar.
+    """
+    def registrar(funcion):
+        TAREAS[tipo] = funcion
+        return funcion
+    return registrar
+
+
+def encolar(tipo, usuario=None, **parametros):
+    if tipo not in TAREAS:
+        raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+    trabajo = Trabajo.objects.create(tipo=tipo, usuario=usuario, parametros=parametros)
+    if settings.TRABAJOS_EN_LINEA:
+        # Sin worker: se ejecuta en este proceso en cuanto el trabajo queda guardado
+        transaction.on_commit(lambda: ejecutar_en_linea(trabajo.pk))
+    return trabajo
+
+
+def ejecutar_en_linea(pk):
+    """Reclama y ejecuta el trabajo `pk` si nadie lo tomó (TRABAJOS_EN_LINEA)."""
+    tomado = Trabajo.objects.filter(pk=pk, estado="Pendiente").update(
+        estado="En proceso", intentos=F("intentos") + 1, actualizado=timezone.now(),
+    )
+    if tomado:
+        return ejecutar(Trabajo.objects.get(pk=pk))
+
+
+def reclamar_siguiente():
+    """Marca como "En proceso" el siguiente trabajo disponible y lo devuelve (None si no hay).
+
+    En Postgres varios workers no se pisan gracias a SKIP LOCKED; el UPDATE condicionado al estado
+    cubre SQLite, donde select_for_update no existe.
+    """
+    while True:
+        with transaction.atomic():
+            trabajo = (
+                Trabajo.objects.select_for_update(skip_locked=True)
+                .filter(estado="Pendiente", disponible_en__lte=timezone.now())
+                .order_by("disponible_en", "id")
+                .first()
+            )
+            if trabajo is None:
+                return None
+            tomado = Trabajo.objects.filter(pk=trabajo.pk, estado="Pendiente").update(
+                estado="En proceso", intentos=F("intentos") + 1, actualizado=timezone.now(),
+            )
+        if tomado:
+            trabajo.refresh_from_db()
+            return trabajo
+
+
+def aviso_demora(trabajo):
+    """Mensaje (y advertencia en el log) si el trabajo lleva más de TRABAJOS_ALERTA_MINUTOS esperando.
+
+    Con la cola detenida (sin worker ni TRABAJOS_EN_LINEA) los trabajos quedarían pendientes sin aviso.
+    """
+    minutos = settings.TRABAJOS_ALERTA_MINUTOS
+    if trabajo.estado != "Pendiente" or trabajo.disponible_en > timezone.now() - timedelta(minutes=minutos):
+        return ""
+    logger.warning("Trabajo %s pendiente desde %s: ¿está corriendo procesar_trabajos?", trabajo.pk, trabajo.disponible_en)
+    return f"Este trabajo lleva más de {minutos} minutos en cola. Avisa al administrador: el proceso de trabajos no está corriendo."
+
+
+def rescatar_bloqueados():
+    """Devuelve a la cola los trabajos que quedaron "En proceso" porque el worker murió."""
+    limite = timezone.now() - BLOQUEO_MAXIMO
+    return Trabajo.objects.filter(estado="En proceso", actualizado__lt=limite).update(
+        estado="Pendiente", disponible_en=timezone.now(),
+    )
+
+
+def ejecutar(trabajo):
+    """Ejecuta un trabajo ya reclamado y guarda el resultado o programa el reintento."""
+    try:
+        resultado = TAREAS[trabajo.tipo](**trabajo.parametros)
+    except Exception as e:
+        logger.exception("Falló el trabajo %s (intento %s)", trabajo.pk, trabajo.intentos)
+        trabajo.error = f"{type(e).__name__}: {e}"
+        if trabajo.intentos >= trabajo.max_intentos:
+            trabajo.estado = "Fallido"
+        else:
+            espera = min(ESPERA_BASE * 2 ** (trabajo.intentos - 1), ESPERA_MAXIMA)
+            trabajo.estado = "Pendiente"
+            trabajo.disponible_en = timezone.now() + timedelta(seconds=espera)
+        trabajo.save(update_fields=["estado", "error", "disponible_en", "actualizado"])
+        return trabajo
+
+    if resultado:
+        trabajo.nombre_archivo, trabajo.resultado = resultado
+    trabajo.estado = "Completado"
+    trabajo.error = ""
+    trabajo.save(update_fields=["estado", "error", "nombre_archivo", "resultado", "actualizado"])
+    return trabajo
+
+
+# =========================
+# Tareas
+# =========================
+
+# El reporte de deducción usa siempre la misma hoja de estilos: se analiza una vez por worker
+ESTILO_DEDUCCION = """
+    @page { size: A4; margin: 15mm; }
+    body { font-family: Arial, sans-serif; font-size: 11px; color: #333; }
+    h1 { text-align: center; margin-bottom: 10px; }
+    table { width: 100%; border-collapse: collapse; margin-top: 10px; }
+    th, td { border: 1px solid #444; padding: 5px; text-align: center; }
+    th { background: #f2f2f2; }
+    tfoot td { font-weight: bold; background: #eaeaea; }
+"""
+
+
+@lru_cache(maxsize=None)
+def _estilo_deduccion():
+    return CSS(string=ESTILO_DEDUCCION)
+
+
+def _html_deduccion(cuotas, fecha, campus):
+    """HTML del reporte de deducción; `cuotas` es una lista (se recorre para las filas y el total)."""
+    return HTML(string=render_to_string("prestamos/cuotas_masivo_pdf.html", {
+        "cuotas": cuotas,
+        "total": sum(c.monto_total for c in cuotas),
+        "fecha": date.fromisoformat(fecha) if fecha else "",  # el filtro |date necesita una fecha, no texto
+        "campus": campus,
+    }))
+
+
+def _nombre_deduccion(fecha, campus, extension="pdf"):
+    # Formateamos fecha para el nombre del archivo
+    fecha_texto = fecha.replace("-", "_") if fecha else "fecha"
+    campus_texto = campus.upper() if campus else "TODOS"
+    return f"Cuotas_{fecha_texto}_DEDUCCION_{campus_texto}.{extension}"
+
+
+@tarea("pdf_cuotas")
+def generar_pdf_cuotas(cuotas, fecha="", campus=""):
+    cuotas = list(
+        Cuota.objects.filter(pk__in=cuotas)
+        .select_related("prestamo", "prestamo__trabajador__campus")
+        .order_by("prestamo__trabajador__nombre", "numero")
+    )
+    pdf_file = _html_deduccion(cuotas, fecha, campus).write_pdf(stylesheets=[_estilo_deduccion()])
+    return _nombre_deduccion(fecha, campus), pdf_file
+
+
+@tarea("pdf_cuotas_lote")
+def generar_pdf_cuotas_lote(fecha, formato="zip"):
+    """Reporte de deducción de cada campus para la quincena `fecha`: un ZIP con un PDF por campus
+    o un solo PDF con todos (formato="pdf")."""
+    cuotas = (
+        Cuota.objects.filter(fecha_pago=fecha, estado__in=ESTADOS_ABIERTOS)
+        .select_related("prestamo", "prestamo__trabajador__campus")
+        .order_by("prestamo__trabajador__campus__nombre", "prestamo__trabajador__nombre", "numero")
+    )
+    # 🔹 Una sola consulta ordenada por campus; cada grupo es un reporte
+    grupos = [
+        (campus or "SIN CAMPUS", list(filas))
+        for campus, filas in groupby(cuotas, key=lambda c: getattr(c.prestamo.trabajador.campus, "nombre", None))
+    ]
+    if not grupos:
+        raise ValueError(f"No hay cuotas pendientes para el {fecha}")
+
+    estilo = _estilo_deduccion()
+    if formato == "pdf":
+        documentos = [_html_deduccion(filas, fecha, campus).render(stylesheets=[estilo]) for campus, filas in grupos]
+        paginas = [pagina for documento in documentos for pagina in documento.pages]
+        return _nombre_deduccion(fecha, ""), documentos[0].copy(paginas).write_pdf()
+
+    contenido = BytesIO()
+    with ZipFile(contenido, "w", ZIP_DEFLATED) as zip_file:
+        for campus, filas in grupos:
+            pdf_file = _html_deduccion(filas, fecha, campus).write_pdf(stylesheets=[estilo])
+            zip_file.writestr(_nombre_deduccion(fecha, campus), pdf_file)
+    return _nombre_deduccion(fecha, "", "zip"), contenido.getvalue()
+
+
+@tarea("correo_prestamo")
+def enviar_correo_prestamo(prestamo_id):
+    prestamo = Prestamo.objects.select_related("trabajador__campus").get(pk=prestamo_id)
+
+    # 🚫 Un reintento no debe mandar el correo dos veces
+    if prestamo.correo_enviado:
+        return None
+
+    cuotas, totales = prestamo.resumen_cuotas()
+    html_string = render_to_string('prestamos/prestamo_pdf.html', {'object': prestamo, 'cuotas': cuotas, 'totales': totales})
+    pdf_file = pdf_prestamo(prestamo.id, "detalle", html_string)
+
+    asunto = f"Préstamo: {prestamo.trabajador.nombre} - ${prestamo.monto:,.2f}"
+    html_content = render_to_string('prestamos/correo_prestamo.html', {'prestamo': prestamo})
+
+    correo = EmailMultiAlternatives(
+        subject=asunto,
+        body="Se adjunta el detalle del prestamo.",
+        from_email='yanina.reyes@ucc.edu.ni',
+        to=['rodrigo.gurdian@ucc.edu.ni'],
+        cc=['jose.villalobos@ucc.edu.ni']
+    )
+    correo.encoding = 'utf-8'
+    correo.attach_alternative(html_content, "text/html")
+    correo.attach(f'Prestamo_{prestamo.id}.pdf', pdf_file, 'application/pdf')
+    correo.send()
+
+    Prestamo.objects.filter(pk=prestamo.pk).update(correo_enviado=True)
+    return None
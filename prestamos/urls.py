@@ -20,6 +20,7 @@ urlpatterns = [
     # Préstamos
     path("prestamos/", views.PrestamoListView.as_view(), name="prestamo_list"),
     path("prestamos/nuevo/", views.PrestamoCreateView.as_view(), name="prestamo_create"),
+    path("prestamos/importar/", views.importar_prestamos_view, name="prestamo_importar"),
     path("prestamos/<int:pk>/", views.PrestamoDetailView.as_view(), name="prestamo_detail"),
     path("prestamo/<int:pk>/editar/", PrestamoUpdateView.as_view(), name="prestamo_edit"),
 
@@ -27,9 +28,14 @@ urlpatterns = [
     path("prestamo/<int:pk>/pdf/", views.prestamo_pdf, name="prestamo_pdf"),
     path("prestamo/<int:pk>/pdf/<str:tipo>/", views.prestamo_documento_pdf, name="prestamo_documento_pdf"),
     path("cuotas/pdf/", cuotas_masivo_pdf, name="cuotas_masivo_pdf"),
+    path("cuotas/pdf/lote/", views.cuotas_lote_pdf, name="cuotas_lote_pdf"),
     path("<int:prestamo_id>/imprimir/", views.imprimir_documento, name="imprimir_documento"),
     path("prestamo/<int:pk>/enviar_correo/", views.enviar_correo, name="enviar_correo"),
 
+    # Trabajos en segundo plano
+    path("trabajos/<int:pk>/", views.trabajo_estado, name="trabajo_estado"),
+    path("trabajos/<int:pk>/descargar/", views.trabajo_descargar, name="trabajo_descargar"),
+
     # Cancelar cuotas
     path("cancelar-cuotas-masivo/", views.cancelar_cuotas_masivo, name="cancelar_cuotas_masivo"),
 
@@ -41,4 +47,8 @@ urlpatterns = [
     path("", home_redirect, name="home_redirect"),
 
     path('estado-general/', estado_cuenta_general_view, name='estado_general'),
+    path("exportar/cuotas/", views.exportar_cuotas, name="exportar_cuotas"),
+    path("exportar/estado-cuenta/", views.exportar_estado_cuenta, name="exportar_estado_cuenta"),
+    path("proyeccion/", views.proyeccion_flujo_view, name="proyeccion_flujo"),
+    path("perfilado/", views.perfilado_view, name="perfilado"),
 ]
\ No newline at end of file
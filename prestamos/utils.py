@@ -1,24 +1,76 @@
 import calendar
+import threading
 from datetime import date
+from functools import lru_cache
+
+# ======================================
+# Calendario de quincenas (15 y fin de mes)
+# ======================================
+# Las fechas de pago se guardan en una sola lista ordenada que se construye una vez por año;
+# la posición de cualquier fecha se calcula con aritmética, así "la siguiente" o "las próximas N"
+# quincenas son una indexación en la lista y no vuelven a calcular la duración de cada mes.
+ANIO_BASE = 1900
+
+_quincenas = []
+_extendiendo = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _fin_de_mes(anio, mes):
+    return date(anio, mes, calendar.monthrange(anio, mes)[1])
+
+
+def _posicion(d: date) -> int:
+    """Índice en el calendario de la quincena que contiene a `d` (día <= 15 -> el 15, si no fin de mes)."""
+    return ((d.year - ANIO_BASE) * 12 + d.month - 1) * 2 + (0 if d.day <= 15 else 1)
+
+
+def _asegurar(posicion: int):
+    """Extiende el calendario por años completos hasta cubrir `posicion`."""
+    if posicion < 0:
+        raise ValueError(f"Fecha anterior a {ANIO_BASE}")
+    if posicion < len(_quincenas):
+        return
+    with _extendiendo:
+        while len(_quincenas) <= posicion:
+            anio = ANIO_BASE + len(_quincenas) // 24
+            _quincenas.extend(f for mes in range(1, 13) for f in (date(anio, mes, 15), _fin_de_mes(anio, mes)))
+
+
+def quincena(d: date) -> date:
+    """La fecha de pago de la quincena de `d`: el 15 si d.day <= 15, si no el fin de mes."""
+    posicion = _posicion(d)
+    _asegurar(posicion)
+    return _quincenas[posicion]
+
+
+def es_quincena(d: date) -> bool:
+    return d == quincena(d)
+
+
+def quincenas_desde(d: date, cantidad: int) -> list:
+    """Las `cantidad` fechas de pago a partir de la quincena de `d` (inclusive)."""
+    posicion = _posicion(d)
+    _asegurar(posicion + cantidad)
+    return _quincenas[posicion:posicion + cantidad]
+
+
+def siguiente_quincena(d: date, saltos: int = 1) -> date:
+    """La fecha de pago `saltos` quincenas después de la quincena de `d`."""
+    posicion = _posicion(d) + saltos
+    _asegurar(posicion)
+    return _quincenas[posicion]
+
 
 def end_of_month(d: date) -> date:
-    last_day = calendar.monthrange(d.year, d.month)[1]
-    return d.replace(day=last_day)
+    return _fin_de_mes(d.year, d.month)
 
 def is_end_of_month(d: date) -> bool:
     return d == end_of_month(d)
 
 def next_15_or_eom(d: date) -> date:
-    """Given a date that is either 15 or EOM, return the next payment date alternating."""
-    if d.day == 15:
-        return end_of_month(d)
-    if is_end_of_month(d):
-        # move to next month day 15
-        if d.month == 12:
-            return date(d.year + 1, 1, 15)
-        return date(d.year, d.month + 1, 15)
-    # If not 15/EOM, normalize: if <=15 -> 15, else -> EOM
-    if d.day <= 15:
-        return d.replace(day=15)
-    else:
-        return end_of_month(d)
+    """Given a date that is either 15 or EOM, return the next payment date alternating.
+
+    If not 15/EOM, normalize: if <=15 -> 15, else -> EOM.
+    """
+    return siguiente_quincena(d) if es_quincena(d) else quincena(d)
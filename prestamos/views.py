@@ -3,17 +3,22 @@ from django.urls import reverse_lazy
 from django.shortcuts import get_object_or_404, redirect, render
 from django.db import transaction
 from django.contrib import messages
-from .models import Trabajador, Prestamo, Cuota
-from .forms import TrabajadorForm, PrestamoForm
+from .models import ESTADOS_ABIERTOS, Campus, Trabajador, Prestamo, Cuota, MovimientoCuenta, ResumenCuenta, Trabajo
+from .forms import TrabajadorForm, PrestamoForm, ImportarPrestamosForm
+from . import estado_cuenta, exportacion, kpis, perfilado, trabajos
+from .pdf import pdf_prestamo
+from .importacion import ImportacionError, importar_prestamos, leer_archivo, validar_filas
+from .proyeccion import proyectar_flujo
+from .reprogramacion import reprogramar_quincena
+from .utils import es_quincena
 from decimal import Decimal, ROUND_HALF_UP
-from dateutil.relativedelta import relativedelta
-from calendar import monthrange
 from .filters import TrabajadorFilter, PrestamoFilter
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.template.loader import render_to_string
 import weasyprint
 import tempfile
-from django.db.models import Sum
+import mimetypes
+from django.db.models import Avg, Count, Sum
 from io import BytesIO
 from django.conf import settings
 import os
@@ -36,28 +41,93 @@ from decimal import Decimal
 
 
 
+# ======================================
+# Tablas paginadas en el servidor
+# ======================================
+class TablaServidorMixin:
+    """ListView filtrada (django-filter), ordenada y paginada en el servidor.
+
+    La primera página se renderiza en HTML; DataTables pide las siguientes a la misma URL con
+    ?formato=json, así la respuesta tiene siempre el tamaño de una página.
+    """
+    paginate_by = 50
+    max_paginate_by = 200
+    filterset_class = None
+
+    def get_paginate_by(self, queryset):
+        try:
+            return max(1, min(int(self.request.GET.get("page_size", self.paginate_by)), self.max_paginate_by))
+        except ValueError:
+            return self.paginate_by
+
+    def get_queryset(self):
+        self.filterset = self.filterset_class(self.request.GET, queryset=super().get_queryset(), request=self.request)
+        return self.filterset.qs
+
+    def hay_filtros(self):
+        return any(
+            v for k, v in self.filterset.form.cleaned_data.items() if k != "orden"
+        ) if self.filterset.is_valid() else True
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        total_filtrado = context["paginator"].count
+        # El total sin filtros solo cuesta un COUNT extra cuando hay filtros activos
+        context["total_filtrado"] = total_filtrado
+        context["total_registros"] = self.model.objects.count() if self.hay_filtros() else total_filtrado
+        context["filter"] = self.filterset
+        return context
+
+    def fila_json(self, obj):
+        raise NotImplementedError
+
+    def datos_json(self, context):
+        """Datos adicionales de la respuesta JSON (KPIs, etc.)."""
+        return {}
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get("formato") != "json":
+            return super().render_to_response(context, **response_kwargs)
+
+        try:
+            draw = int(self.request.GET.get("draw", 0))
+        except ValueError:
+            draw = 0
+        return JsonResponse({
+            "draw": draw,
+            "recordsTotal": context["total_registros"],
+            "recordsFiltered": context["total_filtrado"],
+            "data": [self.fila_json(obj) for obj in context["object_list"]],
+            **self.datos_json(context),
+        })
+
+
 # ======================================
 # Trabajador Views
 # ======================================
-class TrabajadorListView(LoginRequiredMixin, ListView):
+class TrabajadorListView(LoginRequiredMixin, TablaServidorMixin, ListView):
     model = Trabajador
     template_name = "prestamos/trabajador_list.html"
     context_object_name = "items"
+    queryset = Trabajador.objects.select_related("campus")
+    ordering = ["codigo"]
+    filterset_class = TrabajadorFilter
     login_url = settings.LOGIN_URL
 
-    def get_queryset(self):
-        return Trabajador.objects.all()
+    def fila_json(self, t):
+        return {"codigo": t.codigo, "nombre": t.nombre, "campus": str(t.campus or "")}
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        if self.request.GET.get("formato") == "json":
+            return context
 
-        trabajadores = self.get_queryset()
+        # 🔹 Conteo por campus desde el caché de KPIs (se invalida al guardar trabajadores)
+        por_campus = kpis.trabajadores_por_campus()
 
         context.update({
-            'total_trabajadores': trabajadores.count(),
-            'total_leon': trabajadores.filter(campus__icontains="león").count(),
-            'total_managua': trabajadores.filter(campus__icontains="managua").count(),
-            'total_matagalpa': trabajadores.filter(campus__icontains="matagalpa").count(),
+            'total_trabajadores': sum(por_campus.values()),
+            'campus_totales': [(c.nombre, por_campus.get(c.pk, 0)) for c in Campus.lista()],
         })
 
         return context
@@ -74,7 +144,7 @@ class TrabajadorCreateView(LoginRequiredMixin, CreateView):
 # ======================================
 # Prestamo Views
 # ======================================
-class PrestamoListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class PrestamoListView(LoginRequiredMixin, UserPassesTestMixin, TablaServidorMixin, ListView):
     model = Prestamo
     template_name = "prestamos/prestamo_list.html"
     context_object_name = "items"
@@ -83,6 +153,37 @@ class PrestamoListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
     filterset_class = PrestamoFilter
     login_url = settings.LOGIN_URL
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        # 🔥 KPIs del conjunto filtrado completo (no solo de la página) en una sola consulta
+        kpis = self.filterset.qs.order_by().aggregate(total=Sum("monto"), promedio=Avg("monto"))
+        context["kpi_total"] = kpis["total"] or Decimal("0")
+        context["kpi_promedio"] = kpis["promedio"] or Decimal("0")
+        return context
+
+    def fila_json(self, p):
+        return {
+            "id": p.id,
+            "url": reverse("prestamos:prestamo_detail", args=[p.id]),
+            "trabajador": p.trabajador.nombre,
+            "monto": f"{p.monto:.2f}",
+            "interes": str(p.interes),
+            "comision": str(p.comision),
+            "plazo": p.plazo,
+            "fecha_inicio": p.fecha_inicio.strftime("%d/%m/%Y"),
+            "fecha_final": p.fecha_final.strftime("%d/%m/%Y") if p.fecha_final else "",
+        }
+
+    def datos_json(self, context):
+        return {
+            "kpis": {
+                "total": f"{context['kpi_total']:.2f}",
+                "cantidad": context["total_filtrado"],
+                "promedio": f"{context['kpi_promedio']:.2f}",
+            },
+        }
+
 # 🔐 SOLO admin_total
     def test_func(self):
         return self.request.user.groups.filter(name='admin_total').exists()
@@ -92,61 +193,6 @@ class PrestamoListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         return redirect('list_tasks')
 
 
-# ======================================
-# Función para generar cuotas
-# ======================================
-def generar_cuotas(prestamo):
-    # Eliminar cuotas existentes
-    prestamo.cuotas.all().delete()
-
-    monto_total = Decimal(prestamo.monto)
-    plazo = prestamo.plazo
-    interes_fijo = (monto_total * Decimal(prestamo.interes) / 100/2).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    comision_total = (monto_total * Decimal(prestamo.comision) / 100).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    comision_por_cuota = (comision_total / plazo).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    capital_por_cuota = (monto_total / plazo).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
-    fecha = prestamo.fecha_inicio
-
-    for n in range(1, plazo + 1):
-        # Alternar día 15 y último día del mes
-        if fecha.day <= 15:
-            dia = 15
-        else:
-            dia = monthrange(fecha.year, fecha.month)[1]
-
-        # Crear la fecha de la cuota
-        cuota_fecha = fecha.replace(day=dia)
-
-        # Ajustar última cuota
-        if n == plazo:
-            capital_cuota_final = (monto_total - capital_por_cuota * (plazo - 1)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-            comision_cuota_final = (comision_total - comision_por_cuota * (plazo - 1)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        else:
-            capital_cuota_final = capital_por_cuota
-            comision_cuota_final = comision_por_cuota
-
-        monto_cuota = (capital_cuota_final + interes_fijo + comision_cuota_final).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
-        Cuota.objects.create(
-            prestamo=prestamo,
-            numero=n,
-            principal=float(capital_cuota_final),
-            interes=float(interes_fijo),
-            comision=float(comision_cuota_final),
-            monto_total=float(monto_cuota),
-            fecha_pago=cuota_fecha,
-            estado="Pendiente",
-        )
-
-        # Alternamos fecha para la siguiente cuota
-        if dia == 15:
-            fecha = fecha.replace(day=monthrange(fecha.year, fecha.month)[1])  # fin de mes
-        else:
-            fecha += relativedelta(months=1)
-            fecha = fecha.replace(day=15)  # siguiente 15
-
-
 # ======================================
 # Crear Prestamo
 # ======================================
@@ -186,9 +232,8 @@ class PrestamoCreateView(LoginRequiredMixin, CreateView):
 
     @transaction.atomic
     def form_valid(self, form):
-        response = super().form_valid(form)
-        generar_cuotas(self.object)
-        return response
+        # Las cuotas las genera la señal post_save al crear el préstamo
+        return super().form_valid(form)
 
 
 # ======================================
@@ -200,7 +245,12 @@ class PrestamoDetailView(LoginRequiredMixin, DetailView):
     login_url = settings.LOGIN_URL
 
     def get_queryset(self):
-        return Prestamo.objects.select_related("trabajador").prefetch_related("cuotas")
+        return Prestamo.objects.select_related("trabajador__campus").prefetch_related("cuotas")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["cuotas"], context["totales"] = self.object.resumen_cuotas()
+        return context
 
     @transaction.atomic
     def post(self, request, *args, **kwargs):
@@ -214,14 +264,15 @@ class PrestamoDetailView(LoginRequiredMixin, DetailView):
         cuota = get_object_or_404(Cuota, pk=cuota_id, prestamo=self.object)
 
         if accion == "pagar":
-            if cuota.estado == "Pagado":
-                messages.info(request, f"ℹ La cuota {cuota.numero} ya estaba marcada como pagada.")
-            else:
-                cuota.estado = "Pagado"
-                if cheque:
-                    cuota.cheque = cheque
-                cuota.save(update_fields=["estado", "cheque"])
-                messages.success(request, f"✅ Cuota {cuota.numero} marcada como pagada.")
+            # 🔒 Se bloquea la cuota y se vuelve a leer su estado: un doble envío no acredita dos veces
+            with transaction.atomic():
+                cuota = Cuota.objects.select_for_update().get(pk=cuota.pk)
+                if cuota.estado == "Pagado":
+                    messages.info(request, f"ℹ La cuota {cuota.numero} ya estaba marcada como pagada.")
+                else:
+                    cuota.prestamo = self.object
+                    cuota.aplicar_pago(cheque or cuota.cheque)
+                    messages.success(request, f"✅ Cuota {cuota.numero} marcada como pagada.")
         elif accion == "modificar_fecha":
             if cuota.estado == "Pagado":
                 messages.error(request, f"❌ No se puede modificar la fecha de la cuota {cuota.numero} porque ya está pagada.")
@@ -254,19 +305,40 @@ class PrestamoUpdateView(LoginRequiredMixin, UpdateView):
     def form_valid(self, form):
         response = super().form_valid(form)
 
-        # 🔹 Primero eliminamos las cuotas viejas
-        self.object.cuotas.all().delete()
+        # 🔹 Solo se tocan las cuotas pendientes que cambian; pagos y reprogramaciones se conservan.
+        # Las fechas solo se recalculan si cambió el calendario del préstamo
+        recalendarizar = bool({"fecha_inicio", "plazo"} & set(form.changed_data))
+        creadas, actualizadas, borradas = self.object.actualizar_cuotas(recalendarizar=recalendarizar)
+        estado_cuenta.actualizar_prestamo(self.object)
+        if creadas or actualizadas or borradas:
+            messages.info(
+                self.request,
+                f"Cuotas: {creadas} nuevas, {actualizadas} actualizadas, {borradas} eliminadas.",
+            )
 
-        # 🔹 Generamos nuevamente las cuotas con el nuevo plazo/monto
-        generar_cuotas(self.object)
+        return response
 
-        # 🔹 Actualizamos la fecha final al último pago
-        ultima_cuota = self.object.cuotas.order_by("-fecha_pago").first()
-        if ultima_cuota:
-            self.object.fecha_final = ultima_cuota.fecha_pago
-            self.object.save(update_fields=["fecha_final"])
 
-        return response
+# ======================================
+# Importar Prestamos (CSV / XLSX)
+# ======================================
+@login_required(login_url=settings.LOGIN_URL)
+def importar_prestamos_view(request):
+    errores = []
+    form = ImportarPrestamosForm(request.POST or None, request.FILES or None)
+
+    if request.method == "POST" and form.is_valid():
+        archivo = form.cleaned_data["archivo"]
+        try:
+            prestamos = validar_filas(leer_archivo(archivo, archivo.name))
+        except ImportacionError as e:
+            errores = e.errores
+        else:
+            importar_prestamos(prestamos)
+            messages.success(request, f"✅ Se importaron {len(prestamos)} préstamos.")
+            return redirect("prestamos:prestamo_list")
+
+    return render(request, "prestamos/importar_prestamos.html", {"form": form, "errores": errores})
 
 
 # ======================================
@@ -283,32 +355,69 @@ def cancelar_cuotas_masivo(request):
     # POST (acciones)
     # ===================
     if request.method == "POST":
-        seleccionadas = request.POST.getlist("cuotas")
+        # Solo ids numéricos: un valor alterado no debe tumbar la vista con un 500
+        seleccionadas = {pk for pk in request.POST.getlist("cuotas") if pk.isdigit()}
         accion = request.POST.get("accion")
         cheque_valor = request.POST.get("cheque", "").strip()
         nueva_fecha = request.POST.get("nueva_fecha", "").strip()
         observacion = request.POST.get("observacion", "").strip()
 
-        if seleccionadas:
-            cuotas_seleccionadas = Cuota.objects.filter(pk__in=seleccionadas, estado="Pendiente")
-            total_seleccionado = sum(c.monto_total for c in cuotas_seleccionadas)
-
-            messages.info(request, f"⚠ Se procesarán {cuotas_seleccionadas.count()} cuotas por ${total_seleccionado:.2f}")
-
-            for cuota in cuotas_seleccionadas:
-                if accion == "cancelar":
-                    cuota.estado = "Pagado"
-                    if cheque_valor:
-                        cuota.cheque = cheque_valor
-                    cuota.save(update_fields=["estado", "cheque"])
-
-                elif accion == "modificar_fecha":
-                    if nueva_fecha:
-                        cuota.fecha_pago = nueva_fecha
-                        cuota.observacion = observacion
-                        cuota.save(update_fields=["fecha_pago", "observacion"])
+        # 🔹 Quincena omitida: se corre el plan completo de los préstamos afectados (no solo las marcadas)
+        if accion == "reprogramar_quincena":
+            campus = request.POST.get("campus", "").strip()
+            try:
+                fecha = date.fromisoformat(request.POST.get("fecha", "").strip())
+            except ValueError:
+                messages.error(request, "❌ Selecciona la quincena a reprogramar.")
+                return redirect("prestamos:cancelar_cuotas_masivo")
+            if not es_quincena(fecha):
+                messages.error(request, f"❌ El {fecha:%d/%m/%Y} no es una quincena (día 15 o fin de mes).")
+                return redirect("prestamos:cancelar_cuotas_masivo")
+            prestamos, movidas = reprogramar_quincena(fecha, campus=campus or None, motivo=observacion)
+            messages.success(request, f"✅ Se corrieron {movidas} cuotas de {prestamos} préstamos a la quincena siguiente.")
+            return redirect("prestamos:cancelar_cuotas_masivo")
 
-            messages.success(request, "✅ Acciones aplicadas.")
+        if seleccionadas:
+            if accion == "cancelar":
+                cambios = {"estado": "Pagado"}
+                if cheque_valor:
+                    cambios["cheque"] = cheque_valor
+            elif accion == "modificar_fecha" and nueva_fecha:
+                cambios = {"fecha_pago": nueva_fecha, "observacion": observacion}
+            else:
+                messages.error(request, "Acción no válida.")
+                return redirect("prestamos:cancelar_cuotas_masivo")
+
+            # 🔒 Bloqueamos las abiertas seleccionadas: el mensaje y el estado de cuenta cuentan exactamente lo procesado
+            ids = list(
+                Cuota.objects.filter(pk__in=seleccionadas, estado__in=ESTADOS_ABIERTOS)
+                .select_for_update(of=("self",)).values_list("id", flat=True)
+            )
+            cuotas_seleccionadas = Cuota.objects.filter(pk__in=ids, estado__in=ESTADOS_ABIERTOS)
+
+            # 🔹 Una consulta para el resumen (por quincena y campus) y un solo UPDATE ... WHERE estado IN (abiertas)
+            grupos = list(
+                cuotas_seleccionadas.order_by()
+                .values_list("fecha_pago", "cheque", "prestamo__trabajador__campus")
+                .annotate(cantidad=Count("id"), total=Sum("monto_total"))
+            )
+            resumen_sel = {
+                "cantidad": sum(g[3] for g in grupos),
+                "total": sum(g[4] for g in grupos),
+            }
+            procesadas = cuotas_seleccionadas.update(**cambios)
+            kpis.invalidar(kpis.CUOTAS)  # update() no dispara post_save
+
+            if procesadas < len(seleccionadas):
+                messages.warning(request, f"⚠ {len(seleccionadas) - procesadas} cuota(s) ya habían sido procesadas por otra operación.")
+
+            if accion == "cancelar":
+                estado_cuenta.registrar_pagos([
+                    (fecha_pago, cheque_valor or cheque, campus_id, total)
+                    for fecha_pago, cheque, campus_id, _, total in grupos
+                ])
+
+            messages.success(request, f"✅ Se procesaron {procesadas} cuotas por ${resumen_sel['total'] or 0:.2f}")
             return redirect("prestamos:cancelar_cuotas_masivo")
         else:
             messages.error(request, "❌ No seleccionaste cuotas.")
@@ -323,59 +432,38 @@ def cancelar_cuotas_masivo(request):
     total = 0
 
     if fecha:
-        cuotas = Cuota.objects.filter(fecha_pago=fecha, estado="Pendiente")
+        cuotas = Cuota.objects.filter(fecha_pago=fecha, estado__in=ESTADOS_ABIERTOS)
 
         if campus:
-            cuotas = cuotas.filter(prestamo__trabajador__campus=campus)
+            cuotas = cuotas.filter(prestamo__trabajador__campus__nombre=campus)
 
         cuotas = cuotas.select_related("prestamo", "prestamo__trabajador")
         total = sum(c.monto_total for c in cuotas)
 
     # ===================
-    # 🔥 RESUMEN OPTIMIZADO
+    # 🔥 RESUMEN OPTIMIZADO (GROUP BY quincena + campus)
     # ===================
-    resumen = defaultdict(lambda: {
-        "León": 0,
-        "Managua": 0,
-        "Matagalpa": 0,
-        "total": 0,
-    })
-
-    datos = (
-        Cuota.objects
-        .filter(estado="Pendiente")
-        .values("fecha_pago", "prestamo__trabajador__campus")
-        .annotate(total_monto=Sum("monto_total"))
-        .order_by("fecha_pago")
-    )
-
-    for d in datos:
-        fecha_key = d["fecha_pago"]
-        campus_nombre = (d["prestamo__trabajador__campus"] or "").strip().lower()
-        monto = d["total_monto"] or 0  # 🔥 sin float
-
-        if "leon" in campus_nombre or "león" in campus_nombre:
-            campus_nombre = "León"
-        elif "managua" in campus_nombre:
-            campus_nombre = "Managua"
-        elif "matagalpa" in campus_nombre:
-            campus_nombre = "Matagalpa"
-        else:
-            continue
-
-        resumen[fecha_key][campus_nombre] += monto
-        resumen[fecha_key]["total"] += monto
-
-    # 🔥 ORDENAR
-    resumen_ordenado = dict(sorted(resumen.items()))
+    campus_list = Campus.lista()
+    resumen = {}
+    totales_campus = {c.nombre: 0 for c in campus_list}
+
+    # 🔹 Cacheado entre escrituras de préstamos y cuotas (ver kpis.py)
+    datos = kpis.pendiente_por_quincena()
+
+    for fecha_key, campus_nombre, monto in datos:
+        campus_nombre = campus_nombre or "Sin campus"
+        fila = resumen.setdefault(fecha_key, {
+            "campus": {c.nombre: 0 for c in campus_list},
+            "total": 0,
+        })
+        fila["campus"][campus_nombre] = fila["campus"].get(campus_nombre, 0) + monto
+        fila["total"] += monto
+        totales_campus[campus_nombre] = totales_campus.get(campus_nombre, 0) + monto
 
     # ===================
     # 🔥 KPI TOTALES
     # ===================
-    total_pendiente = sum(d["total"] for d in resumen_ordenado.values())
-    total_leon = sum(d["León"] for d in resumen_ordenado.values())
-    total_managua = sum(d["Managua"] for d in resumen_ordenado.values())
-    total_matagalpa = sum(d["Matagalpa"] for d in resumen_ordenado.values())
+    total_pendiente = sum(totales_campus.values())
 
     # ===================
     # RENDER (SIN ERRORES)
@@ -388,13 +476,12 @@ def cancelar_cuotas_masivo(request):
             "fecha": fecha,
             "campus": campus,
             "total": total,
-            "resumen": resumen_ordenado,
+            "resumen": resumen,
+            "campus_list": campus_list,
 
             # 🔥 KPI
             "total_pendiente": total_pendiente,
-            "total_leon": total_leon,
-            "total_managua": total_managua,
-            "total_matagalpa": total_matagalpa,
+            "totales_campus": totales_campus,
 
       # 🆕 FECHA ACTUAL
         "hoy": now().date(),
@@ -405,10 +492,11 @@ def cancelar_cuotas_masivo(request):
 
 @login_required(login_url=settings.LOGIN_URL)
 def prestamo_pdf(request, pk):
-    prestamo = Prestamo.objects.get(pk=pk)
-    html = render_to_string("prestamos/prestamo_pdf.html", {"object": prestamo})
+    prestamo = Prestamo.objects.select_related("trabajador__campus").get(pk=pk)
+    cuotas, totales = prestamo.resumen_cuotas()
+    html = render_to_string("prestamos/prestamo_pdf.html", {"object": prestamo, "cuotas": cuotas, "totales": totales})
 
-    pdf_file = HTML(string=html).write_pdf()
+    pdf_file = pdf_prestamo(prestamo.id, "detalle", html)
 
     response = HttpResponse(pdf_file, content_type="application/pdf")
     filename = f"Prestamo_{prestamo.id}_{prestamo.trabajador.nombre}_{prestamo.trabajador.campus}.pdf"
@@ -417,53 +505,45 @@ def prestamo_pdf(request, pk):
 
 @login_required(login_url=settings.LOGIN_URL)
 def cuotas_masivo_pdf(request):
-    seleccionadas = request.POST.getlist("cuotas")
+    # Solo ids numéricos: un valor alterado no debe tumbar la vista con un 500
+    seleccionadas = [int(pk) for pk in request.POST.getlist("cuotas") if pk.isdigit()]
 
     if not seleccionadas:
         # ⚠ Mensaje de error al usuario
         messages.error(request, "❌ BRUTA, TIENES QUE MARCAR LOS TRABAJADORES")
         return redirect("prestamos:cancelar_cuotas_masivo")
 
-    cuotas = Cuota.objects.filter(pk__in=seleccionadas).select_related("prestamo", "prestamo__trabajador")
+    # 🔹 El PDF se genera en el worker; la página de estado avisa cuando se puede descargar
+    trabajo = trabajos.encolar(
+        "pdf_cuotas",
+        usuario=request.user,
+        cuotas=seleccionadas,
+        fecha=request.POST.get("fecha", ""),
+        campus=request.POST.get("campus", ""),
+    )
+    return redirect("prestamos:trabajo_estado", pk=trabajo.pk)
 
 
-    # Tomamos fecha y campus de POST
+@login_required(login_url=settings.LOGIN_URL)
+def cuotas_lote_pdf(request):
     fecha = request.POST.get("fecha", "")
-    campus = request.POST.get("campus", "")
-
-    context = {
-        "cuotas": cuotas,
-        "total": sum(c.monto_total for c in cuotas),
-        "fecha": fecha,
-        "campus": campus,
-    }
-
-    html = render_to_string("prestamos/cuotas_masivo_pdf.html", context)
-
-    pdf_file = HTML(string=html, base_url=request.build_absolute_uri()).write_pdf(
-        stylesheets=[CSS(string="""
-            @page { size: A4; margin: 15mm; }
-            body { font-family: Arial, sans-serif; font-size: 11px; color: #333; }
-            h1 { text-align: center; margin-bottom: 10px; }
-            table { width: 100%; border-collapse: collapse; margin-top: 10px; }
-            th, td { border: 1px solid #444; padding: 5px; text-align: center; }
-            th { background: #f2f2f2; }
-            tfoot td { font-weight: bold; background: #eaeaea; }
-        """)]
-    )
-
-    # Formateamos fecha para el nombre del archivo
-    fecha_texto = fecha.replace("-", "_") if fecha else "fecha"
-    campus_texto = campus.upper() if campus else "TODOS"
-    filename = f"Cuotas_{fecha_texto}_DEDUCCION_{campus_texto}.pdf"
+    try:
+        date.fromisoformat(fecha)
+    except ValueError:
+        messages.error(request, "❌ Selecciona la quincena del reporte.")
+        return redirect("prestamos:cancelar_cuotas_masivo")
+    if not Cuota.objects.filter(fecha_pago=fecha, estado__in=ESTADOS_ABIERTOS).exists():
+        messages.warning(request, f"No hay cuotas pendientes para el {fecha}.")
+        return redirect("prestamos:cancelar_cuotas_masivo")
 
-    response = HttpResponse(pdf_file, content_type="application/pdf")
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
+    # 🔹 Todos los campus de la quincena en un solo trabajo (ZIP con un PDF por campus o PDF unido)
+    formato = "pdf" if request.POST.get("formato") == "pdf" else "zip"
+    trabajo = trabajos.encolar("pdf_cuotas_lote", usuario=request.user, fecha=fecha, formato=formato)
+    return redirect("prestamos:trabajo_estado", pk=trabajo.pk)
 
 @login_required(login_url=settings.LOGIN_URL)
 def prestamo_documento_pdf(request, pk, tipo):
-    prestamo = get_object_or_404(Prestamo, pk=pk)
+    prestamo = get_object_or_404(Prestamo.objects.select_related("trabajador__campus"), pk=pk)
     
     if tipo not in ["pagare"]:  # Solo afectar el Pagaré
         return HttpResponse("Tipo de documento inválido", status=400)
@@ -525,14 +605,12 @@ def prestamo_documento_pdf(request, pk, tipo):
     # Renderizar template del Pagaré
     html_string = render_to_string("prestamos/pdf_pagare.html", context)
 
-    pdf_file = HTML(string=html_string).write_pdf(
-        stylesheets=[CSS(string="""
+    pdf_file = pdf_prestamo(prestamo.id, "pagare-horizontal", html_string, css="""
             @page { size: A4 landscape; margin: 20mm; }
             body { font-family: Arial, sans-serif; font-size: 12px; line-height: 1.6; }
             h1, h2, h3 { text-align: center; }
             .firma { margin-top: 50px; text-align: center; }
-        """)]
-    )
+        """)
 
     response = HttpResponse(pdf_file, content_type="application/pdf")
     response['Content-Disposition'] = f'attachment; filename=pagare_prestamo_{prestamo.id}.pdf'
@@ -540,7 +618,7 @@ def prestamo_documento_pdf(request, pk, tipo):
 
 @login_required(login_url=settings.LOGIN_URL)
 def imprimir_documento(request, prestamo_id):
-    prestamo = get_object_or_404(Prestamo, pk=prestamo_id)
+    prestamo = get_object_or_404(Prestamo.objects.select_related("trabajador__campus"), pk=prestamo_id)
     tipo = request.GET.get("tipo")
 
     if tipo not in ["solicitud", "recibo", "pagare"]:
@@ -626,9 +704,9 @@ def imprimir_documento(request, prestamo_id):
     html_string = render_to_string(f"prestamos/pdf_{tipo}.html", context)
 
     # Mantener vertical (portrait) como pediste
-    css = CSS(string="@page { size: A4 portrait; margin: 20mm; } body { font-family: Arial, sans-serif; font-size: 12px; }")
+    css = "@page { size: A4 portrait; margin: 20mm; } body { font-family: Arial, sans-serif; font-size: 12px; }"
 
-    pdf_file = HTML(string=html_string).write_pdf(stylesheets=[css])
+    pdf_file = pdf_prestamo(prestamo.id, tipo, html_string, css=css)
 
     response = HttpResponse(pdf_file, content_type="application/pdf")
     response['Content-Disposition'] = f'attachment; filename={tipo}_prestamo_{prestamo.id}.pdf'
@@ -642,75 +720,66 @@ def enviar_correo(request, pk):
 # 🚫 EVITAR ENVÍO DUPLICADO
     if prestamo.correo_enviado:
         messages.warning(request, "⚠️ Que no entiendes que el correo ya fue enviado")
-        return redirect('prestamos:detalle', pk=pk)    
-
-    # =========================
-    # 📄 GENERAR PDF
-    # =========================
-    html_string = render_to_string(
-       'prestamos/prestamo_pdf.html',
-        {'object': prestamo}
-    )
-
-    pdf_file = BytesIO()
-    HTML(string=html_string).write_pdf(pdf_file)
-    pdf_file.seek(0)
+        return redirect('prestamos:prestamo_detail', pk=pk)
 
-    # =========================
-    # 📧 ASUNTO
-    # =========================
-    asunto = f"Préstamo: {prestamo.trabajador.nombre} - ${prestamo.monto:,.2f}"
-
-    # =========================
-    # 📧 HTML BONITO
-    # =========================
-    html_content = render_to_string(
-        'prestamos/correo_prestamo.html',
-        {'prestamo': prestamo}
-    )
+    en_cola = Trabajo.objects.filter(
+        tipo="correo_prestamo", parametros__prestamo_id=prestamo.pk, estado__in=["Pendiente", "En proceso"],
+    ).first()
+    if en_cola:
+        messages.info(request, "📧 El correo de este préstamo ya está en cola")
+        return redirect("prestamos:trabajo_estado", pk=en_cola.pk)
 
-    # =========================
-    # 📧 CREAR CORREO
-    # =========================
-    correo = EmailMultiAlternatives(
-        subject=asunto,
-        body="Se adjunta el detalle del prestamo.",
-        from_email='yanina.reyes@ucc.edu.ni',
-        to=['rodrigo.gurdian@ucc.edu.ni'],
-        cc=['jose.villalobos@ucc.edu.ni']
-    )
+    # 🔥 El envío SMTP lo hace el worker (procesar_trabajos), con reintentos
+    trabajo = trabajos.encolar("correo_prestamo", usuario=request.user, prestamo_id=prestamo.pk)
+    messages.success(request, "📧 Correo en cola de envío")
+    return redirect("prestamos:trabajo_estado", pk=trabajo.pk)
 
-    correo.encoding = 'utf-8'
 
-    # 🔥 Agregar HTML
-    correo.attach_alternative(html_content, "text/html")
+def _trabajo_del_usuario(request, pk):
+    trabajos_visibles = Trabajo.objects.defer("resultado")
+    if not request.user.is_staff:
+        trabajos_visibles = trabajos_visibles.filter(usuario=request.user)
+    return get_object_or_404(trabajos_visibles, pk=pk)
 
-    # =========================
-    # 📎 ADJUNTAR PDF
-    # =========================
-    correo.attach(
-        f'Prestamo_{prestamo.id}.pdf',
-        pdf_file.read(),
-        'application/pdf'
-    )
 
-    # =========================
-    # 🚀 ENVIAR
-    # =========================
-    try:
-        correo.send()
+@login_required(login_url=settings.LOGIN_URL)
+def trabajo_estado(request, pk):
+    trabajo = _trabajo_del_usuario(request, pk)
+    # 🔁 Sin worker, los reintentos ya vencidos se ejecutan cuando la página consulta el estado
+    if settings.TRABAJOS_EN_LINEA and trabajo.estado == "Pendiente" and trabajo.disponible_en <= now():
+        trabajo = trabajos.ejecutar_en_linea(trabajo.pk) or trabajo
+    aviso = trabajos.aviso_demora(trabajo)
+
+    # 🔹 La plantilla consulta esta misma URL con ?formato=json hasta que el trabajo termina
+    if request.GET.get("formato") == "json":
+        return JsonResponse({
+            "id": trabajo.pk,
+            "tipo": trabajo.get_tipo_display(),
+            "estado": trabajo.estado,
+            "terminado": trabajo.terminado,
+            "intentos": trabajo.intentos,
+            "max_intentos": trabajo.max_intentos,
+            "error": trabajo.error,
+            "aviso": aviso,
+            "descarga": reverse("prestamos:trabajo_descargar", args=[trabajo.pk]) if trabajo.nombre_archivo else "",
+        })
 
-        # ✅ MARCAR COMO ENVIADO
-        prestamo.correo_enviado = True
-        prestamo.save()
+    return render(request, "prestamos/trabajo_estado.html", {"trabajo": trabajo, "aviso": aviso})
 
-        messages.success(request, "📧 Correo enviado correctamente")
 
-    except Exception as e:
-        messages.error(request, f"❌ Error al enviar el correo: {e}")
+@login_required(login_url=settings.LOGIN_URL)
+def trabajo_descargar(request, pk):
+    trabajo = _trabajo_del_usuario(request, pk)
+    if trabajo.estado != "Completado" or not trabajo.nombre_archivo:
+        messages.warning(request, "⏳ El archivo todavía no está listo")
+        return redirect("prestamos:trabajo_estado", pk=pk)
+
+    contenido = Trabajo.objects.values_list("resultado", flat=True).get(pk=pk)
+    tipo_contenido = mimetypes.guess_type(trabajo.nombre_archivo)[0] or "application/octet-stream"
+    response = HttpResponse(bytes(contenido), content_type=tipo_contenido)
+    response['Content-Disposition'] = f'attachment; filename="{trabajo.nombre_archivo}"'
+    return response
 
-    return redirect('prestamos:prestamo_list')
-    
 def login_view(request):
     if request.method == 'POST':
         username = request.POST.get('username')
@@ -732,116 +801,8 @@ class LoginRequiredMessageMixin(AccessMixin):
     
 
 def estado_cuenta_general(year=None):
-
-    movimientos = []
-
-    # 🔴 CAPITAL INICIAL
-    movimientos.append({
-        'fecha': date(2025, 1, 1),
-        'descripcion': 'Capital inicial',
-        'debito': Decimal('0.00'),
-        'credito': Decimal('14200.00')
-    })
-
-    # 🔴 DÉBITO MANUAL
-    movimientos.append({
-        'fecha': date(2025, 10, 16),
-        'descripcion': 'Remanente',
-        'debito': Decimal('10939.42'),
-        'credito': Decimal('0.00')
-    })
-
-    # 🔴 PRÉSTAMOS
-    prestamos = Prestamo.objects.select_related('trabajador').only(
-        'id', 'fecha_inicio', 'monto', 'trabajador'
-    )
-
-    for p in prestamos:
-        movimientos.append({
-            'fecha': p.fecha_inicio,
-            'descripcion': f'Préstamo #{p.id} - {p.trabajador}',
-            'debito': p.monto,
-            'credito': Decimal('0.00')
-        })
-
-    # 🟢 CRÉDITOS
-    cuotas_agrupadas = (
-        Cuota.objects
-        .filter(estado__iexact='pagado')
-        .values('cheque', 'fecha_pago', 'prestamo__trabajador__campus')
-        .annotate(total=Sum('monto_total'))
-    )
-
-    for c in cuotas_agrupadas:
-        movimientos.append({
-            'fecha': c['fecha_pago'],
-            'descripcion': f'Cheque {c["cheque"]} - Campus {c["prestamo__trabajador__campus"]}',
-            'debito': Decimal('0.00'),
-            'credito': c['total']
-        })
-
-    # =========================
-    # 📊 ORDENAR GENERAL
-    # =========================
-    movimientos = sorted(movimientos, key=lambda x: x['fecha'])
-
-    # =========================
-    # 🧮 CALCULAR SALDO TOTAL
-    # =========================
-    saldo = Decimal('0.00')
-
-    for mov in movimientos:
-        saldo += mov['credito']
-        saldo -= mov['debito']
-        mov['saldo'] = saldo
-
-    # =========================
-    # 💥 SALDO DE ARRASTRE
-    # =========================
-    if year and year != "all":
-        year = int(year)
-
-        # saldo antes del año
-        saldo_inicial = Decimal('0.00')
-
-        for mov in movimientos:
-            if mov['fecha'].year < year:
-                saldo_inicial = mov['saldo']
-            else:
-                break
-
-        # filtrar movimientos del año
-        movimientos_filtrados = [
-            m for m in movimientos if m['fecha'].year == year
-        ]
-
-        # 👉 insertar saldo inicial
-        if movimientos_filtrados:
-            movimientos_filtrados.insert(0, {
-                'fecha': date(year, 1, 1),
-                'descripcion': 'Saldo inicial',
-                'debito': Decimal('0.00'),
-                'credito': Decimal('0.00'),
-                'saldo': saldo_inicial,
-            })
-
-        # recalcular saldo desde arrastre
-        saldo = saldo_inicial
-
-        for mov in movimientos_filtrados:
-            if mov['descripcion'] != 'Saldo inicial':
-                saldo += mov['credito']
-                saldo -= mov['debito']
-                mov['saldo'] = saldo
-
-        movimientos = movimientos_filtrados
-
-    # =========================
-    # 🔽 ORDEN FINAL (BANCO)
-    # =========================
-    movimientos = sorted(movimientos, key=lambda x: x['fecha'], reverse=True)
-
-    return movimientos
+    # 📒 Se lee del libro materializado (saldo acumulado ya guardado en cada movimiento)
+    return estado_cuenta.movimientos(year)
 
 def estado_cuenta_general_view(request):
 
@@ -853,18 +814,14 @@ def estado_cuenta_general_view(request):
 
     movimientos = estado_cuenta_general(year)
 
-    # 🔥 TOTALES GLOBALES (NO CAMBIAN CON FILTRO)
-    movimientos_all = estado_cuenta_general("all")
-
-    total_debitos = sum(m['debito'] for m in movimientos_all)
-    total_creditos = sum(m['credito'] for m in movimientos_all)
-    saldo_final = total_creditos - total_debitos
+    # 🔥 TOTALES GLOBALES (NO CAMBIAN CON FILTRO) desde el resumen mantenido
+    resumen = ResumenCuenta.actual()
+    total_debitos = resumen.total_debitos
+    total_creditos = resumen.total_creditos
+    saldo_final = resumen.saldo
 
     # 🎯 LISTA DE AÑOS DISPONIBLES
-    anios = sorted(
-        list(set(m['fecha'].year for m in movimientos_all)),
-        reverse=True
-    )
+    anios = [d.year for d in MovimientoCuenta.objects.dates("fecha", "year", order="DESC")]
 
     return render(request, 'prestamos/estado_general.html', {
         'movimientos': movimientos,
@@ -876,4 +833,85 @@ def estado_cuenta_general_view(request):
     })
 
 
+# ======================================
+# Exportaciones (CSV / XLSX)
+# ======================================
+def _formato_exportacion(request):
+    formato = request.GET.get("formato", "csv")
+    return formato if formato in exportacion.FORMATOS else "csv"
+
+
+def _fecha_parametro(request, nombre):
+    try:
+        return date.fromisoformat(request.GET.get(nombre, ""))
+    except ValueError:
+        return None
+
+
+@login_required(login_url=settings.LOGIN_URL)
+def exportar_cuotas(request):
+    # 🔹 Filtros opcionales: ?desde=&hasta=&estado=&campus=&formato=csv|xlsx
+    qs = exportacion.cuotas(
+        desde=_fecha_parametro(request, "desde"),
+        hasta=_fecha_parametro(request, "hasta"),
+        estado=request.GET.get("estado", ""),
+        campus=request.GET.get("campus", ""),
+    )
+    return exportacion.respuesta(qs, exportacion.COLUMNAS_CUOTAS, "cuotas", _formato_exportacion(request))
+
+
+@login_required(login_url=settings.LOGIN_URL)
+def exportar_estado_cuenta(request):
+    year = request.GET.get("year")
+    if year and year != "all" and not year.isdigit():
+        year = None
+    qs = exportacion.movimientos(year)
+    return exportacion.respuesta(qs, exportacion.COLUMNAS_MOVIMIENTOS, "estado_cuenta", _formato_exportacion(request))
+
+
+# ======================================
+# Proyección de flujo de caja
+# ======================================
+@login_required(login_url=settings.LOGIN_URL)
+def proyeccion_flujo_view(request):
+    try:
+        meses = max(1, min(int(request.GET.get("meses", 12)), 36))
+    except ValueError:
+        meses = 12
+
+    datos = proyectar_flujo(meses)
+
+    # 🔹 Misma URL con ?formato=json para otros consumidores (Excel, tableros)
+    if request.GET.get("formato") == "json":
+        return JsonResponse(datos)
 
+    filas = [
+        {
+            "quincena": quincena,
+            "campus": [datos["cartera"][c][i] + datos["nuevos"][c][i] for c in datos["campus"]],
+            "cartera": datos["totales"]["cartera"][i],
+            "nuevos": datos["totales"]["nuevos"][i],
+            "total": datos["totales"]["total"][i],
+        }
+        for i, quincena in enumerate(datos["quincenas"])
+    ]
+    return render(request, "prestamos/proyeccion_flujo.html", {
+        "datos": datos,
+        "filas": filas,
+        "meses": meses,
+        "opciones_meses": (3, 6, 12, 18, 24),
+    })
+
+
+# ======================================
+# Perfilado (solo staff)
+# ======================================
+@login_required(login_url=settings.LOGIN_URL)
+def perfilado_view(request):
+    if not request.user.is_staff:
+        return redirect("prestamos:prestamo_list")
+
+    datos = perfilado.resumen()
+    if request.GET.get("formato") == "json":
+        return JsonResponse(datos)
+    return render(request, "prestamos/perfilado.html", {"datos": datos})
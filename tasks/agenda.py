@@ -0,0 +1,139 @@
+"""Motor de cruces de horario de los instructores.
+
+Cada clase ocupa al instructor todos los días de fecha_inicio a fecha_fin, en la franja
+[hora, hora + duracion). Dos clases del mismo instructor chocan si se solapan los dos intervalos.
+
+`conflictos()` valida un lote de clases propuestas entre sí y contra las guardadas: trae de una sola
+consulta (índice instructor + rango de fechas) las clases que pueden chocar y después recorre cada
+instructor ordenado por fecha de inicio, comparando solo con las clases cuyo rango sigue abierto.
+"""
+import heapq
+from collections import defaultdict, namedtuple
+from dataclasses import dataclass
+from datetime import date, time
+from itertools import count
+from typing import Optional
+
+from .models import DURACION_PREDETERMINADA, Instructor, Task, sumar_minutos
+
+Conflicto = namedtuple("Conflicto", ["propuesta", "con"])
+
+
+def leer_campo(datos, campo, convertir, mensaje):
+    """`convertir(datos[campo])`; si el campo falta o está mal escrito, ValueError con `mensaje`."""
+    try:
+        return convertir(datos.get(campo) or "")
+    except ValueError:
+        raise ValueError(mensaje) from None
+
+
+def leer_duracion(datos):
+    return leer_campo(
+        datos, "duracion", lambda v: int(v or DURACION_PREDETERMINADA),
+        "La duración debe ser un número entero de minutos.",
+    )
+
+
+@dataclass
+class Clase:
+    """Clase propuesta (aún sin guardar, o la edición de una guardada si tiene pk).
+
+    Los nombres de los campos son los de Task para que las plantillas los muestren igual.
+    """
+    instructor: Instructor
+    fecha_inicio: date
+    fecha_fin: date
+    hora: time
+    duracion: int = DURACION_PREDETERMINADA
+    title: str = ""
+    description: str = ""
+    pk: Optional[int] = None
+
+    def __post_init__(self):
+        if self.fecha_fin < self.fecha_inicio:
+            raise ValueError("La fecha de finalización es anterior a la de inicio.")
+        if not 0 < self.duracion < 24 * 60:
+            raise ValueError("La duración debe estar entre 1 y 1439 minutos.")
+
+    @property
+    def instructor_id(self):
+        return self.instructor.pk
+
+    @property
+    def hora_fin(self):
+        return sumar_minutos(self.hora, self.duracion)
+
+    @classmethod
+    def desde_post(cls, datos, pk=None):
+        """Clase a partir del formulario (fechas AAAA-MM-DD, hora HH:MM); ValueError si algo no es válido."""
+        instructor = Instructor.desde_lista(datos.get("instructor"))
+        if instructor is None:
+            raise ValueError("Selecciona un instructor válido.")
+        return cls(
+            instructor=instructor,
+            fecha_inicio=leer_campo(datos, "fecha_inicio", date.fromisoformat, "Escribe una fecha de inicio válida."),
+            fecha_fin=leer_campo(datos, "fecha_fin", date.fromisoformat, "Escribe una fecha de finalización válida."),
+            hora=leer_campo(datos, "hora", time.fromisoformat, "Escribe una hora válida (HH:MM)."),
+            duracion=leer_duracion(datos),
+            title=datos.get("title", ""),
+            description=datos.get("description", ""),
+            pk=pk,
+        )
+
+
+def se_cruzan(a, b):
+    return (
+        a.fecha_inicio <= b.fecha_fin and b.fecha_inicio <= a.fecha_fin
+        and a.hora < b.hora_fin and b.hora < a.hora_fin
+    )
+
+
+def candidatas(propuestas, serie=None):
+    """Clases guardadas que podrían chocar con alguna propuesta (una consulta)."""
+    clases = (
+        Task.objects
+        .filter(
+            instructor__in={p.instructor_id for p in propuestas},
+            fecha_inicio__lte=max(p.fecha_fin for p in propuestas),
+            fecha_fin__gte=min(p.fecha_inicio for p in propuestas),
+            hora__lt=max(p.hora_fin for p in propuestas),
+            hora_fin__gt=min(p.hora for p in propuestas),
+        )
+        # La clase que se está editando no choca consigo misma
+        .exclude(pk__in=[p.pk for p in propuestas if p.pk is not None])
+        .select_related("instructor")
+    )
+    if serie is not None:
+        # Las clases de la serie que se reprograma se van a reemplazar
+        clases = clases.exclude(serie=serie)
+    return clases
+
+
+def conflictos(propuestas, serie=None):
+    """Todos los cruces de las propuestas entre sí y con las clases guardadas (menos las de `serie`).
+
+    Devuelve [Conflicto(propuesta, con)], donde `con` es un Task guardado u otra propuesta.
+    """
+    if not propuestas:
+        return []
+
+    por_instructor = defaultdict(list)
+    for task in candidatas(propuestas, serie):
+        por_instructor[task.instructor_id].append((task, False))
+    for propuesta in propuestas:
+        por_instructor[propuesta.instructor_id].append((propuesta, True))
+
+    encontrados = []
+    desempate = count()  # el heap no compara clases entre sí
+    for clases in por_instructor.values():
+        clases.sort(key=lambda c: c[0].fecha_inicio)
+        abiertas = []  # heap por fecha_fin de las clases cuyo rango puede cruzarse con las siguientes
+        for clase, es_propuesta in clases:
+            while abiertas and abiertas[0][0] < clase.fecha_inicio:
+                heapq.heappop(abiertas)
+            for _, _, otra, otra_es_propuesta in abiertas:
+                if (es_propuesta or otra_es_propuesta) and se_cruzan(clase, otra):
+                    # Siempre con la propuesta primero
+                    encontrados.append(Conflicto(clase, otra) if es_propuesta else Conflicto(otra, clase))
+            heapq.heappush(abiertas, (clase.fecha_fin, next(desempate), clase, es_propuesta))
+    return encontrados
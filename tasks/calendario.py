@@ -0,0 +1,115 @@
+"""Feed de clases para FullCalendar (/escuela/api/clases/).
+
+Cada clase aparece como un evento el día siguiente hábil a su fecha_fin (ajustar_fecha). El feed solo
+trae las clases de la ventana visible que FullCalendar manda en `start`/`end`, con un filtro por
+rango sobre el índice de fecha_fin. Las señales de Task guardan la hora del último cambio en
+MarcaCalendario (una fila compartida por todos los procesos); de ahí salen el ETag y el Last-Modified,
+y un calendario sin cambios recibe 304 sin consultar clases.
+"""
+import hashlib
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from django.db import transaction
+
+from .models import MarcaCalendario, Task
+
+MAX_CORRIMIENTO = 7  # días que ajustar_fecha puede sumar (sábado)
+
+
+def ajustar_fecha(fecha):
+    dia_original = fecha.weekday()  # lunes=0, ..., domingo=6
+
+    if dia_original == 4:  # viernes
+        # mover directamente al lunes siguiente
+        return fecha + timedelta(days=3)
+    elif dia_original == 5:  # sábado
+        # mover al sábado siguiente
+        return fecha + timedelta(days=7)
+    else:
+        # cualquier otro día: sumar 1 día
+        return fecha + timedelta(days=1)
+
+
+_local = threading.local()
+
+
+def marcar_modificacion():
+    """Anota el cambio al confirmar la transacción (bulk_create/update deben llamarla a mano)."""
+    _local.pendiente = True
+    # Varias marcas en la misma transacción (borrado en cascada de una serie): un solo UPDATE
+    transaction.on_commit(_guardar_marca)
+
+
+def _guardar_marca():
+    if not getattr(_local, "pendiente", False):
+        return
+    _local.pendiente = False
+    ahora = time.time()
+    if not MarcaCalendario.objects.filter(pk=1).update(modificado=ahora):
+        MarcaCalendario.objects.get_or_create(pk=1, defaults={"modificado": ahora})
+
+
+def ultima_modificacion(request=None):
+    """Timestamp del último cambio de clases; sin marca guardada, cuenta como cambio ahora.
+
+    Con `request` se lee una sola vez por request (el ETag y el Last-Modified la usan los dos).
+    """
+    marca = getattr(request, "_marca_calendario", None)
+    if marca is None:
+        marca = MarcaCalendario.objects.values_list("modificado", flat=True).filter(pk=1).first()
+        if marca is None:
+            marca = MarcaCalendario.objects.get_or_create(pk=1, defaults={"modificado": time.time()})[0].modificado
+        if request is not None:
+            request._marca_calendario = marca
+    return marca
+
+
+def ventana(request):
+    """(desde, hasta) de los parámetros start/end; None donde no vienen. ValueError si no son fechas."""
+    # FullCalendar manda fecha y hora con zona ("2025-09-01T00:00:00-06:00"): basta la fecha
+    return tuple(
+        date.fromisoformat(request.GET[p][:10]) if request.GET.get(p) else None
+        for p in ("start", "end")
+    )
+
+
+def etag(request, *args, **kwargs):
+    try:
+        desde, hasta = ventana(request)
+    except ValueError:
+        return None
+    return hashlib.md5(f"{ultima_modificacion(request)}|{desde}|{hasta}".encode()).hexdigest()
+
+
+def last_modified(request, *args, **kwargs):
+    return datetime.fromtimestamp(ultima_modificacion(request))
+
+
+def eventos(desde=None, hasta=None):
+    """Eventos con fecha ajustada en [desde, hasta)."""
+    clases = Task.objects.filter(hora__isnull=False, fecha_fin__isnull=False)
+    # El evento cae 1 a 7 días después de fecha_fin: se filtra por fecha_fin con ese margen (índice)
+    # y se descarta en memoria lo que el ajuste deja fuera de la ventana
+    if desde:
+        clases = clases.filter(fecha_fin__gte=desde - timedelta(days=MAX_CORRIMIENTO))
+    if hasta:
+        clases = clases.filter(fecha_fin__lt=hasta - timedelta(days=1))
+
+    resultado = []
+    for instructor, hora, hora_fin, fecha_fin in (
+        clases.values_list('instructor__nombre', 'hora', 'hora_fin', 'fecha_fin').order_by('instructor__nombre', 'hora')
+    ):
+        fecha = ajustar_fecha(fecha_fin)
+        if (desde and fecha < desde) or (hasta and fecha >= hasta):
+            continue
+        evento = {
+            'title': f"{instructor}",
+            'start': datetime.combine(fecha, hora),
+            'allDay': False,  # importante para mostrar hora
+        }
+        if hora_fin:
+            evento['end'] = datetime.combine(fecha, hora_fin)
+        resultado.append(evento)
+    return resultado
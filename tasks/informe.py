@@ -0,0 +1,109 @@
+"""Informe de disponibilidad ("últimas fechas") sobre una tabla de resumen.
+
+UltimaFecha guarda por (instructor, hora) la última fecha_fin, la fecha ajustada y cuántas clases hay.
+Las señales de Task anotan qué claves cambiaron y, al confirmar la transacción, se recalculan solo esas
+con un GROUP BY sobre el índice (instructor, hora, fecha_fin). La página se arma con la tabla de
+resumen (tamaño instructores × horas, no crece con la historia) y el HTML queda en el caché hasta el
+siguiente cambio.
+"""
+import threading
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.template.loader import render_to_string
+
+from .calendario import ajustar_fecha
+from .models import Task, UltimaFecha
+
+CLAVE_CACHE = "tasks:informe:html"
+
+COLUMNAS = (
+    ("Instructor", "instructor__nombre"),
+    ("Hora", "hora"),
+    ("Última clase", "ultima_fecha"),
+    ("Fecha disponible", "fecha_ajustada"),
+    ("Clases", "clases"),
+)
+
+_local = threading.local()
+
+
+def _pendientes():
+    if not hasattr(_local, "claves"):
+        _local.claves = set()
+    return _local.claves
+
+
+def marcar(*claves):
+    """Recalcula las claves (instructor_id, hora) al confirmar la transacción.
+
+    bulk_create y update no disparan señales: quien los use debe llamarla a mano.
+    """
+    _pendientes().update(claves)
+    # Varias marcas en la misma transacción: el primer callback recalcula todo y los demás no hacen nada
+    transaction.on_commit(_aplicar)
+
+
+def _aplicar():
+    claves = set(_pendientes())
+    _pendientes().clear()
+    if claves:
+        recalcular(claves)
+
+
+def _filtro(instructor_id, hora):
+    return (
+        (Q(instructor__isnull=True) if instructor_id is None else Q(instructor=instructor_id))
+        & (Q(hora__isnull=True) if hora is None else Q(hora=hora))
+    )
+
+
+def _resumen(clases):
+    return [
+        UltimaFecha(
+            instructor_id=fila["instructor"], hora=fila["hora"], ultima_fecha=fila["ultima_fecha"],
+            fecha_ajustada=ajustar_fecha(fila["ultima_fecha"]) if fila["ultima_fecha"] else None,
+            clases=fila["clases"],
+        )
+        for fila in (
+            clases.values("instructor", "hora")
+            .annotate(ultima_fecha=Max("fecha_fin"), clases=Count("id"))
+            .order_by()
+        )
+    ]
+
+
+@transaction.atomic
+def recalcular(claves):
+    filtro = reduce(or_, (_filtro(*clave) for clave in claves))
+    UltimaFecha.objects.filter(filtro).delete()
+    UltimaFecha.objects.bulk_create(_resumen(Task.objects.filter(filtro)))
+    invalidar()
+
+
+@transaction.atomic
+def reconstruir():
+    """Rehace todo el resumen (carga masiva, o al borrar un instructor)."""
+    UltimaFecha.objects.all().delete()
+    UltimaFecha.objects.bulk_create(_resumen(Task.objects.all()), batch_size=1000)
+    invalidar()
+
+
+def invalidar():
+    transaction.on_commit(lambda: cache.delete(CLAVE_CACHE))
+
+
+def filas():
+    return UltimaFecha.objects.select_related("instructor").order_by("instructor__nombre", "hora")
+
+
+def html():
+    """La página del informe, cacheada hasta el próximo cambio de clases o instructores."""
+    pagina = cache.get(CLAVE_CACHE)
+    if pagina is None:
+        pagina = render_to_string("tasks/informe_ultimas_fechas.html", {"resultados": filas()})
+        cache.set(CLAVE_CACHE, pagina, None)
+    return pagina
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:51
+
+from datetime import time
+
+from django.db import migrations, models
+
+
+def sumar_minutos(hora, minutos):
+    # Copia de tasks.models.sumar_minutos al crear esta migración: un cambio posterior no la altera
+    total = min(hora.hour * 60 + hora.minute + minutos, 24 * 60 - 1)
+    return time(total // 60, total % 60)
+
+
+def llenar_hora_fin(apps, schema_editor):
+    # Las clases existentes quedan con la duración predeterminada (60 min)
+    Task = apps.get_model('tasks', 'Task')
+    clases = list(Task.objects.filter(hora__isnull=False).only('id', 'hora', 'duracion'))
+    for clase in clases:
+        clase.hora_fin = sumar_minutos(clase.hora, clase.duracion)
+    Task.objects.bulk_update(clases, ['hora_fin'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_instructor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='duracion',
+            field=models.PositiveSmallIntegerField(default=60),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='hora_fin',
+            field=models.TimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['instructor', 'fecha_fin', 'fecha_inicio'], name='task_instructor_rango_idx'),
+        ),
+        migrations.RunPython(llenar_hora_fin, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_task_duracion_hora_fin'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['fecha_fin', 'hora'], name='task_fecha_fin_hora_idx'),
+        ),
+    ]
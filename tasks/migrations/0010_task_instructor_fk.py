@@ -0,0 +1,61 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def enlazar_instructores(apps, schema_editor):
+    # Cada nombre de texto se enlaza con el instructor del mismo nombre (el primero si hay repetidos);
+    # los nombres que ya no existen se crean para no perder a quién pertenecía la clase
+    Task = apps.get_model('tasks', 'Task')
+    Instructor = apps.get_model('tasks', 'Instructor')
+
+    por_nombre = {}
+    for instructor in Instructor.objects.order_by('-id'):
+        por_nombre[instructor.nombre.strip().casefold()] = instructor
+    nombres = (
+        Task.objects.exclude(instructor_nombre__isnull=True).exclude(instructor_nombre='')
+        .values_list('instructor_nombre', flat=True).distinct()
+    )
+    for nombre in nombres:
+        clave = nombre.strip().casefold()
+        if clave not in por_nombre:
+            por_nombre[clave] = Instructor.objects.create(nombre=nombre.strip())
+        Task.objects.filter(instructor_nombre=nombre).update(instructor=por_nombre[clave])
+
+
+def copiar_nombres(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    for instructor_id, nombre in Task.objects.filter(instructor__isnull=False).values_list('instructor', 'instructor__nombre').distinct():
+        Task.objects.filter(instructor=instructor_id).update(instructor_nombre=nombre)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_task_fecha_fin_hora_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_instructor_rango_idx',
+        ),
+        migrations.RenameField(
+            model_name='task',
+            old_name='instructor',
+            new_name='instructor_nombre',
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='instructor',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clases', to='tasks.instructor'),
+        ),
+        migrations.RunPython(enlazar_instructores, copiar_nombres),
+        migrations.RemoveField(
+            model_name='task',
+            name='instructor_nombre',
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['instructor', 'fecha_fin', 'fecha_inicio'], name='task_instructor_rango_idx'),
+        ),
+    ]
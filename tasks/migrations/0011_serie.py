@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0010_task_instructor_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Serie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('dias', models.CharField(max_length=7)),
+                ('hora', models.TimeField()),
+                ('duracion', models.PositiveSmallIntegerField(default=60)),
+                ('fecha_inicio', models.DateField()),
+                ('fecha_fin', models.DateField()),
+                ('excepciones', models.JSONField(blank=True, default=list)),
+                ('instructor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='series', to='tasks.instructor')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='serie',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='clases', to='tasks.serie'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:58
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def ajustar_fecha(fecha):
+    # Copia de tasks.calendario.ajustar_fecha al crear esta migración: un cambio posterior no la altera
+    dias = {4: 3, 5: 7}.get(fecha.weekday(), 1)  # viernes -> lunes, sábado -> sábado siguiente
+    return fecha + timedelta(days=dias)
+
+
+def llenar_resumen(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    UltimaFecha = apps.get_model('tasks', 'UltimaFecha')
+    filas = Task.objects.values('instructor', 'hora').annotate(ultima_fecha=Max('fecha_fin'), clases=Count('id')).order_by()
+    UltimaFecha.objects.bulk_create([
+        UltimaFecha(
+            instructor_id=f['instructor'], hora=f['hora'], ultima_fecha=f['ultima_fecha'],
+            fecha_ajustada=ajustar_fecha(f['ultima_fecha']) if f['ultima_fecha'] else None, clases=f['clases'],
+        )
+        for f in filas
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0011_serie'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UltimaFecha',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.TimeField(null=True)),
+                ('ultima_fecha', models.DateField(null=True)),
+                ('fecha_ajustada', models.DateField(null=True)),
+                ('clases', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['instructor', 'hora', 'fecha_fin'], name='task_instructor_hora_idx'),
+        ),
+        migrations.AddField(
+            model_name='ultimafecha',
+            name='instructor',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tasks.instructor'),
+        ),
+        migrations.AddIndex(
+            model_name='ultimafecha',
+            index=models.Index(fields=['instructor', 'hora'], name='ultima_fecha_clave_idx'),
+        ),
+        migrations.RunPython(llenar_resumen, migrations.RunPython.noop),
+    ]
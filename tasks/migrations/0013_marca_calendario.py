@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-17 23:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0012_ultima_fecha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaCalendario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modificado', models.FloatField()),
+            ],
+        ),
+    ]
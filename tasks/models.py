@@ -1,6 +1,22 @@
+from datetime import time
+
+from django.core.cache import cache
 from django.db import models
 
 
+DURACION_PREDETERMINADA = 60  # minutos
+
+
+def sumar_minutos(hora, minutos):
+    """hora + minutos, sin pasar de la medianoche (las clases no cruzan de un día a otro)."""
+    if hora is None:
+        return None
+    if isinstance(hora, str):
+        hora = time.fromisoformat(hora)
+    total = min(hora.hour * 60 + hora.minute + minutos, 24 * 60 - 1)
+    return time(total // 60, total % 60)
+
+
 # Create your models here.
 
 class Task(models.Model):
@@ -9,18 +25,97 @@ class Task(models.Model):
     fecha_inicio = models.DateField(null=True, blank=True)
     fecha_fin = models.DateField(null=True, blank=True)
     hora = models.TimeField(null=True, blank=True)
-    instructor = models.CharField(max_length=100, blank=True, null=True)  # ahora es texto
+    duracion = models.PositiveSmallIntegerField(default=DURACION_PREDETERMINADA)  # minutos
+    hora_fin = models.TimeField(null=True, blank=True, editable=False)  # hora + duracion (ver save)
+    # Sin índice propio: el índice compuesto task_instructor_rango_idx empieza por instructor
+    instructor = models.ForeignKey(
+        "Instructor", on_delete=models.SET_NULL, related_name="clases", blank=True, null=True, db_index=False,
+    )
     completado = models.BooleanField(default=False)
+    serie = models.ForeignKey("Serie", on_delete=models.CASCADE, related_name="clases", blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Cruces de horario (agenda.py): igualdad por instructor y rango por fechas
+            models.Index(fields=["instructor", "fecha_fin", "fecha_inicio"], name="task_instructor_rango_idx"),
+            # Ventana del calendario (calendario.py): rango por fecha_fin
+            models.Index(fields=["fecha_fin", "hora"], name="task_fecha_fin_hora_idx"),
+            # Recalcular una fila del informe de disponibilidad (informe.py)
+            models.Index(fields=["instructor", "hora", "fecha_fin"], name="task_instructor_hora_idx"),
+        ]
 
     def __str__(self):  
         return self.title
+
+    def save(self, *args, **kwargs):
+        # bulk_create no pasa por aquí: quien lo use debe llenar hora_fin con sumar_minutos
+        self.hora_fin = sumar_minutos(self.hora, self.duracion)
+        super().save(*args, **kwargs)
     
 class Instructor(models.Model):
+    CACHE_KEY = "tasks:instructores"
+
     nombre = models.CharField(max_length=100)
     especialidad = models.CharField(max_length=100, blank=True, null=True)
 
     def __str__(self):
         return self.nombre
-    
 
+    @classmethod
+    def lista(cls):
+        """Todos los instructores por nombre, cacheados para los formularios. Se invalida en signals.py."""
+        instructores = cache.get(cls.CACHE_KEY)
+        if instructores is None:
+            instructores = list(cls.objects.order_by("nombre", "id"))
+            cache.set(cls.CACHE_KEY, instructores, None)
+        return instructores
+
+    @classmethod
+    def desde_lista(cls, pk):
+        """El instructor `pk` de la lista cacheada, o None."""
+        return next((i for i in cls.lista() if str(i.pk) == str(pk)), None)
+
+
+class Serie(models.Model):
+    """Clases repetidas: un día por cada fecha de `dias` entre fecha_inicio y fecha_fin (series.py)."""
+    DIAS = [(0, "Lunes"), (1, "Martes"), (2, "Miércoles"), (3, "Jueves"), (4, "Viernes"), (5, "Sábado"), (6, "Domingo")]
+
+    title = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    instructor = models.ForeignKey(Instructor, on_delete=models.SET_NULL, related_name="series", null=True)
+    dias = models.CharField(max_length=7)  # días de la semana, lunes=0 ("024" = lunes, miércoles y viernes)
+    hora = models.TimeField()
+    duracion = models.PositiveSmallIntegerField(default=DURACION_PREDETERMINADA)  # minutos
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    excepciones = models.JSONField(default=list, blank=True)  # fechas ISO sin clase (feriados)
+
+    def __str__(self):
+        return self.title
+
+    def nombres_dias(self):
+        nombres = dict(self.DIAS)
+        return ", ".join(nombres[int(d)] for d in self.dias)
+
+
+class UltimaFecha(models.Model):
+    """Última fecha de clase por (instructor, hora) para el informe de disponibilidad.
+
+    Tabla de resumen: la mantienen las señales de Task (informe.py); no se edita a mano.
+    """
+    instructor = models.ForeignKey(Instructor, on_delete=models.CASCADE, related_name="+", null=True)
+    hora = models.TimeField(null=True)
+    ultima_fecha = models.DateField(null=True)
+    fecha_ajustada = models.DateField(null=True)  # calendario.ajustar_fecha(ultima_fecha)
+    clases = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["instructor", "hora"], name="ultima_fecha_clave_idx")]
+
+
+class MarcaCalendario(models.Model):
+    """Hora (timestamp) del último cambio de clases, en una sola fila (calendario.py).
 
+    Vive en la base y no en el caché para que todos los procesos de gunicorn den el mismo ETag.
+    """
+    modificado = models.FloatField()
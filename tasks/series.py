@@ -0,0 +1,115 @@
+"""Series de clases repetidas.
+
+Una serie se expande en memoria a una clase de un día por cada fecha que cae en sus días de la semana,
+menos las excepciones. Todas las fechas se validan juntas con agenda.conflictos (una consulta) y se
+insertan con un solo bulk_create. Editar una serie reemplaza sus clases en bloque (conservando las
+marcadas como completadas en las fechas que siguen), y borrarla las borra con un DELETE.
+"""
+from datetime import date, time, timedelta
+
+from django.db import transaction
+
+from . import calendario, informe
+from .agenda import Clase, conflictos, leer_campo, leer_duracion
+from .models import Instructor, Serie, Task, sumar_minutos
+
+MAX_CLASES = 500  # por serie (un año de clases diarias y algo más)
+
+
+def fechas(serie):
+    """Fechas de la serie, en orden."""
+    dias = {int(d) for d in serie.dias}
+    excepciones = {date.fromisoformat(f) for f in serie.excepciones}
+    total = (serie.fecha_fin - serie.fecha_inicio).days + 1
+    return [
+        f for f in (serie.fecha_inicio + timedelta(days=n) for n in range(total))
+        if f.weekday() in dias and f not in excepciones
+    ]
+
+
+def desde_post(datos, serie=None):
+    """Llena (o crea) la serie con el formulario sin guardarla; ValueError si algo no es válido."""
+    instructor = Instructor.desde_lista(datos.get("instructor"))
+    if instructor is None:
+        raise ValueError("Selecciona un instructor válido.")
+    dias = sorted({d for d in datos.getlist("dias") if d in set("0123456")})
+    if not dias:
+        raise ValueError("Selecciona al menos un día de la semana.")
+
+    serie = serie or Serie()
+    serie.title = datos.get("title", "")
+    serie.description = datos.get("description", "")
+    serie.instructor = instructor
+    serie.dias = "".join(dias)
+    serie.hora = leer_campo(datos, "hora", time.fromisoformat, "Escribe una hora válida (HH:MM).")
+    serie.duracion = leer_duracion(datos)
+    serie.fecha_inicio = leer_campo(datos, "fecha_inicio", date.fromisoformat, "Escribe una fecha de inicio válida.")
+    serie.fecha_fin = leer_campo(datos, "fecha_fin", date.fromisoformat, "Escribe una fecha de finalización válida.")
+    # Una fecha por línea o separadas por coma
+    excepciones = set()
+    for f in datos.get("excepciones", "").replace(",", "\n").splitlines():
+        if f.strip():
+            try:
+                excepciones.add(date.fromisoformat(f.strip()).isoformat())
+            except ValueError:
+                raise ValueError(f"La excepción \"{f.strip()}\" no es una fecha válida (AAAA-MM-DD).") from None
+    serie.excepciones = sorted(excepciones)
+    if serie.fecha_fin < serie.fecha_inicio:
+        raise ValueError("La fecha de finalización es anterior a la de inicio.")
+    return serie
+
+
+def propuestas(serie):
+    """Una Clase (sin guardar) por fecha de la serie."""
+    dias = fechas(serie)
+    if not dias:
+        raise ValueError("La serie no tiene ninguna fecha en ese rango.")
+    if len(dias) > MAX_CLASES:
+        raise ValueError(f"La serie tiene {len(dias)} clases; el máximo es {MAX_CLASES}.")
+    return [
+        Clase(instructor=serie.instructor, fecha_inicio=f, fecha_fin=f, hora=serie.hora, duracion=serie.duracion,
+              title=serie.title, description=serie.description)
+        for f in dias
+    ]
+
+
+@transaction.atomic
+def guardar(serie):
+    """Guarda la serie y (re)genera sus clases si no chocan con nada.
+
+    Devuelve la lista de conflictos; si no está vacía no se guardó nada.
+    """
+    clases = propuestas(serie)
+    cruces = conflictos(clases, serie=serie if serie.pk else None)
+    if cruces:
+        return cruces
+
+    completadas = set()
+    if serie.pk:
+        completadas = set(serie.clases.filter(completado=True).values_list("fecha_inicio", flat=True))
+        serie.clases.all().delete()
+    serie.save()
+
+    hora_fin = sumar_minutos(serie.hora, serie.duracion)
+    Task.objects.bulk_create([
+        Task(
+            serie=serie, instructor=serie.instructor, title=serie.title, description=serie.description,
+            fecha_inicio=c.fecha_inicio, fecha_fin=c.fecha_fin, hora=serie.hora, duracion=serie.duracion,
+            hora_fin=hora_fin, completado=c.fecha_inicio in completadas,
+        )
+        for c in clases
+    ], batch_size=MAX_CLASES)
+    # bulk_create no dispara señales
+    calendario.marcar_modificacion()
+    informe.marcar((serie.instructor_id, serie.hora))
+    return []
+
+
+@transaction.atomic
+def eliminar(serie):
+    clave = (serie.instructor_id, serie.hora)
+    serie.clases.all().delete()
+    serie.delete()
+    # Igual que en guardar: no se depende de las señales por fila de un borrado en bloque
+    calendario.marcar_modificacion()
+    informe.marcar(clave)
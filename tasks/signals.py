@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import calendario, informe
+from .models import Instructor, Task
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def marcar_cambio_clases(sender, **kwargs):
+    # Cambia el ETag/Last-Modified del feed del calendario
+    calendario.marcar_modificacion()
+
+
+@receiver(pre_save, sender=Task)
+def recordar_clave_informe(sender, instance: Task, **kwargs):
+    # Si la clase cambia de instructor u hora, la fila anterior del informe también se recalcula
+    instance._clave_anterior = None
+    if not instance._state.adding:
+        instance._clave_anterior = Task.objects.filter(pk=instance.pk).values_list("instructor", "hora").first()
+
+
+@receiver(post_save, sender=Task)
+def actualizar_informe_guardado(sender, instance: Task, **kwargs):
+    claves = {(instance.instructor_id, instance.hora)}
+    if getattr(instance, "_clave_anterior", None):
+        claves.add(instance._clave_anterior)
+    informe.marcar(*claves)
+
+
+@receiver(post_delete, sender=Task)
+def actualizar_informe_borrado(sender, instance: Task, **kwargs):
+    informe.marcar((instance.instructor_id, instance.hora))
+
+
+@receiver(post_save, sender=Instructor)
+@receiver(post_delete, sender=Instructor)
+def invalidar_cache_instructores(sender, **kwargs):
+    cache.delete(Instructor.CACHE_KEY)
+    # El feed muestra el nombre del instructor (y al borrarlo sus clases quedan sin instructor)
+    calendario.marcar_modificacion()
+    informe.invalidar()
+
+
+@receiver(post_delete, sender=Instructor)
+def reconstruir_informe_instructor(sender, **kwargs):
+    # Sus clases pasaron a "sin instructor" con un UPDATE (sin señales de Task)
+    informe.reconstruir()
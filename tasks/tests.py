@@ -1,3 +1,130 @@
+from datetime import date, time
+
+from django.core.cache import cache
+from django.http import QueryDict
 from django.test import TestCase
+from django.urls import reverse
+
+from .agenda import Clase, conflictos
+from .models import Instructor, Serie, Task, UltimaFecha
+from .series import desde_post, eliminar, fechas, guardar
+
+
+class ConflictosTests(TestCase):
+    """agenda.conflictos: cruces de una propuesta con las clases guardadas y con el resto del lote."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = Instructor.objects.create(nombre="Ana")
+        cls.luis = Instructor.objects.create(nombre="Luis")
+        # Ana: del 1 al 10 de marzo, 10:00-11:00
+        cls.guardada = Task.objects.create(
+            title="Yoga", instructor=cls.ana,
+            fecha_inicio=date(2025, 3, 1), fecha_fin=date(2025, 3, 10), hora=time(10, 0), duracion=60,
+        )
+
+    def clase(self, inicio, fin, hora, duracion=60, instructor=None, pk=None):
+        return Clase(
+            instructor=instructor or self.ana, fecha_inicio=inicio, fecha_fin=fin,
+            hora=hora, duracion=duracion, title="Nueva", pk=pk,
+        )
+
+    def test_solapamiento_parcial(self):
+        # Comparte del 8 al 10 de marzo y de 10:30 a 11:00
+        propuesta = self.clase(date(2025, 3, 8), date(2025, 3, 20), time(10, 30))
+        self.assertEqual(conflictos([propuesta]), [(propuesta, self.guardada)])
+
+    def test_sin_cruce(self):
+        casos = [
+            self.clase(date(2025, 3, 1), date(2025, 3, 10), time(11, 0)),  # empieza cuando la otra termina
+            self.clase(date(2025, 3, 11), date(2025, 3, 20), time(10, 0)),  # fechas siguientes
+            self.clase(date(2025, 3, 1), date(2025, 3, 10), time(10, 0), instructor=self.luis),
+        ]
+        for propuesta in casos:
+            with self.subTest(propuesta=propuesta):
+                self.assertEqual(conflictos([propuesta]), [])
+
+    def test_cruce_dentro_del_lote(self):
+        a = self.clase(date(2025, 4, 1), date(2025, 4, 1), time(8, 0), duracion=90)
+        b = self.clase(date(2025, 4, 1), date(2025, 4, 1), time(9, 0))
+        c = self.clase(date(2025, 4, 2), date(2025, 4, 2), time(9, 0))
+        encontrados = conflictos([a, b, c])
+        self.assertEqual(len(encontrados), 1)
+        self.assertEqual({id(encontrados[0].propuesta), id(encontrados[0].con)}, {id(a), id(b)})
+
+    def test_edicion_no_choca_consigo_misma(self):
+        editada = self.clase(date(2025, 3, 1), date(2025, 3, 12), time(10, 15), pk=self.guardada.pk)
+        self.assertEqual(conflictos([editada]), [])
+        # ...pero sí con otra clase guardada
+        otra = Task.objects.create(
+            title="Pilates", instructor=self.ana,
+            fecha_inicio=date(2025, 3, 12), fecha_fin=date(2025, 3, 12), hora=time(11, 0), duracion=30,
+        )
+        self.assertEqual(conflictos([editada]), [(editada, otra)])
+
+    def test_serie_que_se_reprograma(self):
+        serie = Serie.objects.create(
+            title="Spinning", instructor=self.ana, dias="0", hora=time(10, 0),
+            fecha_inicio=date(2025, 3, 1), fecha_fin=date(2025, 3, 31),
+        )
+        self.guardada.serie = serie
+        self.guardada.save()
+        propuesta = self.clase(date(2025, 3, 3), date(2025, 3, 3), time(10, 0))
+        self.assertEqual(len(conflictos([propuesta])), 1)
+        self.assertEqual(conflictos([propuesta], serie=serie), [])
+
+
+class SerieFechasTests(TestCase):
+    def test_dias_de_la_semana_menos_excepciones(self):
+        # Lunes y miércoles de marzo 2025, sin el lunes 17
+        serie = Serie(
+            dias="02", fecha_inicio=date(2025, 3, 1), fecha_fin=date(2025, 3, 31),
+            excepciones=["2025-03-17"],
+        )
+        dias = fechas(serie)
+        self.assertEqual(len(dias), 8)
+        self.assertNotIn(date(2025, 3, 17), dias)
+        self.assertTrue(all(d.weekday() in (0, 2) for d in dias))
+        self.assertEqual(dias, sorted(dias))
+
+    def test_dias_invalidos(self):
+        instructor = Instructor.objects.create(nombre="Ana")
+        for dias in (["", "01"], ["7"]):
+            datos = QueryDict(mutable=True)
+            datos.update({"instructor": instructor.pk, "hora": "10:00", "fecha_inicio": "2025-03-01", "fecha_fin": "2025-03-31"})
+            datos.setlist("dias", dias)
+            with self.subTest(dias=dias), self.assertRaisesMessage(ValueError, "Selecciona al menos un día"):
+                desde_post(datos)
+
+    def test_eliminar_actualiza_el_informe(self):
+        serie = Serie(
+            title="Spinning", instructor=Instructor.objects.create(nombre="Ana"), dias="0",
+            hora=time(10, 0), fecha_inicio=date(2025, 3, 1), fecha_fin=date(2025, 3, 31),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(guardar(serie), [])
+        fila = UltimaFecha.objects.get(instructor=serie.instructor, hora=serie.hora)
+        self.assertEqual((fila.ultima_fecha, fila.clases), (date(2025, 3, 31), 5))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            eliminar(serie)
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(UltimaFecha.objects.filter(instructor=serie.instructor, clases__gt=0).exists())
+
+
+class CalendarioEtagTests(TestCase):
+    def test_etag_compartido_entre_procesos(self):
+        url = reverse("clases_api")
+        etag = self.client.get(url)["ETag"]
+        # Otro proceso (o un reinicio) no tiene el caché local de este: la marca sale de la base
+        cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
 
-# Create your tests here.
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(
+                title="Yoga", instructor=Instructor.objects.create(nombre="Ana"),
+                fecha_inicio=date(2025, 3, 3), fecha_fin=date(2025, 3, 3), hora=time(10, 0),
+            )
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta["ETag"], etag)
@@ -15,6 +15,10 @@ urlpatterns=[
     path('calendario/', lambda request: render(request, 'calendario_full.html'), name='calendario_clases'),
     path('api/clases/', api_clases, name='clases_api'),
     path('informe/', views.informe_ultimas_fechas, name='informe_ultimas_fechas'),
+    path('series/', views.serie_list, name='serie_list'),
+    path('series/nueva/', views.serie_create, name='serie_create'),
+    path('series/<int:serie_id>/editar/', views.serie_edit, name='serie_edit'),
+    path('series/<int:serie_id>/eliminar/', views.serie_delete, name='serie_delete'),
 
 ]
 
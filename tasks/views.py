@@ -2,55 +2,60 @@ from django.shortcuts import render, redirect, get_object_or_404
 from .models import Task
 from datetime import time, timedelta, datetime
 from django.contrib import messages
-from .models import Task, Instructor
-from django.http import JsonResponse
+from .models import Task, Instructor, Serie
+from prestamos import exportacion
+
+from . import calendario, informe, series
+from .agenda import Clase, conflictos
+import orjson
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
 from django.db.models import Q
-from django.db.models import Max
+from django.db.models import Count, Max
 
 def list_tasks(request):
-    tasks = Task.objects.all().order_by('-id')
-    instructores = Instructor.objects.all()
+    tasks = Task.objects.select_related('instructor').order_by('-id')
+    instructores = Instructor.lista()
     return render(request, 'list_tasks.html', {
         'tasks': tasks,
         'instructores': instructores
     })
 
 def create_task(request):
-    instructores = Instructor.objects.all()
+    instructores = Instructor.lista()
 
     if request.method == 'POST':
         form_data = request.POST
-        instructor_id = form_data.get('instructor')
-        fecha_inicio = form_data.get('fecha_inicio')
-        fecha_fin = form_data.get('fecha_fin')
-        hora = form_data.get('hora')
-
-        # Obtener el nombre del instructor
-        instructor_nombre = Instructor.objects.get(id=instructor_id).nombre
-
-        # Buscar tarea en conflicto
-        conflict_task = Task.objects.filter(
-            instructor=instructor_nombre,  # ✅ ahora compara texto con texto
-            fecha_inicio__lte=fecha_fin,
-            fecha_fin__gte=fecha_inicio,
-            hora=hora
-        ).first()
-
-        if conflict_task:
+
+        try:
+            # El instructor se toma de la lista cacheada (sin consulta)
+            clase = Clase.desde_post(form_data)
+        except ValueError as e:
             return render(request, 'create_task.html', {
                 'instructores': instructores,
                 'form_data': form_data,
-                'conflict_task': conflict_task
+                'error': str(e),
+            })
+
+        # Buscar todas las clases del instructor que se cruzan (fechas y franja horaria)
+        cruces = [c.con for c in conflictos([clase])]
+        if cruces:
+            return render(request, 'create_task.html', {
+                'instructores': instructores,
+                'form_data': form_data,
+                'conflictos': cruces,
+                'conflict_task': cruces[0],
             })
 
-        # Crear la tarea con el nombre del instructor (no el objeto)
         Task.objects.create(
-            instructor=instructor_nombre,  # ✅ se guarda texto
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            hora=hora,
-            title=form_data.get('title'),
-            description=form_data.get('description'),
+            instructor=clase.instructor,
+            fecha_inicio=clase.fecha_inicio,
+            fecha_fin=clase.fecha_fin,
+            hora=clase.hora,
+            duracion=clase.duracion,
+            title=clase.title,
+            description=clase.description,
         )
         return redirect('list_tasks')
 
@@ -63,7 +68,7 @@ def delete_task(request, task_id):
 
 def edit_task(request, id):
     task = get_object_or_404(Task, pk=id)
-    instructores = Instructor.objects.all()
+    instructores = Instructor.lista()
     return render(request, 'edit_task.html', {
         'task': task,
         'instructores': instructores
@@ -74,102 +79,125 @@ def update_task(request, task_id):
 
     if request.method == 'POST':
         form_data = request.POST
-        title = form_data.get('title')
-        description = form_data.get('description')
-        fecha_inicio = form_data.get('fecha_inicio')
-        fecha_fin = form_data.get('fecha_fin')
-        hora = form_data.get('hora')
-        instructor_id = form_data.get('instructor')
-
-        instructor = Instructor.objects.get(id=instructor_id)
-        instructor_nombre = instructor.nombre
-
-        # Buscar conflicto (excluyendo la tarea actual)
-        conflict_task = Task.objects.filter(
-            instructor=instructor_nombre,
-            fecha_inicio__lte=fecha_fin,
-            fecha_fin__gte=fecha_inicio,
-            hora=hora
-        ).exclude(id=task.id).first()
-
-        if conflict_task:
-            instructores = Instructor.objects.all()
+
+        try:
+            clase = Clase.desde_post(form_data, pk=task.pk)
+        except ValueError as e:
+            return render(request, 'edit_task.html', {
+                'task': task,
+                'instructores': Instructor.lista(),
+                'form_data': form_data,
+                'error': str(e),
+            })
+
+        # Buscar conflictos (la tarea actual se excluye por su pk)
+        cruces = [c.con for c in conflictos([clase])]
+        if cruces:
+            instructores = Instructor.lista()
             return render(request, 'edit_task.html', {
                 'task': task,
                 'instructores': instructores,
-                'conflict_task': conflict_task,
+                'conflictos': cruces,
+                'conflict_task': cruces[0],
                 'form_data': form_data
             })
 
         # Si no hay conflicto, actualizar
-        task.title = title
-        task.description = description
-        task.fecha_inicio = fecha_inicio
-        task.fecha_fin = fecha_fin
-        task.hora = hora
-        task.instructor = instructor_nombre
+        task.title = clase.title
+        task.description = clase.description
+        task.fecha_inicio = clase.fecha_inicio
+        task.fecha_fin = clase.fecha_fin
+        task.hora = clase.hora
+        task.duracion = clase.duracion
+        task.instructor = clase.instructor
         task.save()
 
         messages.success(request, "Tarea actualizada exitosamente.")
         return redirect('list_tasks')
 
-    instructores = Instructor.objects.all()
+    instructores = Instructor.lista()
     return render(request, 'edit_task.html', {
         'task': task,
         'instructores': instructores
     })
 
+# 🔹 Solo la ventana visible; 304 si las clases no cambiaron desde la última carga
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=calendario.etag, last_modified_func=calendario.last_modified)
 def api_clases(request):
-    tareas = (
-        Task.objects
-        .values('instructor', 'hora', 'fecha_fin')
-        .order_by('instructor', 'hora')
+    try:
+        desde, hasta = calendario.ventana(request)
+    except ValueError:
+        return JsonResponse({'error': 'start y end deben ser fechas ISO (AAAA-MM-DD).'}, status=400)
+
+    # orjson serializa las fechas y horas directamente y sin espacios
+    return HttpResponse(orjson.dumps(calendario.eventos(desde, hasta)), content_type='application/json')
+
+
+# 🔹 Tabla de resumen (signals.py) y HTML cacheado; ?formato=csv|xlsx exporta las mismas filas
+def informe_ultimas_fechas(request):
+    formato = request.GET.get('formato')
+    if formato in exportacion.FORMATOS:
+        return exportacion.respuesta(informe.filas(), informe.COLUMNAS, "disponibilidad", formato)
+    return HttpResponse(informe.html())
+
+
+# =========================
+# Series de clases
+# =========================
+def serie_list(request):
+    lista = (
+        Serie.objects.select_related('instructor')
+        .annotate(total=Count('clases'), completadas=Count('clases', filter=Q(clases__completado=True)))
+        .order_by('-id')
     )
+    return render(request, 'serie_list.html', {'series': lista})
 
-    eventos = []
-    for tarea in tareas:
-        fecha_ajustada = ajustar_fecha(tarea['fecha_fin'])
-        if fecha_ajustada:
-            # Combina fecha ajustada + hora (asumiendo que hora es tipo time)
-            fecha_hora = datetime.combine(fecha_ajustada, tarea['hora'])
-            eventos.append({
-                'title': f"{tarea['instructor']}",
-                'start': fecha_hora.isoformat(),
-                'allDay': False,  # importante para mostrar hora
-            })
 
-    return JsonResponse(eventos, safe=False)
+def _serie_form(request, serie=None):
+    """Crear o editar: valida todas las fechas de una vez y guarda con un solo bulk_create."""
+    contexto = {
+        'serie': serie,
+        'instructores': Instructor.lista(),
+        'dias_semana': Serie.DIAS,
+        'dias_marcados': list(serie.dias) if serie else [],
+        'excepciones': "\n".join(serie.excepciones) if serie else "",
+    }
 
+    if request.method == 'POST':
+        contexto.update(
+            form_data=request.POST,
+            dias_marcados=request.POST.getlist('dias'),
+            excepciones=request.POST.get('excepciones', ''),
+        )
+        try:
+            serie = series.desde_post(request.POST, serie)
+            cruces = series.guardar(serie)
+        except ValueError as e:
+            contexto['error'] = str(e)
+            return render(request, 'serie_form.html', contexto)
 
-def ajustar_fecha(fecha):
-    dia_original = fecha.weekday()  # lunes=0, ..., domingo=6
+        if cruces:
+            contexto['conflictos'] = cruces
+            return render(request, 'serie_form.html', contexto)
 
-    if dia_original == 4:  # viernes
-        # mover directamente al lunes siguiente
-        return fecha + timedelta(days=3)
-    elif dia_original == 5:  # sábado
-        # mover al sábado siguiente
-        return fecha + timedelta(days=7)
-    else:
-        # cualquier otro día: sumar 1 día
-        return fecha + timedelta(days=1)
+        messages.success(request, f"Serie guardada con {len(series.fechas(serie))} clases.")
+        return redirect('serie_list')
+
+    return render(request, 'serie_form.html', contexto)
+
+
+def serie_create(request):
+    return _serie_form(request)
+
+
+def serie_edit(request, serie_id):
+    return _serie_form(request, get_object_or_404(Serie, pk=serie_id))
 
-def informe_ultimas_fechas(request):
-    resultados = (
-        Task.objects
-        .values('instructor', 'hora')
-        .annotate(ultima_fecha=Max('fecha_fin'))
-        .order_by('instructor', 'hora')
-    )
 
-    # Ajustar fechas
-    resultados_ajustados = []
-    for r in resultados:
-        fecha_original = r['ultima_fecha']
-        if fecha_original:
-            r['fecha_ajustada'] = ajustar_fecha(fecha_original)
-        else:
-            r['fecha_ajustada'] = None
-        resultados_ajustados.append(r)
-
-    return render(request, 'tasks/informe_ultimas_fechas.html', {'resultados': resultados_ajustados})
+@require_POST
+def serie_delete(request, serie_id):
+    serie = get_object_or_404(Serie, pk=serie_id)
+    series.eliminar(serie)
+    messages.success(request, "Serie eliminada.")
+    return redirect('serie_list')